@@ -0,0 +1,139 @@
+from dex_model import PRECISION, fail, get_nat_or_fail, ceil_div, token_key
+
+from helpers import contract_self_address, burn
+
+# a python model of the auction entrypoints (receive_fee, launch_auction, place_bid and claim in
+# auction_lambdas.ligo), exact to the contract's integer math. Entrypoints return the token transfers the
+# contract would emit, in the order parse_transfers lists them, as
+# {"source", "destination", "amount", "token"} with the token in its key form (see dex_model.token_key)
+
+ERR_AUCTION_NOT_FOUND = "304"
+ERR_WHITELISTED_TOKEN = "305"
+ERR_INSUFFICIENT_BALANCE = "307"
+ERR_LOW_BID = "308"
+ERR_AUCTION_FINISHED = "309"
+ERR_AUCTION_NOT_FINISHED = "310"
+ERR_AUCTIONED_AMOUNT_TOO_LOW = "312"
+ERR_NOT_DEX_CORE = "403"
+
+class Auction():
+    __slots__ = ("status", "token", "end_time", "current_bidder", "current_bid", "amt")
+
+    def __init__(self, status, token, end_time, current_bidder, current_bid, amt):
+        self.status = status
+        self.token = token
+        self.end_time = end_time
+        self.current_bidder = current_bidder
+        self.current_bid = current_bid
+        self.amt = amt
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def transfer(source, destination, amount, token):
+    return {"source": source, "destination": destination, "amount": amount, "token": token}
+
+class AuctionModel():
+    def __init__(self, quipu_token, dex_core=None, auction_duration=300, auction_extension=100, extension_trigger=5,
+                 min_bid=0, dev_fee_f=0, bid_fee_f=0, whitelist=()):
+        self.quipu = ("fa2", (quipu_token["token"], quipu_token["id"]))
+        self.dex_core = dex_core
+        self.auction_duration = auction_duration
+        self.auction_extension = auction_extension
+        self.extension_trigger = extension_trigger
+        self.min_bid = min_bid
+        self.dev_fee_f = dev_fee_f
+        self.bid_fee_f = bid_fee_f
+        self.whitelist = {token_key(token) for token in whitelist}
+
+        self.auctions = {}
+        self.auctions_count = 0
+        self.dev_fee_balances_f = {}
+        self.public_fee_balances_f = {}
+        self.bid_fee_balance = 0
+
+    """ the model of an auction storage, the inner `storage` record of a LocalChain holding the auction """
+    @classmethod
+    def from_storage(cls, storage):
+        model = cls(storage["quipu_token"], storage["dex_core"], storage["auction_duration"],
+            storage["auction_extension"], storage["extension_trigger"], storage["min_bid"],
+            storage["fees"]["dev_fee_f"], storage["fees"]["bid_fee_f"], storage["whitelist"])
+        model.auctions_count = storage["auctions_count"]
+        model.bid_fee_balance = storage["bid_fee_balance"]
+        model.dev_fee_balances_f = {token_key(token): value
+            for token, value in dict(storage["dev_fee_balances_f"]).items()}
+        model.public_fee_balances_f = {token_key(token): value
+            for token, value in dict(storage["public_fee_balances_f"]).items()}
+        for auction_id, auction in dict(storage["auctions"]).items():
+            model.auctions[auction_id] = Auction("finished" if "finished" in auction["status"] else "active",
+                token_key(auction["token"]), auction["end_time"], auction["current_bidder"], auction["current_bid"],
+                auction["amt"])
+        return model
+
+    def get_auction(self, auction_id):
+        auction = self.auctions.get(auction_id)
+        if auction is None:
+            fail(ERR_AUCTION_NOT_FOUND)
+        return auction
+
+    def receive_fee(self, token, fee, sender=None):
+        if self.dex_core is not None and sender != self.dex_core:
+            fail(ERR_NOT_DEX_CORE)
+        token = token_key(token)
+        dev_fee_f = fee * self.dev_fee_f
+        self.dev_fee_balances_f[token] = self.dev_fee_balances_f.get(token, 0) + dev_fee_f
+        self.public_fee_balances_f[token] = self.public_fee_balances_f.get(token, 0) + \
+            get_nat_or_fail(fee * PRECISION - dev_fee_f)
+        return []
+
+    def launch_auction(self, token, amt, bid, sender, now):
+        token = token_key(token)
+        if token in self.whitelist:
+            fail(ERR_WHITELISTED_TOKEN)
+        if amt <= 0:
+            fail(ERR_AUCTIONED_AMOUNT_TOO_LOW)
+        if bid < self.min_bid:
+            fail(ERR_LOW_BID)
+
+        token_balance_f = self.public_fee_balances_f.get(token, 0)
+        if amt > token_balance_f // PRECISION:
+            fail(ERR_INSUFFICIENT_BALANCE)
+
+        self.auctions[self.auctions_count] = Auction("active", token, now + self.auction_duration, sender, bid, amt)
+        self.auctions_count += 1
+        self.public_fee_balances_f[token] = get_nat_or_fail(token_balance_f - amt * PRECISION)
+        return [transfer(sender, contract_self_address, bid, self.quipu)]
+
+    def place_bid(self, auction_id, bid, sender, now):
+        auction = self.get_auction(auction_id)
+        if now >= auction.end_time:
+            fail(ERR_AUCTION_FINISHED)
+        if bid <= auction.current_bid:
+            fail(ERR_LOW_BID)
+
+        bid_fee = ceil_div(auction.current_bid * self.bid_fee_f, PRECISION)
+        refund = get_nat_or_fail(auction.current_bid - bid_fee)
+        self.bid_fee_balance += bid_fee
+
+        transfers = [transfer(sender, contract_self_address, bid, self.quipu)]
+        if refund > 0:
+            transfers.insert(0, transfer(contract_self_address, auction.current_bidder, refund, self.quipu))
+
+        if now >= auction.end_time - self.extension_trigger:
+            auction.end_time += self.auction_extension
+        auction.current_bid = bid
+        auction.current_bidder = sender
+        return transfers
+
+    def claim(self, auction_id, now):
+        auction = self.get_auction(auction_id)
+        if now < auction.end_time:
+            fail(ERR_AUCTION_NOT_FINISHED)
+        if auction.status == "finished":
+            fail(ERR_AUCTION_FINISHED)
+
+        auction.status = "finished"
+        return [
+            transfer(contract_self_address, burn, auction.current_bid, self.quipu),
+            transfer(contract_self_address, auction.current_bidder, auction.amt, auction.token),
+        ]
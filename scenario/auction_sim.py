@@ -0,0 +1,284 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Monte Carlo runs of the fee auction on auction_model: fees of a token come in from dex_core, a bidder
+# launches an auction of the accumulated public balance and randomized bidders outbid each other until it
+# ends and is claimed. Reports the distributions of auction duration, bid fee revenue, QUIPU burned and
+# bid counts. Batches of auctions run in forked workers; --check replays some of them on the compiled
+# auction contract and compares every call with the model.
+#
+#   python3 scenario/auction_sim.py --auctions 200000 -j 8
+#   python3 scenario/auction_sim.py --bid-fee 0.02 --extension 100 --trigger 30
+#   python3 scenario/auction_sim.py --check 50
+
+SCENARIO_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCENARIO_DIR not in sys.path:
+    sys.path.insert(0, SCENARIO_DIR)
+
+from pytezos.crypto.encoding import base58_encode
+
+from helpers import *
+from constants import *
+from dex_model import PRECISION, token_key
+from auction_model import AuctionModel
+
+AUCTION_PATH = "./build/auction.json"
+
+auctioned_token = token_a_fa2
+quipu = {"token": quipu_token, "id": 0}
+
+# valid implicit addresses, so the same runs can be replayed on the contract
+bidder_addresses = [base58_encode(bytes([i + 1]) * 20, b"tz1").decode() for i in range(32)]
+
+default_params = {
+    "auction_duration": 300,
+    "auction_extension": 100,
+    "extension_trigger": 5,
+    "min_bid": 10,
+    "dev_fee": 0.0,
+    "bid_fee": 0.0,
+    # bidders per auction, drawn uniformly
+    "min_bidders": 2,
+    "max_bidders": 8,
+    # log-normal fee per auction, in units of the auctioned token
+    "fee_mu": 9.0,
+    "fee_sigma": 1.5,
+    # QUIPU per auctioned token, bidders value the lot around it
+    "price": 0.5,
+    "valuation_sigma": 0.3,
+    "increment": 0.05,
+    # mean seconds before an incremental or jump bidder reacts
+    "reaction": 60,
+}
+
+strategies = ("incremental", "jump", "sniper")
+
+metrics = ("duration", "bids", "extensions", "bid_fees", "burned", "lot")
+
+def make_model(params):
+    return AuctionModel(quipu, dex_core, params["auction_duration"], params["auction_extension"],
+        params["extension_trigger"], params["min_bid"], int(params["dev_fee"] * PRECISION),
+        int(params["bid_fee"] * PRECISION))
+
+"""
+a bidder's next move on the auction: (time, bid), None once the next bid is above its valuation.
+Snipers wait for the extension window, the others react after a random delay, jump bidders bid halfway
+to their valuation
+"""
+def next_bid(rng, strategy, valuation, auction, now, params):
+    current = auction.current_bid
+    bid = current + max(1, int(current * params["increment"]))
+    if strategy == "jump":
+        bid = max(bid, (current + valuation) // 2)
+    if bid > valuation:
+        return None
+
+    if strategy == "sniper":
+        window_start = auction.end_time - params["extension_trigger"]
+        return max(now + 1, window_start + int(rng.random() * params["extension_trigger"])), bid
+    return now + 1 + int(rng.expovariate(1 / params["reaction"])), bid
+
+"""
+a fee deposit and, if the launcher values the lot above min_bid, one auction run to its claim starting at
+`now`. Returns the auction's metrics (None when it wasn't launched) and the time it ended. Calls are
+appended to `log` as (entrypoint, args, sender, now, transfers) when given
+"""
+def run_auction(model, rng, now, params, log=None):
+    def call(name, args, sender, at):
+        if name == "receive_fee":
+            transfers = model.receive_fee(*args, sender=sender)
+        elif name == "claim":
+            transfers = model.claim(*args, at)
+        else:
+            transfers = getattr(model, name)(*args, sender, at)
+        if log is not None:
+            log.append((name, args, sender, at, transfers))
+        return transfers
+
+    fee = 1 + int(rng.lognormvariate(params["fee_mu"], params["fee_sigma"]))
+    call("receive_fee", (auctioned_token, fee), dex_core, now)
+
+    amt = model.public_fee_balances_f[token_key(auctioned_token)] // PRECISION
+    value = amt * params["price"]
+    count = rng.randint(params["min_bidders"], params["max_bidders"])
+    bidders = []
+    for address in bidder_addresses[:count]:
+        valuation = int(value * rng.lognormvariate(0, params["valuation_sigma"]))
+        bidders.append((address, rng.choice(strategies), valuation))
+
+    launcher, _, launcher_valuation = bidders[0]
+    if amt == 0 or launcher_valuation < params["min_bid"]:
+        # the fees stay for a later auction
+        return None, now + 1
+
+    auction_id = model.auctions_count
+    bid_fee_balance = model.bid_fee_balance
+    quipu_in = quipu_out = 0
+
+    def account(transfers):
+        nonlocal quipu_in, quipu_out
+        for transfer in transfers:
+            if transfer["token"] != model.quipu:
+                continue
+            if transfer["destination"] == contract_self_address:
+                quipu_in += transfer["amount"]
+            else:
+                quipu_out += transfer["amount"]
+
+    account(call("launch_auction", (auctioned_token, amt, params["min_bid"]), launcher, now))
+    auction = model.auctions[auction_id]
+    started = now
+    bids = extensions = 0
+
+    while True:
+        best = None
+        for address, strategy, valuation in bidders:
+            if address == auction.current_bidder:
+                continue
+            move = next_bid(rng, strategy, valuation, auction, now, params)
+            if move is not None and (best is None or move[0] < best[0]):
+                best = move[0], move[1], address
+        if best is None or best[0] >= auction.end_time:
+            break
+        now, bid, address = best
+        end_time = auction.end_time
+        account(call("place_bid", (auction_id, bid), address, now))
+        bids += 1
+        extensions += auction.end_time != end_time
+
+    now = auction.end_time
+    account(call("claim", (auction_id,), bidders[0][0], now))
+
+    bid_fees = model.bid_fee_balance - bid_fee_balance
+    if quipu_in - quipu_out != bid_fees:
+        raise AssertionError(f"auction {auction_id}: {quipu_in} QUIPU in, {quipu_out} out, {bid_fees} bid fees")
+    return (now - started, bids, extensions, bid_fees, auction.current_bid, amt), now + 1
+
+""" `count` auctions one after another on a fresh model, the metrics of the launched ones as arrays """
+def run_batch(seed, count, params=default_params, log=None):
+    rng = random.Random(seed)
+    model = make_model(params)
+    now = 0
+    rows = []
+    for _ in range(count):
+        row, now = run_auction(model, rng, now, params, log)
+        if row is not None:
+            rows.append(row)
+    columns = np.array(rows, dtype=np.int64).reshape(len(rows), len(metrics))
+    return {name: columns[:, i] for i, name in enumerate(metrics)}
+
+def run_job(job):
+    return run_batch(*job)
+
+def merge(batches):
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in metrics}
+
+def summary(results, auctions):
+    launched = len(results["duration"])
+    lines = [f"{launched} of {auctions} fee deposits launched an auction"]
+    if launched == 0:
+        return "\n".join(lines)
+    lines.append(f"{'':12}{'mean':>12}{'p5':>12}{'p50':>12}{'p95':>12}{'max':>12}")
+    for name in metrics:
+        values = results[name]
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        lines.append(f"{name:12}{values.mean():12.1f}{p5:12.0f}{p50:12.0f}{p95:12.0f}{values.max():12}")
+    lines.append(f"{int(results['burned'].sum())} QUIPU burned, {int(results['bid_fees'].sum())} QUIPU of bid fees")
+    return "\n".join(lines)
+
+def chain_with(params):
+    from loader import load_contract
+    from initial_storage import get_auction_lambdas
+
+    ct, storage = load_contract(AUCTION_PATH)
+    storage["auction_lambdas"] = get_auction_lambdas()
+    inner = storage["storage"]
+    inner["admin"] = admin
+    inner["dex_core"] = dex_core
+    inner["quipu_token"] = quipu
+    for name in ["auction_duration", "auction_extension", "extension_trigger", "min_bid"]:
+        inner[name] = params[name]
+    inner["fees"] = {"dev_fee_f": int(params["dev_fee"] * PRECISION), "bid_fee_f": int(params["bid_fee"] * PRECISION)}
+    return LocalChain(storage=storage), ct
+
+"""
+replay the calls of `count` simulated auctions on the contract, every call has to emit the transfers the
+model predicted and the storages have to agree at the end. Returns the number of calls checked
+"""
+def check_against_chain(seed, count, params=default_params):
+    log = []
+    model = make_model(params)
+    rng = random.Random(seed)
+    now = 0
+    for _ in range(count):
+        _, now = run_auction(model, rng, now, params, log)
+
+    chain, ct = chain_with(params)
+    for name, args, sender, at, transfers in log:
+        chain.now = at
+        res = chain.execute(getattr(ct, name)(*args), sender=sender)
+        expected = [(t["source"], t["destination"], t["amount"], t["token"][1][0]) for t in transfers]
+        actual = [(t.source, t.destination, t.amount, t.token_address) for t in iter_transfers(res.operations)]
+        if actual != expected:
+            raise AssertionError(f"{name}{args} at {at}: contract sent {actual}, model {expected}")
+
+    on_chain = AuctionModel.from_storage(chain.storage["storage"])
+    for name in ["auctions_count", "bid_fee_balance", "dev_fee_balances_f", "public_fee_balances_f"]:
+        if getattr(on_chain, name) != getattr(model, name):
+            raise AssertionError(f"{name}: contract {getattr(on_chain, name)}, model {getattr(model, name)}")
+    for auction_id, auction in model.auctions.items():
+        if on_chain.auctions[auction_id].as_dict() != auction.as_dict():
+            raise AssertionError(f"auction {auction_id}: contract {on_chain.auctions[auction_id].as_dict()}, "
+                f"model {auction.as_dict()}")
+    return len(log)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo runs of the fee auction")
+    parser.add_argument("--auctions", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=10_000, help="auctions per job")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument("--duration", type=int, default=default_params["auction_duration"])
+    parser.add_argument("--extension", type=int, default=default_params["auction_extension"])
+    parser.add_argument("--trigger", type=int, default=default_params["extension_trigger"])
+    parser.add_argument("--min-bid", type=int, default=default_params["min_bid"])
+    parser.add_argument("--dev-fee", type=float, default=default_params["dev_fee"])
+    parser.add_argument("--bid-fee", type=float, default=default_params["bid_fee"])
+    parser.add_argument("--max-bidders", type=int, default=default_params["max_bidders"])
+    parser.add_argument("--check", type=int, metavar="N", help="replay N auctions on the contract instead")
+    args = parser.parse_args(argv)
+
+    params = dict(default_params, auction_duration=args.duration, auction_extension=args.extension,
+        extension_trigger=args.trigger, min_bid=args.min_bid, dev_fee=args.dev_fee, bid_fee=args.bid_fee,
+        max_bidders=min(args.max_bidders, len(bidder_addresses)))
+
+    if args.check is not None:
+        if not os.path.exists(AUCTION_PATH):
+            print(f"{AUCTION_PATH} is not built")
+            return 1
+        calls = check_against_chain(args.seed, args.check, params)
+        print(f"{args.check} auctions, {calls} calls agree with the contract")
+        return 0
+
+    started = time.time()
+    jobs = []
+    for i, first in enumerate(range(0, args.auctions, args.batch)):
+        jobs.append((args.seed + i, min(args.batch, args.auctions - first), params))
+    if args.jobs > 1:
+        with multiprocessing.get_context("fork").Pool(args.jobs) as pool:
+            batches = pool.map(run_job, jobs)
+    else:
+        batches = list(map(run_job, jobs))
+
+    print(summary(merge(batches), args.auctions))
+    print(f"in {time.time() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from functools import lru_cache
+from importlib.metadata import version
+
+# benchmarks of representative entrypoint calls on warm LocalChain states. Every benchmark restores the
+# same warm state before each run, times the calls and records their executed instructions (not gas, see
+# metrics.CallMetrics) in one more, instrumented, run. Results can be saved as a JSON baseline and later
+# runs compared against it.
+#
+#   python3 scenario/bench.py --save bench.json
+#   python3 scenario/bench.py --baseline bench.json --tolerance 0.2
+#   python3 scenario/bench.py swap_3_hops bucket_vote -n 10
+
+SCENARIO_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCENARIO_DIR not in sys.path:
+    sys.path.insert(0, SCENARIO_DIR)
+
+from helpers import *
+from constants import *
+from loader import load_contract
+from initial_storage import get_dex_core_lambdas, get_auction_lambdas
+from metrics import CallMetrics
+
+DEX_PATH = "./build/dex_core.json"
+AUCTION_PATH = "./build/auction.json"
+BUCKET_PATH = "./contracts/compiled/bucket.tz"
+
+bench_fees = {
+    "interface_fee" : int(0.003 * 1e18),
+    "swap_fee" : int(0.002 * 1e18),
+    "auction_fee" : int(0.001 * 1e18),
+    "withdraw_fee_reward" : int(0.003 * 1e18)
+}
+
+# pair ids follow the launch order
+dex_pairs = [tez_pair, tez_pair_b, pair_ab, pair_ac, pair_cd]
+
+# FA2 -> tez -> FA2 -> FA2 -> FA1.2 -> FA1.2, the n hop swaps take its first n hops
+long_route = [
+    {"pair_id": 0, "direction": "a_to_b"},
+    {"pair_id": 1, "direction": "b_to_a"},
+    {"pair_id": 2, "direction": "b_to_a"},
+    {"pair_id": 3, "direction": "b_to_a"},
+    {"pair_id": 4, "direction": "b_to_a"},
+]
+
+@lru_cache(maxsize=None)
+def warm_dex():
+    dex, storage = load_contract(DEX_PATH)
+    storage["dex_core_lambdas"] = get_dex_core_lambdas()
+    storage["storage"]["admin"] = admin
+    storage["storage"]["auction"] = auction
+    storage["storage"]["flash_swaps_proxy"] = flash_swaps_proxy
+
+    chain = LocalChain(storage=storage)
+    for pair in dex_pairs:
+        amount = 1_000_000_000 if "tez" in pair["token_b"] else 0
+        chain.execute(dex.launch_exchange(pair, 1_000_000_000, 1_000_000_000, me, dummy_candidate, FAR_FUTURE),
+            amount=amount, sender=me)
+    chain.execute(dex.set_fees(bench_fees), sender=admin)
+    chain.advance_blocks(1)
+    return chain, dex
+
+@lru_cache(maxsize=None)
+def warm_bucket():
+    ct, storage = load_contract(BUCKET_PATH)
+    storage["dex_core"] = dex_core
+    storage["collecting_period_end"] = 10
+
+    chain = LocalChain(storage=storage)
+    chain.execute(ct.vote(alice, carol, True, 100_000), sender=dex_core, view_results=vr)
+    chain.execute(ct.default(), amount=20_000, view_results=vr)
+    chain.advance_blocks(15)
+    return chain, ct
+
+""" auction states: fees received, then an auction launched, then bid on and finished """
+@lru_cache(maxsize=None)
+def warm_auction(stage):
+    ct, storage = load_contract(AUCTION_PATH)
+    storage["auction_lambdas"] = get_auction_lambdas()
+    storage["storage"]["admin"] = admin
+    storage["storage"]["dex_core"] = dex_core
+    storage["storage"]["auction_duration"] = 300
+    storage["storage"]["min_bid"] = 10
+    storage["storage"]["quipu_token"] = {"token" : quipu_token, "id" : 0}
+
+    chain = LocalChain(storage=storage)
+    chain.execute(ct.receive_fee(token_a_fa2, 10), sender=dex_core)
+    if stage in ("launched", "finished"):
+        chain.execute(ct.launch_auction(token_a_fa2, 10, 100), sender=alice)
+    if stage == "finished":
+        chain.execute(ct.place_bid(0, 107), sender=bob)
+        chain.advance_blocks(10)
+    return chain, ct
+
+def swap(dex, swaps, amount_in, flash_lambda=None):
+    return dex.swap({
+        "swaps" : swaps,
+        "amount_in" : amount_in,
+        "min_amount_out" : 1,
+        "lambda" : flash_lambda,
+        "receiver" : julian,
+        "referrer" : alice,
+        "deadline" : FAR_FUTURE
+    })
+
+def swap_hops(hops):
+    def step(chain, dex):
+        chain.execute(swap(dex, long_route[:hops], 1_000_000))
+    return step
+
+def swap_tez_in(chain, dex):
+    chain.execute(swap(dex, [{"pair_id": 0, "direction": "b_to_a"}], 1_000_000), amount=1_000_000)
+
+def swap_fa12(chain, dex):
+    chain.execute(swap(dex, [{"pair_id": 4, "direction": "a_to_b"}], 1_000_000))
+
+def invest(pair_id, tez=False):
+    def step(chain, dex):
+        call = dex.invest_liquidity(pair_id=pair_id, token_a_in=1_000_000, token_b_in=1_000_000, shares=1_000_000,
+            shares_receiver=alice, candidate=dummy_candidate, deadline=FAR_FUTURE)
+        chain.execute(call, amount=1_000_000 if tez else 0, sender=alice)
+    return step
+
+def divest(pair_id):
+    def step(chain, dex):
+        call = dex.divest_liquidity(pair_id=pair_id, min_token_a_out=1, min_token_b_out=1, shares=1_000_000,
+            liquidity_receiver=me, candidate=dummy_candidate, deadline=FAR_FUTURE)
+        chain.execute(call, sender=me)
+    return step
+
+def flash_swap(chain, dex):
+    flash_lambda = open("./scenario/flash_loan_lambda.tz", "r").read()
+    chain.execute(swap(dex, [{"pair_id": 2, "direction": "a_to_b"}], 1_000_000, flash_lambda))
+
+def bucket_vote(chain, ct):
+    chain.execute(ct.vote(bob, carol, True, 50), sender=dex_core, view_results=vr)
+
+def bucket_withdraw_rewards(chain, ct):
+    chain.execute(ct.withdraw_rewards(alice, alice), view_results=vr, sender=dex_core)
+
+def auction_launch(chain, ct):
+    chain.execute(ct.launch_auction(token_a_fa2, 10, 100), sender=alice)
+
+def auction_place_bid(chain, ct):
+    chain.execute(ct.place_bid(0, 107), sender=bob)
+
+def auction_claim(chain, ct):
+    chain.execute(ct.claim(0))
+
+# name: (artifact, warm state, step)
+benchmarks = {}
+for hops in range(1, len(long_route) + 1):
+    benchmarks[f"swap_{hops}_hops"] = (DEX_PATH, warm_dex, swap_hops(hops))
+benchmarks.update({
+    "swap_tez_in": (DEX_PATH, warm_dex, swap_tez_in),
+    "swap_fa12": (DEX_PATH, warm_dex, swap_fa12),
+    "invest_fa2": (DEX_PATH, warm_dex, invest(2)),
+    "invest_tez": (DEX_PATH, warm_dex, invest(0, tez=True)),
+    "divest_fa2": (DEX_PATH, warm_dex, divest(2)),
+    "divest_tez": (DEX_PATH, warm_dex, divest(0)),
+    "flash_swap": (DEX_PATH, warm_dex, flash_swap),
+    "bucket_vote": (BUCKET_PATH, warm_bucket, bucket_vote),
+    "bucket_withdraw_rewards": (BUCKET_PATH, warm_bucket, bucket_withdraw_rewards),
+    "auction_launch": (AUCTION_PATH, lambda: warm_auction("received"), auction_launch),
+    "auction_place_bid": (AUCTION_PATH, lambda: warm_auction("launched"), auction_place_bid),
+    "auction_claim": (AUCTION_PATH, lambda: warm_auction("finished"), auction_claim),
+})
+
+""" time `repeat` runs of a benchmark from its warm state, then measure its calls in one instrumented run """
+def run_benchmark(name, repeat=5):
+    _, warm, step = benchmarks[name]
+    chain, ct = warm()
+    snapshot = chain.snapshot()
+
+    durations = []
+    try:
+        # the first run is a warm-up
+        for _ in range(repeat + 1):
+            chain.rollback(snapshot)
+            started = time.perf_counter()
+            step(chain, ct)
+            durations.append(time.perf_counter() - started)
+
+        chain.rollback(snapshot)
+        metrics = chain.instrument(CallMetrics())
+        step(chain, ct)
+    finally:
+        chain.metrics = None
+        chain.rollback(snapshot)
+
+    samples = [sample for key_samples in metrics.samples.values() for sample in key_samples]
+    durations = durations[1:]
+    return {
+        "median_ms": statistics.median(durations) * 1000,
+        "min_ms": min(durations) * 1000,
+        "instructions": sum(sample["instructions"] for sample in samples),
+        "storage_size": max(sample["storage_size"] for sample in samples),
+        "operations": sum(sample["operations"] for sample in samples),
+    }
+
+"""
+regressions of results against a baseline: median time above `tolerance` (a fraction) or instructions above
+`instruction_tolerance`. Benchmarks missing on either side are left out
+"""
+def compare(results, baseline, tolerance=0.25, instruction_tolerance=0.0):
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["median_ms"] > base["median_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: {result['median_ms']:.1f} ms, baseline {base['median_ms']:.1f} ms")
+        if result["instructions"] > base["instructions"] * (1 + instruction_tolerance):
+            regressions.append(f"{name}: {result['instructions']} instructions, baseline {base['instructions']}")
+    return regressions
+
+def load_baseline(path):
+    with open(path) as f:
+        results = json.load(f)["results"]
+    if any("instructions" not in result for result in results.values()):
+        raise ValueError(f"{path} counts instructions as `gas`, save the baseline again")
+    return results
+
+def save_baseline(path, results):
+    data = {
+        "python": platform.python_version(),
+        "pytezos": version("pytezos"),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scenario entrypoints")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write the results as a baseline")
+    parser.add_argument("--baseline", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown of the median time")
+    parser.add_argument("--instruction-tolerance", type=float, default=0.0,
+        help="allowed growth of the instruction count")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in benchmarks]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.names or benchmarks:
+        artifact = benchmarks[name][0]
+        if not os.path.exists(artifact):
+            print(f"{name:26} skipped, {artifact} is not built")
+            continue
+        result = run_benchmark(name, args.repeat)
+        results[name] = result
+        print(f"{name:26} {result['median_ms']:9.1f} ms {result['instructions']:8} instructions "
+            f"{result['storage_size']:9} bytes", flush=True)
+
+    if args.save:
+        save_baseline(args.save, results)
+
+    if args.baseline:
+        regressions = compare(results, load_baseline(args.baseline), args.tolerance,
+            args.instruction_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("no regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import numpy as np
+
+from dex_model import PRECISION, ERR_NOT_A_NAT, fail, get_nat_or_fail, ceil_div
+
+# a struct-of-arrays model of the bucket reward accounting (update_rewards and update_user_reward in
+# bucket_helpers.ligo) for many voters at once, exact to the contract's integer math.
+# Calls batched at one level see the same reward_per_share, so a batch is one update_rewards followed by
+# array updates. Reward amounts outgrow int64 quickly, so they are kept as python ints in object arrays
+
+class BucketModel():
+    def __init__(self, collecting_period=10, baker_rate=0, collecting_period_end=0, level=0, capacity=1024):
+        # results of the dex_core views the bucket calls
+        self.collecting_period = collecting_period
+        self.baker_rate = baker_rate
+
+        self.level = level
+        self.collecting_period_end = collecting_period_end
+        self.last_update_level = 0
+        self.total_supply = 0
+        self.reward_per_share = 0
+        self.reward_per_block = 0
+        self.next_reward = 0
+        self.reward_paid = 0
+        self.baker_fund = 0
+
+        self.rows = {}
+        self.addresses = []
+        self.votes = np.zeros(capacity, dtype=object)
+        self.reward_f = np.zeros(capacity, dtype=object)
+        self.reward_paid_f = np.zeros(capacity, dtype=object)
+
+    """ the model of a bucket storage, e.g. chain.storage of a bucket LocalChain """
+    @classmethod
+    def from_storage(cls, storage, collecting_period, baker_rate=0, level=0):
+        model = cls(collecting_period, baker_rate, storage["collecting_period_end"], level)
+        for name in ["last_update_level", "total_supply", "reward_per_share", "reward_per_block",
+                     "next_reward", "reward_paid", "baker_fund"]:
+            setattr(model, name, storage[name])
+
+        users = dict(storage["users"])
+        rewards = dict(storage["users_rewards"])
+        addresses = list(users) + [address for address in rewards if address not in users]
+        rows = model.user_rows(addresses)
+        for row, address in zip(rows, addresses):
+            model.votes[row] = users[address]["votes"] if address in users else 0
+            if address in rewards:
+                model.reward_f[row] = rewards[address]["reward_f"]
+                model.reward_paid_f[row] = rewards[address]["reward_paid_f"]
+        return model
+
+    def grow(self, size):
+        capacity = len(self.votes)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ["votes", "reward_f", "reward_paid_f"]:
+            array = np.zeros(capacity, dtype=object)
+            array[:len(self.addresses)] = getattr(self, name)[:len(self.addresses)]
+            setattr(self, name, array)
+
+    """ rows of the users, new users start with the contract's defaults """
+    def user_rows(self, addresses):
+        self.grow(len(self.rows) + len(addresses))
+        rows = np.empty(len(addresses), dtype=np.int64)
+        for i, address in enumerate(addresses):
+            row = self.rows.get(address)
+            if row is None:
+                row = self.rows[address] = len(self.addresses)
+                self.addresses.append(address)
+            rows[i] = row
+        return rows
+
+    def user(self, address):
+        row = self.rows.get(address)
+        if row is None:
+            return {"votes": 0, "reward_f": 0, "reward_paid_f": 0}
+        return {
+            "votes": self.votes[row],
+            "reward_f": self.reward_f[row],
+            "reward_paid_f": self.reward_paid_f[row],
+        }
+
+    def advance_blocks(self, count=1):
+        self.level += count
+
+    def update_rewards(self):
+        if self.total_supply > 0:
+            rewards_level = min(self.level, self.collecting_period_end)
+            new_reward = get_nat_or_fail(rewards_level - self.last_update_level) * self.reward_per_block
+            self.reward_per_share += new_reward // self.total_supply
+
+            if self.level > self.collecting_period_end:
+                elapsed = self.level - self.collecting_period_end
+                period_duration = (elapsed // self.collecting_period + 1) * self.collecting_period
+                self.reward_per_block = self.next_reward * PRECISION // period_duration
+
+                new_reward = elapsed * self.reward_per_block
+                self.collecting_period_end += period_duration
+                self.reward_per_share += new_reward // self.total_supply
+                self.next_reward = 0
+        self.last_update_level = self.level
+
+    def update_user_rewards(self, rows, new_votes):
+        accrued = self.votes[rows] * self.reward_per_share - self.reward_paid_f[rows]
+        if len(accrued) and accrued.min() < 0:
+            fail(ERR_NOT_A_NAT)
+        self.reward_f[rows] += accrued
+        self.reward_paid_f[rows] = new_votes * self.reward_per_share
+
+    """ deposit of baking rewards, the `default` entrypoint """
+    def default(self, amount):
+        baker_fund = ceil_div(amount * self.baker_rate, PRECISION)
+        self.baker_fund += baker_fund
+        self.next_reward += get_nat_or_fail(amount - baker_fund)
+        self.update_rewards()
+
+    """
+    `vote` of every voter at the current level. A user voting twice in a batch ends up the same as
+    voting once with the last amount, so only the last vote of each user is applied
+    """
+    def vote(self, voters, votes):
+        last = {}
+        for voter, amount in zip(voters, votes):
+            last[voter] = amount
+        voters, votes = list(last), np.array(list(last.values()), dtype=object)
+
+        self.update_rewards()
+        while self.total_supply == 0 and len(voters) > 1:
+            # with no supply update_rewards is a no-op, so the vote that brings supply in
+            # lets the next call run it for real and has to be applied on its own
+            self.apply_votes(voters[:1], votes[:1])
+            voters, votes = voters[1:], votes[1:]
+            self.update_rewards()
+        self.apply_votes(voters, votes)
+
+    def apply_votes(self, voters, votes):
+        rows = self.user_rows(voters)
+        previous = self.votes[rows]
+        self.update_user_rewards(rows, votes)
+        self.total_supply = get_nat_or_fail(self.total_supply - previous.sum()) + votes.sum()
+        self.votes[rows] = votes
+
+    """ `withdraw_rewards` of every user at the current level, returns the tez paid to each of them """
+    def withdraw_rewards(self, users):
+        self.update_rewards()
+        payouts = np.zeros(len(users), dtype=object)
+        first = {}
+        for i, user in enumerate(users):
+            first.setdefault(user, i)
+        if not first:
+            return payouts
+
+        rows = self.user_rows(list(first))
+        self.update_user_rewards(rows, self.votes[rows])
+
+        reward_f = self.reward_f[rows]
+        # the contract pays out only above one full mutez
+        paid = np.where(reward_f > PRECISION, reward_f // PRECISION, 0)
+        self.reward_f[rows] = reward_f - paid * PRECISION
+        self.reward_paid += int(paid.sum())
+
+        payouts[list(first.values())] = paid
+        return payouts
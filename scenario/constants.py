@@ -12,7 +12,7 @@ MIN_RAMP_TIME=86_400
 dex_core = "KT18fp5rcTW7mbWDmzFwjLDUhs5MeJmagDSZ"
 bucket = "KT1Mjjcb6tmSsLm7Cb3DSQszePjfchPM4Uxm"
 auction = "KT19kgnqC5VWoxktLRdRUERbyUPku9YioE8W"
-flash_swaps_proxy = "KT19kgnqC5VWoxktLRdRUERbyUPku9YioE8W"
+flash_swaps_proxy = "KT1Uc1fVF7eeoX8XU3yMyZrFhptx4YkakLqu"
 
 token_a_address = "KT18amZmM5W7qDWVt2pH6uj7sCEd3kbzLrHT"
 token_b_address = "KT1AxaBxkFLCUi3f8rdDAAxBKHfzY8LfKDRA"
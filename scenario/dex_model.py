@@ -0,0 +1,349 @@
+from pytezos import MichelsonRuntimeError
+
+from helpers import CowMap
+
+# a python model of the dex_core swap and liquidity entrypoints (dex_core_helpers.ligo, dex_core_lambdas.ligo),
+# it works on the storage LocalChain holds and reproduces the contract's integer math exactly
+
+PRECISION = int(1e18)
+
+ERR_ZERO_A_IN = "105"
+ERR_ZERO_B_IN = "106"
+ERR_PAIR_LISTED = "107"
+ERR_PAIR_NOT_LISTED = "108"
+ERR_NO_LIQUIDITY = "109"
+ERR_NO_SHARES_EXPECTED = "110"
+ERR_LOW_TOKEN_A_IN = "111"
+ERR_LOW_TOKEN_B_IN = "112"
+ERR_BUCKET_404 = "113"
+ERR_INSUFFICIENT_LIQUIDITY = "114"
+ERR_DUST_OUT = "115"
+ERR_HIGH_MIN_OUT = "116"
+ERR_EMPTY_ROUTE = "117"
+ERR_ZERO_IN = "118"
+ERR_WRONG_ROUTE = "119"
+ERR_CAN_NOT_PERFORM_VOTING = "140"
+ERR_WRONG_RESERVES_STATE = "141"
+ERR_ACTION_OUTDATED = "143"
+ERR_NOT_A_NAT = "406"
+
+""" raise the way a FAILWITH surfaces from the interpreter, so `args[-1]` compares to Errors """
+def fail(code):
+    raise MichelsonRuntimeError(f"'{code}'")
+
+def get_nat_or_fail(number):
+    if number < 0:
+        fail(ERR_NOT_A_NAT)
+    return number
+
+def ceil_div(numerator, denominator):
+    result, rest = divmod(numerator, denominator)
+    return result + 1 if rest > 0 else result
+
+def is_tez(token):
+    return "tez" in token
+
+""" big_maps keyed by token_t hold the key form: ("fa12", address) or ("fa2", (address, id)) """
+def token_key(token):
+    if isinstance(token, tuple):
+        return token
+    if is_tez(token):
+        return ("tez", None)
+    if "fa12" in token:
+        return ("fa12", token["fa12"])
+    fa2 = token["fa2"]
+    return ("fa2", (fa2["token"], fa2["id"]))
+
+def direction_of(swap):
+    direction = swap["direction"]
+    if isinstance(direction, dict):
+        (direction,) = direction.keys()
+    return direction
+
+def form_swap_data(pair, tokens, direction):
+    side_a = (pair["token_a_pool"], tokens["token_a"])
+    side_b = (pair["token_b_pool"], tokens["token_b"])
+    if direction == "a_to_b":
+        return side_a, side_b
+    return side_b, side_a
+
+def form_pools(from_pool, to_pool, direction):
+    if direction == "a_to_b":
+        return from_pool, to_pool
+    return to_pool, from_pool
+
+def calc_cumulative_prices(pair, new_tok_a_pool, new_tok_b_pool, now):
+    pair = dict(pair)
+    time_elapsed = get_nat_or_fail(now - pair["last_block_timestamp"])
+
+    if time_elapsed > 0 and pair["token_a_pool"] > 0 and pair["token_b_pool"] > 0:
+        pair["token_a_price_cml"] += ceil_div(pair["token_b_pool"] * PRECISION, pair["token_a_pool"]) * time_elapsed
+        pair["token_b_price_cml"] += ceil_div(pair["token_a_pool"] * PRECISION, pair["token_b_pool"]) * time_elapsed
+
+    pair["token_a_pool"] = new_tok_a_pool
+    pair["token_b_pool"] = new_tok_b_pool
+    pair["last_block_timestamp"] = now
+    return pair
+
+"""
+collects the big_map entries a swap touches on top of the untouched storage,
+`storage()` then builds the new storage sharing everything else
+"""
+class SwapState():
+    def __init__(self, storage):
+        self.base = storage
+        self.changes = {}
+
+    def get(self, big_map, key, default=None):
+        changes = self.changes.get(big_map)
+        if changes is not None and key in changes:
+            return changes[key]
+        value = self.base["storage"][big_map].get(key)
+        return default if value is None else value
+
+    def set(self, big_map, key, value):
+        self.changes.setdefault(big_map, {})[key] = value
+
+    def storage(self):
+        inner = dict(self.base["storage"])
+        for big_map, changes in self.changes.items():
+            current = inner[big_map]
+            if isinstance(current, CowMap):
+                inner[big_map] = current.derive(changes)
+            else:
+                inner[big_map] = {**current, **changes}
+
+        storage = dict(self.base)
+        storage["storage"] = inner
+        return storage
+
+def update_fees(state, pair_id, token_in, referrer, interface_fee, auction_fee):
+    if is_tez(token_in):
+        key = (pair_id, referrer)
+        state.set("interface_tez_fee", key, state.get("interface_tez_fee", key, 0) + interface_fee)
+        state.set("auction_tez_fee", pair_id, state.get("auction_tez_fee", pair_id, 0) + auction_fee)
+    else:
+        token = token_key(token_in)
+        key = (token, referrer)
+        state.set("interface_fee", key, state.get("interface_fee", key, 0) + interface_fee)
+        state.set("auction_fee", token, state.get("auction_fee", token, 0) + auction_fee)
+
+class SwapResult():
+    def __init__(self, amount_out, token_out, from_bucket, forwards, storage):
+        self.amount_out = amount_out
+        self.token_out = token_out
+        # the bucket paying out tez to the receiver, None for token outputs
+        self.from_bucket = from_bucket
+        # pour_over forwards between buckets in the order the contract emits them
+        self.forwards = forwards
+        self.storage = storage
+
+def swap_internal(state, tmp, params, now):
+    pair_id = params["pair_id"]
+    direction = direction_of(params)
+    pair = state.get("pairs", pair_id)
+    if pair is None:
+        fail(ERR_PAIR_NOT_LISTED)
+
+    if pair["token_a_pool"] * pair["token_b_pool"] == 0:
+        fail(ERR_NO_LIQUIDITY)
+    if tmp["amount_in"] == 0:
+        fail(ERR_ZERO_IN)
+
+    tokens = state.get("tokens", pair_id)
+    if tokens is None:
+        fail(ERR_PAIR_NOT_LISTED)
+    (from_pool, from_token), (to_pool, to_token) = form_swap_data(pair, tokens, direction)
+
+    if from_token != tmp["token_in"]:
+        fail(ERR_WRONG_ROUTE)
+
+    fees = state.base["storage"]["fees"]
+    amount_in = tmp["amount_in"]
+    fee_rate = fees["interface_fee"] + fees["swap_fee"] + fees["auction_fee"]
+    rate_without_fee = get_nat_or_fail(PRECISION - fee_rate)
+
+    from_in_with_fee = amount_in * rate_without_fee
+    numerator = from_in_with_fee * to_pool
+    denominator = from_pool * PRECISION + from_in_with_fee
+    out = numerator // denominator
+
+    interface_fee = amount_in * fees["interface_fee"]
+    amount_with_swap_fee = (from_in_with_fee + amount_in * fees["swap_fee"]) // PRECISION
+    auction_fee = get_nat_or_fail(amount_in * PRECISION - amount_with_swap_fee * PRECISION - interface_fee)
+
+    update_fees(state, pair_id, tmp["token_in"], tmp["referrer"], interface_fee, auction_fee)
+
+    if is_tez(tmp["token_in"]) and tmp["counter"] > 0:
+        if tmp["from_bucket"] is None or pair["bucket"] is None:
+            fail(ERR_BUCKET_404)
+        tmp["forwards"].append({
+            "from_bucket": tmp["from_bucket"],
+            "to_bucket": pair["bucket"],
+            "amt": amount_in
+        })
+
+    tmp["from_bucket"] = pair["bucket"] if is_tez(to_token) else None
+
+    to_pool = get_nat_or_fail(to_pool - out)
+    from_pool = from_pool + amount_with_swap_fee
+
+    tmp["amount_in"] = out
+    tmp["token_in"] = to_token
+
+    token_a_pool, token_b_pool = form_pools(from_pool, to_pool, direction)
+    state.set("pairs", pair_id, calc_cumulative_prices(pair, token_a_pool, token_b_pool, now))
+
+    tmp["counter"] += 1
+
+""" the state change and output of the `swap` entrypoint without the transfers in, storage isn't mutated """
+def swap(storage, swaps, amount_in, now=0, referrer=None, min_amount_out=0, deadline=None):
+    if deadline is not None and deadline < now:
+        fail(ERR_ACTION_OUTDATED)
+    if len(swaps) == 0:
+        fail(ERR_EMPTY_ROUTE)
+
+    state = SwapState(storage)
+    first_swap = swaps[0]
+    tokens = state.get("tokens", first_swap["pair_id"])
+    if tokens is None or state.get("pairs", first_swap["pair_id"]) is None:
+        fail(ERR_PAIR_NOT_LISTED)
+
+    tmp = {
+        "forwards": [],
+        "token_in": tokens["token_a"] if direction_of(first_swap) == "a_to_b" else tokens["token_b"],
+        "referrer": referrer,
+        "from_bucket": None,
+        "amount_in": amount_in,
+        "counter": 0,
+    }
+    for params in swaps:
+        swap_internal(state, tmp, params, now)
+
+    if tmp["amount_in"] < min_amount_out:
+        fail(ERR_HIGH_MIN_OUT)
+
+    return SwapResult(tmp["amount_in"], tmp["token_in"], tmp["from_bucket"], tmp["forwards"], state.storage())
+
+""" just the amount out of a swaps list """
+def quote(storage, swaps, amount_in, now=0):
+    return swap(storage, swaps, amount_in, now).amount_out
+
+class LiquidityResult():
+    def __init__(self, token_a, token_b, shares, storage):
+        # tokens moved in (launch, invest) or out (divest)
+        self.token_a = token_a
+        self.token_b = token_b
+        # the shares balance of the user afterwards
+        self.shares = shares
+        self.storage = storage
+
+def check_deadline(deadline, now):
+    if deadline is not None and deadline < now:
+        fail(ERR_ACTION_OUTDATED)
+
+def get_pair(state, pair_id):
+    pair = state.get("pairs", pair_id)
+    if pair is None:
+        fail(ERR_PAIR_NOT_LISTED)
+    return pair
+
+""" relaunch of an already listed pair that was drained, new listings aren't modelled """
+def launch_exchange(storage, pair_id, token_a_in, token_b_in, receiver, now=0, deadline=None):
+    check_deadline(deadline, now)
+    state = SwapState(storage)
+    pair = get_pair(state, pair_id)
+
+    if token_a_in == 0:
+        fail(ERR_ZERO_A_IN)
+    if token_b_in == 0:
+        fail(ERR_ZERO_B_IN)
+    if pair["total_supply"] != 0:
+        fail(ERR_PAIR_LISTED)
+
+    init_shares = min(token_a_in, token_b_in)
+    updated_pair = calc_cumulative_prices(pair, token_a_in, token_b_in, now)
+    updated_pair["total_supply"] = init_shares
+
+    state.set("ledger", (receiver, pair_id), init_shares)
+    state.set("pairs", pair_id, updated_pair)
+    return LiquidityResult(token_a_in, token_b_in, init_shares, state.storage())
+
+def invest_liquidity(storage, pair_id, shares, token_a_in, token_b_in, receiver, now=0, deadline=None):
+    check_deadline(deadline, now)
+    state = SwapState(storage)
+    pair = get_pair(state, pair_id)
+
+    if pair["token_a_pool"] * pair["token_b_pool"] == 0:
+        fail(ERR_NO_LIQUIDITY)
+    if shares == 0:
+        fail(ERR_NO_SHARES_EXPECTED)
+
+    tokens_a_required = ceil_div(shares * pair["token_a_pool"], pair["total_supply"])
+    tokens_b_required = ceil_div(shares * pair["token_b_pool"], pair["total_supply"])
+
+    if tokens_a_required > token_a_in:
+        fail(ERR_LOW_TOKEN_A_IN)
+    if tokens_b_required > token_b_in:
+        fail(ERR_LOW_TOKEN_B_IN)
+
+    balance = state.get("ledger", (receiver, pair_id), 0) + shares
+    state.set("ledger", (receiver, pair_id), balance)
+
+    updated_pair = calc_cumulative_prices(
+        pair,
+        pair["token_a_pool"] + tokens_a_required,
+        pair["token_b_pool"] + tokens_b_required,
+        now
+    )
+    updated_pair["total_supply"] += shares
+    state.set("pairs", pair_id, updated_pair)
+    return LiquidityResult(tokens_a_required, tokens_b_required, balance, state.storage())
+
+def divest_liquidity(storage, pair_id, shares, sender, min_token_a_out=1, min_token_b_out=1, now=0, deadline=None):
+    check_deadline(deadline, now)
+    state = SwapState(storage)
+    pair = get_pair(state, pair_id)
+
+    if pair["token_a_pool"] * pair["token_b_pool"] == 0:
+        fail(ERR_NO_LIQUIDITY)
+
+    balance = state.get("ledger", (sender, pair_id), 0)
+    if shares > balance:
+        fail(ERR_INSUFFICIENT_LIQUIDITY)
+    state.set("ledger", (sender, pair_id), balance - shares)
+
+    token_a_divested = shares * pair["token_a_pool"] // pair["total_supply"]
+    token_b_divested = shares * pair["token_b_pool"] // pair["total_supply"]
+
+    if min_token_a_out == 0 or min_token_b_out == 0:
+        fail(ERR_DUST_OUT)
+    if token_a_divested < min_token_a_out or token_b_divested < min_token_b_out:
+        fail(ERR_HIGH_MIN_OUT)
+
+    updated_pair = calc_cumulative_prices(
+        pair,
+        get_nat_or_fail(pair["token_a_pool"] - token_a_divested),
+        get_nat_or_fail(pair["token_b_pool"] - token_b_divested),
+        now
+    )
+    updated_pair["total_supply"] = get_nat_or_fail(updated_pair["total_supply"] - shares)
+
+    # either the pair is drained completely or nothing of it is
+    reserves = (updated_pair["total_supply"], updated_pair["token_a_pool"], updated_pair["token_b_pool"])
+    if any(reserves) and not all(reserves):
+        fail(ERR_WRONG_RESERVES_STATE)
+
+    state.set("pairs", pair_id, updated_pair)
+    return LiquidityResult(token_a_divested, token_b_divested, balance - shares, state.storage())
+
+""" the votes dex_core sends to the pair's bucket """
+def vote(storage, pair_id, sender):
+    state = SwapState(storage)
+    pair = get_pair(state, pair_id)
+    balance = state.get("ledger", (sender, pair_id), 0)
+    if balance == 0:
+        fail(ERR_CAN_NOT_PERFORM_VOTING)
+    if pair["bucket"] is None:
+        fail(ERR_BUCKET_404)
+    return balance
@@ -0,0 +1,107 @@
+from hashlib import blake2b
+
+from helpers import CowMap, find_big_maps, get_path, map_big_maps, _removed
+
+# a fingerprint of a whole storage that follows LocalChain calls at the cost of what they changed.
+# Every top-level field outside the big_maps has its own hash and every big_map the sum of its entries'
+# hashes, so a call only rehashes the entries it touched; the root hashes those together. Equal storages
+# have equal fingerprints whatever calls led to them. Rollbacks restore the fingerprint in place, so the
+# object `track` returned keeps following the chain; a fork gets a copy.
+#
+#   fingerprint = chain.track(StorageFingerprint.of(ct))
+#   ...
+#   if fingerprint.digest() == StorageFingerprint.of(ct).reset(other.storage).digest():
+#       ...
+
+MODULUS = 1 << 128
+
+def hash_value(value):
+    return blake2b(repr(value).encode(), digest_size=16).digest()
+
+def entry_hash(key, value):
+    return int.from_bytes(hash_value((key, value)), "little")
+
+""" the entries `new` changed over `old`, removed ones map to _removed, see CowMap.changes """
+def big_map_changes(old, new):
+    return CowMap.changes(old if old is not None else {}, new)
+
+class StorageFingerprint():
+    def __init__(self, big_maps):
+        self.big_maps = big_maps
+        # field name -> hash of its value with the big_maps left out, and the value it was computed on
+        self.fields = {}
+        self.values = {}
+        # big_map path -> sum of its entry hashes
+        self.sums = {}
+
+    @classmethod
+    def of(cls, interface):
+        return cls(find_big_maps(interface.context))
+
+    """ hash a storage from scratch """
+    def reset(self, storage):
+        self.hash_fields(storage)
+        self.sums = {}
+        for path in self.big_maps:
+            big_map = get_path(storage, path) or {}
+            self.sums[path] = sum(entry_hash(key, value) for key, value in big_map.items()) % MODULUS
+        return self
+
+    """ called by LocalChain.track """
+    def start(self, chain):
+        if chain.big_maps is None:
+            chain.big_maps = self.big_maps
+        self.reset(chain.storage)
+
+    def hash_fields(self, storage):
+        self.values = map_big_maps(storage, self.big_maps, lambda path, big_map: None)
+        self.fields = {name: hash_value(value) for name, value in self.values.items()}
+
+    """
+    follow a call that took the storage from `old` to `new`. Only the fields that differ from the values
+    hashed last are rehashed; a field the call left alone is usually the same object, otherwise it's compared
+    """
+    def update(self, old, new):
+        values = map_big_maps(new, self.big_maps, lambda path, big_map: None)
+        for name, value in values.items():
+            previous = self.values.get(name, _removed)
+            if previous is not value and previous != value:
+                self.fields[name] = hash_value(value)
+        for name in self.values.keys() - values.keys():
+            del self.fields[name]
+        self.values = values
+        for path in self.big_maps:
+            old_map = get_path(old, path)
+            changes = big_map_changes(old_map, get_path(new, path))
+            total = self.sums[path]
+            for key, value in changes.items():
+                if old_map is not None and key in old_map:
+                    total -= entry_hash(key, old_map[key])
+                if value is not _removed:
+                    total += entry_hash(key, value)
+            self.sums[path] = total % MODULUS
+        return self
+
+    def digest(self):
+        root = blake2b(digest_size=16)
+        for name in sorted(self.fields, key=repr):
+            root.update(repr(name).encode())
+            root.update(self.fields[name])
+        for path in self.big_maps:
+            root.update(repr(path).encode())
+            root.update(self.sums[path].to_bytes(16, "little"))
+        return root.digest()
+
+    """ the hashes, for LocalChain.snapshot """
+    def save(self):
+        return dict(self.fields), self.values, dict(self.sums)
+
+    """ go back to a saved state in place, e.g. on LocalChain.rollback; the state can be restored again """
+    def restore(self, state):
+        fields, self.values, sums = state
+        self.fields, self.sums = dict(fields), dict(sums)
+
+    def copy(self):
+        fingerprint = StorageFingerprint(self.big_maps)
+        fingerprint.restore(self.save())
+        return fingerprint
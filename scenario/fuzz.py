@@ -0,0 +1,460 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# differential fuzzing of dex_core: seeded random sequences of swaps, invests, divests, votes and relaunches
+# run on the compiled contract and on dex_model side by side, every step has to agree on the error code,
+# the touched pairs and ledger entries and the amounts paid out. Without the build (or with --model-only)
+# only the model runs and its invariants are checked, which is a few orders of magnitude faster.
+#
+#   python3 scenario/fuzz.py --cases 200 -j 8
+#   python3 scenario/fuzz.py --replay 1234 -v
+#   python3 scenario/fuzz.py --model-only --cases 10000
+
+SCENARIO_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCENARIO_DIR not in sys.path:
+    sys.path.insert(0, SCENARIO_DIR)
+
+from pytezos import MichelsonRuntimeError
+
+from helpers import *
+from constants import *
+from loader import load_contract
+from initial_storage import get_dex_core_lambdas
+import dex_model
+
+DEX_PATH = "./build/dex_core.json"
+
+fuzz_fees = {
+    "interface_fee" : int(0.003 * 1e18),
+    "swap_fee" : int(0.002 * 1e18),
+    "auction_fee" : int(0.001 * 1e18),
+    "withdraw_fee_reward" : int(0.003 * 1e18)
+}
+
+# pairs listed before every case, with the initial pools
+initial_pairs = [
+    (tez_pair, 100_000, 300_000),
+    (tez_pair_b, 500_000, 700_000),
+    (pair_ab, 400_000, 200_000),
+]
+
+users = [me, alice, bob]
+receiver = julian
+
+action_weights = {
+    "swap": 6,
+    "invest": 3,
+    "divest": 3,
+    "vote": 1,
+    "launch": 1,
+    "wait": 2,
+}
+
+class FuzzFailure(AssertionError):
+    def __init__(self, seed, step, action, message):
+        self.seed = seed
+        self.step = step
+        self.action = action
+        super().__init__(f"seed {seed}, step {step}: {message}\n  action: {action}\n"
+            f"  replay with: python3 scenario/fuzz.py --replay {seed} -v")
+
+def is_tez_pair(pair):
+    return dex_model.is_tez(pair["token_b"])
+
+""" storage the model starts from when there is no contract: the same pairs launched by `me` """
+def model_storage():
+    storage = {
+        "pairs": {},
+        "tokens": {},
+        "ledger": {},
+        "fees": fuzz_fees,
+        "interface_fee": {},
+        "interface_tez_fee": {},
+        "auction_fee": {},
+        "auction_tez_fee": {},
+    }
+    for pair_id, (pair, _, _) in enumerate(initial_pairs):
+        storage["tokens"][pair_id] = pair
+        storage["pairs"][pair_id] = {
+            "token_a_pool": 0,
+            "token_b_pool": 0,
+            "token_a_price_cml": 0,
+            "token_b_price_cml": 0,
+            "total_supply": 0,
+            "last_block_timestamp": 0,
+            "bucket": bucket if is_tez_pair(pair) else None,
+        }
+
+    storage = {"storage": storage}
+    for pair_id, (_, token_a_in, token_b_in) in enumerate(initial_pairs):
+        storage = dex_model.launch_exchange(storage, pair_id, token_a_in, token_b_in, me).storage
+    return storage
+
+def random_amount(rng, scale):
+    return max(1, int(scale * rng.choice([0.001, 0.01, 0.1, 0.5, 2]) * rng.random()))
+
+def next_swap(rng, s):
+    pair_id = rng.randrange(len(initial_pairs))
+    direction = rng.choice(["a_to_b", "b_to_a"])
+    pair = s["pairs"][pair_id]
+    (from_pool, _), (_, token_out) = dex_model.form_swap_data(pair, s["tokens"][pair_id], direction)
+    swaps = [{"pair_id": pair_id, "direction": direction}]
+
+    if rng.random() < 0.4:
+        # continue through a pair holding the token just bought, sometimes through any pair
+        hops = []
+        for next_id in range(len(initial_pairs)):
+            tokens = s["tokens"][next_id]
+            if next_id == pair_id:
+                continue
+            if tokens["token_a"] == token_out:
+                hops.append({"pair_id": next_id, "direction": "a_to_b"})
+            elif tokens["token_b"] == token_out:
+                hops.append({"pair_id": next_id, "direction": "b_to_a"})
+        if hops and rng.random() < 0.9:
+            swaps.append(rng.choice(hops))
+        else:
+            swaps.append({"pair_id": rng.randrange(len(initial_pairs)), "direction": rng.choice(["a_to_b", "b_to_a"])})
+
+    amount_in = 0 if rng.random() < 0.02 else random_amount(rng, from_pool or 1_000)
+    return {
+        "kind": "swap",
+        "sender": rng.choice(users),
+        "swaps": swaps,
+        "amount_in": amount_in,
+        "min_amount_out": amount_in * 10 if rng.random() < 0.05 else 1,
+        "referrer": rng.choice(users),
+    }
+
+def next_invest(rng, s):
+    pair_id = rng.randrange(len(initial_pairs))
+    pair = s["pairs"][pair_id]
+    total_supply = pair["total_supply"]
+
+    shares = 0 if rng.random() < 0.03 else random_amount(rng, total_supply or 1_000)
+    if total_supply:
+        token_a_in = dex_model.ceil_div(shares * pair["token_a_pool"], total_supply)
+        token_b_in = dex_model.ceil_div(shares * pair["token_b_pool"], total_supply)
+    else:
+        token_a_in = token_b_in = shares
+
+    token_a_in += rng.randint(0, 3)
+    token_b_in += rng.randint(0, 3)
+    short = rng.random()
+    if short < 0.03:
+        token_a_in = max(0, token_a_in - 4)
+    elif short < 0.06:
+        token_b_in = max(0, token_b_in - 4)
+
+    return {
+        "kind": "invest",
+        "sender": rng.choice(users),
+        "pair_id": pair_id,
+        "shares": shares,
+        "token_a_in": token_a_in,
+        "token_b_in": token_b_in,
+    }
+
+def next_divest(rng, s):
+    pair_id = rng.randrange(len(initial_pairs))
+    sender = rng.choice(users)
+    balance = s["ledger"].get((sender, pair_id)) or 0
+    shares = rng.choice([balance, balance + 1, rng.randint(0, balance), rng.randint(0, balance)])
+    return {
+        "kind": "divest",
+        "sender": sender,
+        "pair_id": pair_id,
+        "shares": shares,
+        "min_token_a_out": 0 if rng.random() < 0.03 else 1,
+        "min_token_b_out": 1,
+    }
+
+def next_launch(rng, s):
+    # prefer the drained pairs, relaunching a live one fails
+    drained = [pair_id for pair_id in range(len(initial_pairs)) if s["pairs"][pair_id]["total_supply"] == 0]
+    pair_id = rng.choice(drained) if drained and rng.random() < 0.9 else rng.randrange(len(initial_pairs))
+    return {
+        "kind": "launch",
+        "sender": rng.choice(users),
+        "pair_id": pair_id,
+        "token_a_in": random_amount(rng, 1_000_000),
+        "token_b_in": random_amount(rng, 1_000_000),
+    }
+
+""" the next action of a case, drawn from the current storage so it mostly makes sense """
+def next_action(rng, storage):
+    s = storage["storage"]
+    kind = rng.choices(list(action_weights), weights=list(action_weights.values()))[0]
+    if kind == "swap":
+        return next_swap(rng, s)
+    if kind == "invest":
+        return next_invest(rng, s)
+    if kind == "divest":
+        return next_divest(rng, s)
+    if kind == "launch":
+        return next_launch(rng, s)
+    if kind == "vote":
+        return {"kind": "vote", "sender": rng.choice(users), "pair_id": rng.randrange(len(initial_pairs))}
+    return {"kind": "wait", "blocks": rng.randint(1, 5)}
+
+""" what the model expects: (error code, result) with the result being None on failure """
+def apply_model(storage, action, now):
+    kind = action["kind"]
+    try:
+        if kind == "swap":
+            res = dex_model.swap(storage, action["swaps"], action["amount_in"], now=now,
+                referrer=action["referrer"], min_amount_out=action["min_amount_out"])
+        elif kind == "invest":
+            res = dex_model.invest_liquidity(storage, action["pair_id"], action["shares"],
+                action["token_a_in"], action["token_b_in"], action["sender"], now=now)
+        elif kind == "divest":
+            res = dex_model.divest_liquidity(storage, action["pair_id"], action["shares"], action["sender"],
+                action["min_token_a_out"], action["min_token_b_out"], now=now)
+        elif kind == "launch":
+            res = dex_model.launch_exchange(storage, action["pair_id"], action["token_a_in"],
+                action["token_b_in"], action["sender"], now=now)
+        elif kind == "vote":
+            res = dex_model.vote(storage, action["pair_id"], action["sender"])
+        else:
+            res = None
+    except MichelsonRuntimeError as error:
+        return error.args[-1], None
+    return None, res
+
+def touched_pairs(action):
+    if action["kind"] == "swap":
+        return sorted({params["pair_id"] for params in action["swaps"]})
+    if action["kind"] in ("invest", "divest", "launch"):
+        return [action["pair_id"]]
+    return []
+
+def check_invariants(before, after, action):
+    s_before, s_after = before["storage"], after["storage"]
+    for pair_id in touched_pairs(action):
+        old, new = s_before["pairs"][pair_id], s_after["pairs"][pair_id]
+        for name in ("token_a_pool", "token_b_pool", "total_supply"):
+            if new[name] < 0:
+                return f"negative {name} of pair {pair_id}"
+
+        if action["kind"] == "swap":
+            # the input kept in the pool is rounded down, which may cost the product up to a unit per hop
+            hops = sum(params["pair_id"] == pair_id for params in action["swaps"])
+            if (new["token_a_pool"] + hops) * (new["token_b_pool"] + hops) < old["token_a_pool"] * old["token_b_pool"]:
+                return f"pool product of pair {pair_id} went down"
+
+        if action["kind"] in ("invest", "divest") and new["total_supply"]:
+            # the pools backing a share never shrink
+            for name in ("token_a_pool", "token_b_pool"):
+                if new[name] * old["total_supply"] < old[name] * new["total_supply"]:
+                    return f"{name} per share of pair {pair_id} went down"
+
+        shares = sum(s_after["ledger"].get((user, pair_id)) or 0 for user in users)
+        if shares != new["total_supply"]:
+            return f"ledger of pair {pair_id} holds {shares} shares, total supply is {new['total_supply']}"
+    return None
+
+class ChainTarget():
+    """ the contract side: pairs are launched once, every case starts from a rollback to that state """
+    def __init__(self, path=DEX_PATH):
+        self.dex, storage = load_contract(path)
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
+        storage["storage"]["admin"] = admin
+
+        self.chain = LocalChain(storage=storage)
+        for pair, token_a_in, token_b_in in initial_pairs:
+            amount = token_b_in if is_tez_pair(pair) else 0
+            self.chain.execute(self.dex.launch_exchange(pair, token_a_in, token_b_in, me, dummy_candidate, FAR_FUTURE),
+                amount=amount, sender=me)
+        self.chain.execute(self.dex.set_fees(fuzz_fees), sender=admin)
+        self.warm = self.chain.snapshot()
+
+    def reset(self):
+        self.chain.rollback(self.warm)
+        return self.chain.storage
+
+    def call(self, action):
+        kind = action["kind"]
+        if kind == "swap":
+            first = action["swaps"][0]
+            pair = initial_pairs[first["pair_id"]][0]
+            token_in = pair["token_a"] if dex_model.direction_of(first) == "a_to_b" else pair["token_b"]
+            call = self.dex.swap({
+                "swaps" : action["swaps"],
+                "amount_in" : action["amount_in"],
+                "min_amount_out" : action["min_amount_out"],
+                "lambda" : None,
+                "receiver" : receiver,
+                "referrer" : action["referrer"],
+                "deadline": FAR_FUTURE
+            })
+            return call, action["amount_in"] if dex_model.is_tez(token_in) else 0
+
+        pair = initial_pairs[action["pair_id"]][0]
+        tez_in = is_tez_pair(pair)
+        if kind == "invest":
+            call = self.dex.invest_liquidity(pair_id=action["pair_id"], token_a_in=action["token_a_in"],
+                token_b_in=action["token_b_in"], shares=action["shares"], shares_receiver=action["sender"],
+                candidate=dummy_candidate, deadline=FAR_FUTURE)
+            return call, action["token_b_in"] if tez_in else 0
+        if kind == "divest":
+            call = self.dex.divest_liquidity(pair_id=action["pair_id"], min_token_a_out=action["min_token_a_out"],
+                min_token_b_out=action["min_token_b_out"], shares=action["shares"],
+                liquidity_receiver=action["sender"], candidate=dummy_candidate, deadline=FAR_FUTURE)
+            return call, 0
+        if kind == "launch":
+            call = self.dex.launch_exchange(pair, action["token_a_in"], action["token_b_in"], action["sender"],
+                dummy_candidate, FAR_FUTURE)
+            return call, action["token_b_in"] if tez_in else 0
+        return self.dex.vote(pair_id=action["pair_id"], candidate=dummy_candidate, referral_code=None), 0
+
+    """ runs the action, returns (error code, result) like apply_model """
+    def apply(self, action):
+        if action["kind"] == "wait":
+            self.chain.advance_blocks(action["blocks"])
+            return None, None
+
+        call, amount = self.call(action)
+        try:
+            return None, self.chain.execute(call, amount=amount, sender=action["sender"])
+        except MichelsonRuntimeError as error:
+            return error.args[-1], None
+
+def received(res, address):
+    return sum(tx.amount for tx in iter_transfers(res.operations) if tx.destination == address)
+
+""" differences between the model's prediction and the contract's result of one successful action """
+def compare(action, predicted, res):
+    kind = action["kind"]
+    if kind == "vote":
+        votes = [vote.amount for vote in iter_votes(res.operations)]
+        return None if votes == [predicted] else f"votes: contract {votes}, model {predicted}"
+
+    expected, actual = predicted.storage["storage"], res.storage["storage"]
+
+    for pair_id in touched_pairs(action):
+        if dict(actual["pairs"][pair_id]) != dict(expected["pairs"][pair_id]):
+            return f"pair {pair_id}: contract {dict(actual['pairs'][pair_id])}, model {dict(expected['pairs'][pair_id])}"
+
+    if kind in ("invest", "divest", "launch"):
+        key = (action["sender"], action["pair_id"])
+        if actual["ledger"].get(key) != expected["ledger"].get(key):
+            return f"ledger {key}: contract {actual['ledger'].get(key)}, model {expected['ledger'].get(key)}"
+
+    if kind == "swap":
+        if received(res, receiver) != predicted.amount_out:
+            return f"swap out: contract {received(res, receiver)}, model {predicted.amount_out}"
+        for name in ["interface_fee", "interface_tez_fee", "auction_fee", "auction_tez_fee"]:
+            if dict(actual[name]) != dict(expected[name]):
+                return f"{name}: contract {dict(actual[name])}, model {dict(expected[name])}"
+
+    if kind == "divest" and received(res, action["sender"]) != predicted.token_a + predicted.token_b:
+        return f"divested: contract {received(res, action['sender'])}, model {predicted.token_a + predicted.token_b}"
+    return None
+
+"""
+runs one case, against the contract when a target is given and on the model alone otherwise.
+Raises FuzzFailure naming the seed and the step, returns the trace of (action, error) pairs
+"""
+def run_case(seed, steps=50, target=None, log=None):
+    rng = random.Random(seed)
+    storage = target.reset() if target is not None else model_storage()
+    now = 0
+    trace = []
+
+    for step in range(steps):
+        action = next_action(rng, storage)
+        error, predicted = apply_model(storage, action, now)
+
+        if target is not None:
+            actual_error, res = target.apply(action)
+            if actual_error != error:
+                raise FuzzFailure(seed, step, action, f"contract failed with {actual_error}, model with {error}")
+            message = res is not None and compare(action, predicted, res)
+            if message:
+                raise FuzzFailure(seed, step, action, message)
+
+        if error is None and action["kind"] not in ("vote", "wait"):
+            message = check_invariants(storage, predicted.storage, action)
+            if message:
+                raise FuzzFailure(seed, step, action, message)
+            storage = predicted.storage if target is None else target.chain.storage
+
+        if action["kind"] == "wait":
+            now += action["blocks"] * BLOCK_TIME
+        trace.append((action, error))
+        if log:
+            log(f"{step:4} {error or 'ok':5} {action}")
+
+    return trace
+
+# one target per worker process, built on first use
+target = None
+
+def run_seed(job):
+    global target
+    seed, steps, model_only = job
+    if not model_only and target is None:
+        target = ChainTarget()
+    try:
+        run_case(seed, steps, None if model_only else target)
+    except FuzzFailure as failure:
+        return seed, str(failure)
+    return seed, None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Differential fuzzing of dex_core against dex_model")
+    parser.add_argument("--cases", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first case, the rest follow")
+    parser.add_argument("--replay", type=int, help="run a single seed and print every step")
+    parser.add_argument("--model-only", action="store_true", help="check the model invariants only")
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    model_only = args.model_only or not os.path.exists(DEX_PATH)
+    if model_only and not args.model_only:
+        print(f"{DEX_PATH} is not built, checking the model invariants only")
+
+    if args.replay is not None:
+        try:
+            run_case(args.replay, args.steps, None if model_only else ChainTarget(), log=print if args.verbose else None)
+        except FuzzFailure as failure:
+            print(failure)
+            return 1
+        print(f"seed {args.replay} passed")
+        return 0
+
+    if not model_only:
+        # parse the contract once before the workers are forked
+        load_contract(DEX_PATH)
+        get_dex_core_lambdas()
+
+    started = time.time()
+    jobs = [(seed, args.steps, model_only) for seed in range(args.seed, args.seed + args.cases)]
+    failures = []
+    if args.jobs > 1:
+        with multiprocessing.get_context("fork").Pool(args.jobs) as pool:
+            results = list(pool.imap_unordered(run_seed, jobs))
+    else:
+        results = map(run_seed, jobs)
+
+    for seed, failure in results:
+        if failure:
+            failures.append(seed)
+            print(failure, flush=True)
+        elif args.verbose:
+            print(f"seed {seed} passed", flush=True)
+
+    duration = time.time() - started
+    steps = args.cases * args.steps
+    print(f"\n{args.cases - len(failures)} of {args.cases} cases passed, "
+        f"{steps} steps in {duration:.1f}s ({steps / max(duration, 1e-9):.0f} steps/s)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,24 @@
+import json
+import multiprocessing
 import sys
+from collections import OrderedDict
+from collections.abc import Mapping
+from operator import attrgetter
 from os import urandom
-from pytezos import pytezos
+from pytezos import pytezos, ContractInterface, MichelsonRuntimeError
 
+from pytezos.context.abstract import get_originated_address
+from pytezos.context.impl import ExecutionContext
 from pytezos.crypto.encoding import base58_encode
+from pytezos.michelson.instructions.base import format_stdout
+from pytezos.michelson.instructions.tezos import ViewInstruction
+from pytezos.michelson.micheline import Micheline
+from pytezos.michelson.program import MichelsonProgram
+from pytezos.michelson.sections import ParameterSection, StorageSection
+from pytezos.michelson.stack import MichelsonStack
+from pytezos.michelson.types import BigMapType, OptionType, PairType, UnitType
+
+from ledger import Ledger, LedgerError, TEZ
 
 BLOCK_TIME = 30
 
@@ -65,227 +81,304 @@ def calc_pool_rate(res, pair=-1):
     return tez_pool / token_pool
     
 
+"""
+parsed operations are slotted records, read by attribute (`transfer.amount`) and read-only. They are
+also mappings of the fields that are set, so `transfer["amount"]` works and a record equals the dict it
+stands for. Fields a kind of operation doesn't have are None and left out of the mapping
+"""
+class Record(Mapping):
+    __slots__ = ()
+    # in constructor order, each kept in a `_<field>` slot behind a read-only property
+    fields = ()
+
+    def __getitem__(self, key):
+        value = getattr(self, key) if key in self.fields else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (name for name in self.fields if getattr(self, name) is not None)
+
+    def __len__(self):
+        return sum(getattr(self, name) is not None for name in self.fields)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+def record_fields(cls):
+    for name in cls.fields:
+        setattr(cls, name, property(attrgetter("_" + name)))
+    return cls
+
+""" tez ("tez") or token ("token") transfer; token_id is set for FA2 only """
+@record_fields
+class Transfer(Record):
+    fields = ("type", "destination", "amount", "source", "token_address", "token_id")
+    __slots__ = tuple("_" + name for name in fields)
+
+    def __init__(self, type, destination, amount, source, token_address=None, token_id=None):
+        self._type = type
+        self._destination = destination
+        self._amount = amount
+        self._source = source
+        self._token_address = token_address
+        self._token_id = token_id
+
+@record_fields
+class Vote(Record):
+    fields = ("delegate", "amount", "type")
+    __slots__ = tuple("_" + name for name in fields)
+
+    def __init__(self, delegate, amount, type="vote"):
+        self._delegate = delegate
+        self._amount = amount
+        self._type = type
+
+@record_fields
+class Callback(Record):
+    fields = ("pair_id", "prev_tez_balance", "amount_in", "type")
+    __slots__ = tuple("_" + name for name in fields)
+
+    def __init__(self, pair_id, prev_tez_balance, amount_in, type="flash_swap_callback"):
+        self._pair_id = pair_id
+        self._prev_tez_balance = prev_tez_balance
+        self._amount_in = amount_in
+        self._type = type
+
+# dex_core calling its own `close`, see LocalChain.execute
+@record_fields
+class Close(Record):
+    fields = ("type",)
+    __slots__ = tuple("_" + name for name in fields)
+
+    def __init__(self, type="close"):
+        self._type = type
+
+close_op = Close()
+
+@record_fields
+class Origination(Record):
+    fields = ("balance",)
+    __slots__ = tuple("_" + name for name in fields)
+
+    def __init__(self, balance):
+        self._balance = balance
+
+""" a bucket passing tez on to another contract's `default` """
+@record_fields
+class PourOver(Record):
+    fields = ("destination", "amount", "source")
+    __slots__ = tuple("_" + name for name in fields)
+
+    def __init__(self, destination, amount, source):
+        self._destination = destination
+        self._amount = amount
+        self._source = source
+
+""" dex_core handing a swap fee to the auction """
+@record_fields
+class ReceiveFee(Record):
+    fields = ("fee", "destination", "type")
+    __slots__ = tuple("_" + name for name in fields)
+
+    def __init__(self, fee, destination, type="receive_fee"):
+        self._fee = fee
+        self._destination = destination
+        self._type = type
+
 def parse_tez_transfer(op):
-    dest = op["destination"]
-    amount = int(op["amount"])
-    source = op["source"]
-    return {
-        "type": "tez", 
-        "destination": dest,
-        "amount": amount,
-        "source": source
-    }
+    return Transfer("tez", op["destination"], int(op["amount"]), op["source"])
 
-def parse_as_fa12(value):
+def parse_as_fa12(value, token_address=None):
     args = value["args"]
+    return Transfer("token", args[1]["string"], int(args[2]["int"]), args[0]["string"], token_address)
 
-    return {
-        "type": "token",
-        "amount": int(args[2]["int"]),
-        "destination": args[1]["string"],
-        "source": args[0]["string"]
-    }
-
-def parse_as_fa2(values):
+def parse_as_fa2(values, token_address=None):
     result = []
-    value = values[0]
-    source = value["args"][0]["string"]
-    transfers = value["args"][1]
-    for transfer in transfers:
-        args = transfer["args"]
-
-        amount = args[-1]["int"]
-        amount = int(amount)
-
-        token_id = args[1]["int"]
-        token_id = int(token_id)
-
-        dest = args[0]["string"]
-
-        result.append({
-            "type": "token",
-            "token_id": token_id,
-            "destination": dest,
-            "amount": amount,
-            "source": source
-        })
-
+    for value in values:
+        source = value["args"][0]["string"]
+        for transfer in value["args"][1]:
+            args = transfer["args"]
+            result.append(Transfer("token", args[0]["string"], int(args[-1]["int"]), source, token_address,
+                int(args[1]["int"])))
     return result
 
-def parse_originations(res):
-    originations = []
-    for op in res.operations:
-        if op["kind"] == "origination":
-            orig = {
-                "balance": int(op["balance"])
-            }
-            originations.append(orig)
-    return originations
+def parse_origination(op):
+    return Origination(int(op["balance"]))
 
 def parse_pour_out(op):
-    value = op["parameters"]["value"]
-    args = value["args"]
+    args = op["parameters"]["value"]["args"]
+    return Transfer("tez", args[0]["string"], int(args[1]["int"]), op["destination"])
 
-    return {
-        "type": "tez",
-        "amount": int(args[1]["int"]),
-        "destination": args[0]["string"],
-        "source": op["destination"]
-    }
+def parse_pour_over(op):
+    args = op["parameters"]["value"]["args"]
+    return PourOver(args[0]["string"], int(args[1]["int"]), op["destination"])
 
-def parse_pour_overs(res):
-    result = []
+""" the transfers of a `transfer` call to an FA1.2 or FA2 token """
+def parse_transfer(op):
+    value = op["parameters"]["value"]
+    if not isinstance(value, list):
+        return [parse_as_fa12(value, op["destination"])]
+    return parse_as_fa2(value, op["destination"])
 
-    for op in res.operations:
-        if op["kind"] == "transaction":
-            params = op["parameters"]
-            entrypoint = params["entrypoint"]
-            if entrypoint == "pour_over":
-                args = params["value"]["args"]
-                tx = {
-                    "destination" : args[0]["string"],
-                    "amount" : int(args[1]["int"]),
-                    "source" : op["destination"]
-                }
-                result.append(tx)
+def parse_vote(op):
+    args = op["parameters"]["value"]["args"]
+    return Vote(args[1]["string"], int(args[3]["int"]))
 
-    return result
+def parse_auction_receive_fee(op):
+    args = op["parameters"]["value"]["args"]
+    # args[0] is the token
+    return ReceiveFee(int(args[1]["int"]), op["destination"])
 
-def parse_transfers(res):
-    transfers = []
-    for op in res.operations:
-        if op["kind"] == "transaction":
+def parse_flash_swap_callback(op):
+    args = op["parameters"]["value"]["args"]
+    return Callback(int(args[0]["int"]), int(args[1]["int"]), int(args[2]["int"]))
+
+def iter_transactions(operations, entrypoints):
+    for op in operations:
+        if op["kind"] == "transaction" and op["parameters"]["entrypoint"] in entrypoints:
+            yield op
+
+"""
+the tez and token transfers and closes of a result's operations as parse_ops lists them, one at a time
+and without indexing the rest
+"""
+def iter_ops(operations):
+    for op in iter_transactions(operations, ("default", "transfer", "close")):
+        entrypoint = op["parameters"]["entrypoint"]
+        if entrypoint == "default":
+            yield parse_tez_transfer(op)
+        elif entrypoint == "transfer":
+            yield from parse_transfer(op)
+        else:
+            yield close_op
+
+""" the transfers of a result's operations as parse_transfers lists them, one at a time """
+def iter_transfers(operations):
+    for op in iter_transactions(operations, ("default", "transfer", "pour_out")):
+        entrypoint = op["parameters"]["entrypoint"]
+        if entrypoint == "default":
+            yield parse_tez_transfer(op)
+        elif entrypoint == "transfer":
+            yield from parse_transfer(op)
+        else:
+            yield parse_pour_out(op)
+
+def iter_votes(operations):
+    for op in iter_transactions(operations, ("vote",)):
+        yield parse_vote(op)
+
+def iter_flash_swap_callbacks(operations):
+    for op in iter_transactions(operations, ("flash_swap_callback",)):
+        yield parse_flash_swap_callback(op)
+
+"""
+operations of a result bucketed by kind, destination and entrypoint and decoded in a single pass.
+The lists are the index's own, lookups and the parse_* functions hand out copies; the records are read-only
+"""
+class OperationIndex():
+    def __init__(self, operations):
+        self.by_kind = {}
+        self.by_destination = {}
+        self.by_entrypoint = {}
+
+        self.transfers = []
+        self.ops = []
+        self.votes = []
+        self.validations = []
+        self.delegations = []
+        self.pour_overs = []
+        self.auction_ops = []
+        self.flash_swap_callbacks = []
+        self.originations = []
+
+        for op in operations:
+            kind = op["kind"]
+            self.by_kind.setdefault(kind, []).append(op)
+
+            if kind == "delegation":
+                self.delegations.append(op["delegate"])
+                continue
+            if kind == "origination":
+                self.originations.append(parse_origination(op))
+                continue
+            if kind != "transaction":
+                continue
+
+            self.by_destination.setdefault(op["destination"], []).append(op)
             entrypoint = op["parameters"]["entrypoint"]
+            self.by_entrypoint.setdefault(entrypoint, []).append(op)
+
             if entrypoint == "default":
                 tx = parse_tez_transfer(op)
-                transfers.append(tx)
+                self.transfers.append(tx)
+                self.ops.append(tx)
             elif entrypoint == "transfer":
                 txs = parse_transfer(op)
-                transfers += txs
+                self.transfers.extend(txs)
+                self.ops.extend(txs)
             elif entrypoint == "pour_out": # dex 2.0 specific
-                tx = parse_pour_out(op)
-                transfers.append(tx)
-
-    return transfers
+                self.transfers.append(parse_pour_out(op))
+            elif entrypoint == "pour_over":
+                self.pour_overs.append(parse_pour_over(op))
+            elif entrypoint == "close":
+                self.ops.append(close_op)
+            elif entrypoint == "vote":
+                self.votes.append(parse_vote(op))
+            elif entrypoint == "validate":
+                self.validations.append(op["parameters"]["value"]["string"])
+            elif entrypoint == "receive_fee":
+                self.auction_ops.append(parse_auction_receive_fee(op))
+            elif entrypoint == "flash_swap_callback":
+                self.flash_swap_callbacks.append(parse_flash_swap_callback(op))
+
+    def entrypoint(self, name):
+        return list(self.by_entrypoint.get(name, ()))
+
+    def destination(self, address):
+        return list(self.by_destination.get(address, ()))
+
+    def kind(self, name):
+        return list(self.by_kind.get(name, ()))
+
+""" the index is built on first use and kept on the result """
+def index_operations(res):
+    index = getattr(res, "operation_index", None)
+    if index is None:
+        index = OperationIndex(res.operations)
+        res.operation_index = index
+    return index
 
-def parse_transfer(op):
-    transfers = []
-    value = op["parameters"]["value"]
-    if not isinstance(value, list):
-        transfer = parse_as_fa12(value)
-        transfers.append(transfer)
-    else:
-        transfers += parse_as_fa2(value)
+def parse_originations(res):
+    return list(index_operations(res).originations)
 
-    for transfer in transfers:
-        transfer["token_address"] = op["destination"]
+def parse_pour_overs(res):
+    return list(index_operations(res).pour_overs)
 
-    return transfers
+def parse_transfers(res):
+    return list(index_operations(res).transfers)
 
 def parse_validations(res):
-    delegates = []
-    for op in res.operations:
-         if op["kind"] == "transaction":
-            entrypoint = op["parameters"]["entrypoint"]
-            if entrypoint == "validate":
-                delegates.append(op["parameters"]["value"]["string"])
-    return delegates
+    return list(index_operations(res).validations)
 
 def parse_delegations(res):
-    delegates = []
-    for op in res.operations:
-         if op["kind"] == "delegation":
-            delegates.append(op["delegate"])
-    return delegates
-
-def parse_vote(op):
-    args = op["parameters"]["value"]["args"]
-
-    res = {
-        "type": "vote",
-        "delegate": args[1]["string"],
-        "amount": int(args[3]["int"])
-    }
-    
-    return res
+    return list(index_operations(res).delegations)
 
 def parse_votes(res):
-    result = []
-
-    for op in res.operations:
-        if op["kind"] == "transaction":
-            entrypoint = op["parameters"]["entrypoint"]
-            if entrypoint == "vote":
-                tx = parse_vote(op)
-                result.append(tx)
-
-    return result
+    return list(index_operations(res).votes)
 
 def parse_ops(res):
-    result = []
-    for op in res.operations:
-        if op["kind"] == "transaction":
-            entrypoint = op["parameters"]["entrypoint"]
-            if entrypoint == "default":
-                tx = parse_tez_transfer(op)
-                result.append(tx)
-            elif entrypoint == "transfer":
-                txs = parse_transfer(op)
-                result += txs
-            elif entrypoint == "close":
-                result.append({"type" : "close"})
-    return result
+    return list(index_operations(res).ops)
 
 def parse_auction_ops(res):
-    result = []
-
-    for op in res.operations:
-        if op["kind"] == "transaction":
-            entrypoint = op["parameters"]["entrypoint"]
-            if entrypoint == "receive_fee":
-                tx = parse_auction_receive_fee(op)
-                result.append(tx)
-
-    return result
-
-def parse_auction_receive_fee(op):
-    args = op["parameters"]["value"]["args"]
-
-    res = {
-        "type": "receive_fee",
-        # "token_address": args[1]["string"],
-        "fee": int(args[1]["int"]),
-        "destination": op["destination"]
-    }
-    
-    return res
+    return list(index_operations(res).auction_ops)
 
 def parse_flash_swap_callbacks(res):
-    ops = fetch_entrypoints(res, "flash_swap_callback")
-    results = []
-    
-    for op in ops:
-        args = op["parameters"]["value"]["args"]
-
-        result = {
-            "type": "flash_swap_callback",
-            "pair_id": int(args[0]["int"]),
-            "prev_tez_balance": int(args[1]["int"]),
-            "amount_in": int(args[2]["int"])
-        }
-
-        results.append(result)
-    
-    return results
+    return list(index_operations(res).flash_swap_callbacks)
 
 def fetch_entrypoints(res, name):
-    result = []
-    for op in res.operations:
-        if op["kind"] == "transaction":
-            entrypoint = op["parameters"]["entrypoint"]
-            if entrypoint == name:
-                result.append(op)
-    return result
+    return index_operations(res).entrypoint(name)
 
 # calculates shares balance
 def calc_total_balance(res, address):
@@ -298,11 +391,11 @@ def generate_random_address() -> str:
 def calc_out_per_hundred(chain, dex):
     res = chain.interpret(dex.tokenToTezPayment(amount=100, min_out=1, receiver=alice), amount=0)
     ops = parse_ops(res)
-    tez_out = ops[0]["amount"]
+    tez_out = ops[0].amount
 
     res = chain.interpret(dex.tezToTokenPayment(min_out=1, receiver=alice), amount=100)
     ops = parse_ops(res)
-    token_out = ops[0]["amount"]
+    token_out = ops[0].amount
 
     return (tez_out, token_out)
 
@@ -360,6 +453,488 @@ def operator_add(owner, operator, token_id=0):
         }
     }
 
+_removed = object()
+
+class CowMap(Mapping):
+    """ read-only big_map sharing unchanged entries with the map it was derived from """
+    max_depth = 16
+
+    def __init__(self, base, layers=(), length=None):
+        self.base = base
+        # newest first, each holding only the keys changed at that step
+        self.layers = layers
+        self.length = len(base) if length is None else length
+        # the whole map as a plain dict, built on first use and handed on to the map derived from this one
+        self.materialized = None
+        # the keys derive() wrote to make this map and the `identity` of the map it was derived from, so the
+        # changes between the two are known without comparing them, whatever the layers were merged into
+        self.identity = object()
+        self.parent = None
+        self.written = None
+
+    def __getitem__(self, key):
+        for layer in self.layers:
+            if key in layer:
+                value = layer[key]
+                if value is _removed:
+                    raise KeyError(key)
+                return value
+        return self.base[key]
+
+    def __contains__(self, key):
+        for layer in self.layers:
+            if key in layer:
+                return layer[key] is not _removed
+        return key in self.base
+
+    def __iter__(self):
+        return iter(self.to_dict() if self.layers else self.base)
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    """
+    the whole map as a plain dict. It is kept and passed on by derive(), which applies only the changed keys
+    to it, so the caller must not modify it or hold on to it past the next call
+    """
+    def to_dict(self):
+        if self.materialized is None:
+            result = dict(self.base)
+            for layer in reversed(self.layers):
+                CowMap.apply(result, layer)
+            self.materialized = result
+        return self.materialized
+
+    @staticmethod
+    def apply(result, changes):
+        for key, value in changes.items():
+            if value is _removed:
+                result.pop(key, None)
+            else:
+                result[key] = value
+
+    def derive(self, changes):
+        if not changes:
+            return self
+        derived = self.layered(changes)
+        derived.parent, derived.written = self.identity, changes
+        if self.materialized is not None:
+            derived.materialized, self.materialized = self.materialized, None
+            CowMap.apply(derived.materialized, changes)
+        return derived
+
+    def layered(self, changes):
+        length = self.length
+        for key, value in changes.items():
+            present = key in self
+            if value is _removed:
+                length -= present
+            elif not present:
+                length += 1
+
+        layers = (changes,) + self.layers
+        if len(layers) <= self.max_depth:
+            return CowMap(self.base, layers, length)
+
+        merged = {}
+        for layer in reversed(layers):
+            merged.update(layer)
+        if len(merged) * 2 > len(self.base):
+            base = dict(self.base)
+            CowMap.apply(base, merged)
+            return CowMap(base)
+        return CowMap(self.base, (merged,), length)
+
+    """
+    the entries `new` adds or updates over `old`, removed keys map to _removed. A map derived from `old`
+    knows them already, anything else is compared entry by entry
+    """
+    @staticmethod
+    def changes(old, new):
+        if new is old:
+            return {}
+        if isinstance(new, CowMap) and isinstance(old, CowMap) and new.parent is old.identity:
+            return new.written
+        changes = {}
+        added = 0
+        # plain dict lookups rather than walking the layers
+        if isinstance(old, CowMap) and old.materialized is not None:
+            old = old.materialized
+        for key, value in new.items():
+            if key not in old:
+                changes[key] = value
+                added += 1
+            elif old[key] != value:
+                changes[key] = value
+        if len(new) - added != len(old):
+            for key in old:
+                if key not in new:
+                    changes[key] = _removed
+        return changes
+
+    """ keep the entries of `old` that `new` didn't change, so only the changes take new memory """
+    @staticmethod
+    def share(old, new):
+        if not isinstance(old, CowMap):
+            return CowMap(dict(new))
+        return old.derive(CowMap.changes(old, new))
+
+def find_big_maps(context):
+    storage_ty = StorageSection.match(context.storage_expr).args[0]
+    paths = []
+
+    def walk(value, path):
+        if isinstance(value, BigMapType):
+            paths.append(path)
+        elif isinstance(value, PairType):
+            fields = value.get_flat_values()
+            if isinstance(fields, dict):
+                for name, field in fields.items():
+                    walk(field, path + (name,))
+
+    walk(storage_ty.dummy(ExecutionContext()), ())
+    return paths
+
+""" copy the records leading to each big_map and replace the big_map with func(path, big_map) """
+def map_big_maps(storage, paths, func):
+    result = dict(storage)
+    copied = {(): result}
+    for path in paths:
+        node = result
+        for i in range(1, len(path)):
+            prefix = path[:i]
+            if prefix not in copied:
+                copied[prefix] = dict(node[path[i - 1]])
+                node[path[i - 1]] = copied[prefix]
+            node = copied[prefix]
+        node[path[-1]] = func(path, node[path[-1]])
+    return result
+
+def get_path(storage, path):
+    node = storage
+    for name in path:
+        if not isinstance(node, Mapping) or name not in node:
+            return None
+        node = node[name]
+    return node
+
+def share_storage(old, new, paths):
+    return map_big_maps(new, paths, lambda path, big_map: CowMap.share(get_path(old, path), big_map))
+
+def materialize(storage, paths):
+    def to_dict(path, big_map):
+        return big_map.to_dict() if isinstance(big_map, CowMap) else big_map
+    return map_big_maps(storage, paths, to_dict)
+
+close_parameters = {"entrypoint": "close", "value": {"prim": "Unit"}}
+
+# program types only depend on the code, so they are built once per contract
+_programs = {}
+
+def load_program(context):
+    key = id(context)
+    if key not in _programs:
+        _programs[key] = (context, MichelsonProgram.load(context, with_code=True))
+    return _programs[key][1]
+
+"""
+give the big_maps of a storage value a fresh state so it can start the next call as is.
+Removed keys are dropped rather than kept as `key: None` entries
+"""
+def detach(value):
+    if isinstance(value, BigMapType):
+        return type(value)(items=value.items)
+    if isinstance(value, PairType):
+        return type(value)(tuple(detach(item) for item in value.items))
+    return value
+
+""" the interpreter's values lose the field annotations, so they are decoded through the storage type """
+def decode_storage(context, storage_value):
+    storage_ty = load_program(context).storage
+    micheline = storage_value.to_micheline_value(lazy_diff=True)
+    return storage_ty.from_micheline_value(micheline).to_python_object(lazy_diff=True)
+
+""" interpret a call on a storage value in the interpreter's form, returns the operations and the new storage value """
+def run_program(context, parameters, storage_value, amount=0, balance=None, now=None, level=None,
+                sender=None, source=None, view_results=None, address=None, origination_index=1, stdout=None):
+    program = load_program(context)
+    run_context = ExecutionContext(
+        amount=amount,
+        balance=balance,
+        now=now,
+        level=level,
+        sender=sender or source,
+        source=source,
+        address=address,
+        view_results=view_results,
+        script={"code": context.script["code"]},
+    )
+    run_context.origination_index = origination_index
+
+    stack = MichelsonStack()
+    # the interpreter logs every executed instruction here
+    stdout = [] if stdout is None else stdout
+    try:
+        parameter_value = program.parameter.from_parameters(parameters)
+        instance = program(parameters["entrypoint"], parameter_value, storage_value)
+        instance.begin(stack, stdout, run_context)
+        instance.execute(stack, stdout, run_context)
+        res = stack.pop1()
+    except MichelsonRuntimeError as e:
+        stdout.append(e.format_stdout())
+        raise
+
+    operations = [op.content for op in res.items[0]]
+    return operations, program.storage(detach(res.items[1]))
+
+# view parameter types, built once per contract and view
+_view_parameters = {}
+
+"""
+evaluate a view on a storage value in the interpreter's form, returns the decoded result. Unlike
+ContractViewCall.onchain_view the storage isn't encoded to micheline and back and the program is reused
+"""
+def run_view(context, name, parameter, storage_value, balance=None, now=None, level=None,
+             view_results=None, address=None, stdout=None):
+    program = load_program(context)
+    key = (id(context), name)
+    if key not in _view_parameters:
+        _view_parameters[key] = ParameterSection.create_type(args=[program.get_view(name).args[1]])
+    run_context = ExecutionContext(
+        balance=balance,
+        now=now,
+        level=level,
+        address=address,
+        view_results=view_results,
+        script={"code": context.script["code"]},
+    )
+
+    stack = MichelsonStack()
+    stdout = [] if stdout is None else stdout
+    try:
+        # big_maps take the context of the run, so every view gets a fresh state of them
+        instance = program(name, _view_parameters[key].from_micheline_value(parameter),
+            program.storage(detach(storage_value.item)))
+        instance.begin(stack, stdout, run_context)
+        instance.execute_view(stack, stdout, run_context)
+        return instance.ret(stack, stdout).to_python_object()
+    except MichelsonRuntimeError as e:
+        stdout.append(e.format_stdout())
+        raise
+
+""" the same as ContractCall.interpret, but SELF_ADDRESS and the origination counter can be set """
+def interpret_call(context, parameters, storage, amount=0, balance=None, now=None, level=None,
+                   sender=None, source=None, view_results=None, address=None, origination_index=1, stdout=None):
+    storage_value = load_program(context).storage.from_python_object(storage)
+    operations, storage_value = run_program(
+        context,
+        parameters,
+        storage_value,
+        amount=amount,
+        balance=balance,
+        now=now,
+        level=level,
+        sender=sender,
+        source=source,
+        view_results=view_results,
+        address=address,
+        origination_index=origination_index,
+        stdout=stdout
+    )
+    return LazyResult(context, parameters, operations, storage_value)
+
+""" a call result whose storage is decoded to python on first access """
+class LazyResult():
+    def __init__(self, context, parameters, operations, storage_value):
+        self.context = context
+        self.parameters = parameters
+        self.operations = operations
+        self.storage_value = storage_value
+        self.decoded = None
+
+    @property
+    def storage(self):
+        if self.decoded is None:
+            self.decoded = decode_storage(self.context, self.storage_value)
+        return self.decoded
+
+    @storage.setter
+    def storage(self, value):
+        self.decoded = value
+
+class Contract():
+    def __init__(self, interface, storage, balance=0, big_maps=None):
+        self.interface = interface
+        self.storage = storage
+        self.balance = balance
+        self.big_maps = find_big_maps(interface.context) if big_maps is None else big_maps
+
+    def copy(self):
+        storage = map_big_maps(self.storage, self.big_maps, lambda path, big_map: big_map)
+        return Contract(self.interface, storage, self.balance, self.big_maps)
+
+# contracts originated in-process reuse the interface parsed for the same code
+_originated_interfaces = {}
+
+def interface_for_code(code):
+    key = json.dumps(code, sort_keys=True)
+    if key not in _originated_interfaces:
+        _originated_interfaces[key] = ContractInterface.from_micheline(code)
+    return _originated_interfaces[key]
+
+# what LiveViews.resolve returns for views it doesn't know, left to view_results' static entries
+_unresolved = object()
+
+"""
+view_results resolving VIEW calls lazily: from python functions given to `define`, then from the views of
+the contracts registered on the chain, run on their current storage. Results are cached per contract,
+view, argument and level; a registered contract's entries are dropped when a call changes its storage.
+Views neither resolves are looked up in `static`, the same as a plain view_results dict
+"""
+class LiveViews():
+    def __init__(self, chain, static=None):
+        self.chain = chain
+        self.static = dict(static or {})
+        self.functions = {}
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    """ resolve `address%name` with `function(argument)`; call `invalidate` when what it returns changes """
+    def define(self, address, name, function):
+        self.functions[(address, name)] = function
+        self.invalidate(address)
+        return self
+
+    def invalidate(self, address=None):
+        if address is None:
+            self.cache.clear()
+        else:
+            self.cache = {key: value for key, value in self.cache.items() if key[0] != address}
+
+    def resolve(self, address, name, argument, level):
+        key = (address, name, repr(argument), level)
+        if key in self.cache:
+            self.hits += 1
+            return self.cache[key]
+
+        if (address, name) in self.functions:
+            result = self.functions[(address, name)](argument)
+        elif address in self.chain.contracts and name in self.chain.contracts[address].interface.views:
+            contract = self.chain.contracts[address]
+            view = getattr(contract.interface, name)
+            call = view() if isinstance(argument, UnitType) else view(argument)
+            context = contract.interface.context
+            storage_value = load_program(context).storage.from_python_object(
+                materialize(contract.storage, contract.big_maps))
+            result = run_view(context, name, call.param_expr, storage_value, balance=contract.balance,
+                now=self.chain.now, level=level, view_results=self, address=address)
+        else:
+            return _unresolved
+        self.misses += 1
+        self.cache[key] = result
+        return result
+
+    # ExecutionContext.get_view_result looks views up here for the interpreter's own VIEW path
+    def get(self, key, default=None):
+        return self.static.get(key, default)
+
+# VIEW consulting LiveViews when the call runs with one as view_results, the interpreter only passes
+# view_results the view's name and address
+class LiveViewInstruction(ViewInstruction):
+    @classmethod
+    def execute(cls, stack, stdout, context):
+        views = context.view_results
+        if not isinstance(views, LiveViews):
+            return super().execute(stack, stdout, context)
+
+        input_value, view_address = stack.pop2()
+        name = cls.args[0].get_string()
+        address = str(view_address)
+        result = _unresolved
+        if address != context.get_self_address():
+            result = views.resolve(address, name, input_value.to_python_object(), context.get_level())
+        if result is _unresolved:
+            stack.push(view_address)
+            stack.push(input_value)
+            return super().execute(stack, stdout, context)
+
+        res = OptionType.from_some(cls.args[1].from_python_object(result))
+        stack.push(res)
+        stdout.append(format_stdout(cls.prim, [input_value, view_address], [res]))
+        return cls(stack_items_added=1)
+
+"""
+make VIEW consult LiveViews, done by LocalChain.live_views rather than on import. This leans on pytezos
+internals (3.x): instructions are subclassed from the Micheline.classes registry, keyed by primitive and
+argument count, when code is parsed, and ViewInstruction.execute pops the input and the address and reads
+context.view_results. Programs load_program parsed before are dropped so they pick the override up; VIEW
+keeps its stock behaviour for calls whose view_results aren't LiveViews
+"""
+def install_live_views():
+    if Micheline.classes.get(("VIEW", 2)) is LiveViewInstruction:
+        return
+    Micheline.classes[("VIEW", 2)] = LiveViewInstruction
+    _programs.clear()
+
+"""
+a bounded LRU of LocalChain.interpret results, keyed by the call and its context. An entry only counts
+while the chain still holds the storage object it was computed on; LocalChain clears it on every state change
+"""
+class InterpretCache():
+    def __init__(self, size=1024):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, storage):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] is not storage:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, storage, res):
+        self.entries[key] = (storage, res)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+class Snapshot():
+    def __init__(self, chain):
+        # records are copied since tests poke flags like `entered` in place, big_maps are immutable
+        self.storage = chain.storage
+        if chain.storage is not None:
+            self.storage = map_big_maps(chain.storage, chain.big_maps or [], lambda path, big_map: big_map)
+        self.big_maps = chain.big_maps
+        self.balance = chain.balance
+        self.now = chain.now
+        self.level = chain.level
+        self.payouts = dict(chain.payouts)
+        self.contract_balances = {address: dict(balances) for address, balances in chain.contract_balances.items()}
+        self.contracts = {address: contract.copy() for address, contract in chain.contracts.items()}
+        self.delegates = dict(chain.delegates)
+        self.originations = chain.originations
+        # (observer, saved state) of the observers that can be saved, see `watch`, and the same for the
+        # fingerprint and the ledger
+        if isinstance(chain, Snapshot):
+            self.observers = chain.observers
+            self.fingerprint = chain.fingerprint
+            self.ledger = chain.ledger
+        else:
+            self.fingerprint = (chain.fingerprint, chain.fingerprint.save()) if chain.fingerprint is not None else None
+            self.ledger = (chain.ledger, chain.ledger.save()) if chain.ledger is not None else None
+            self.observers = [(observer, observer.save()) for observer in chain.observers if hasattr(observer, "save")]
+
 class LocalChain():
     def __init__(self, storage):
         self.storage = storage
@@ -370,57 +945,284 @@ class LocalChain():
         self.payouts = {}
         self.contract_balances = {}
         self.last_res = None
+        self.big_maps = None
+
+        # multi-contract mode, see `register` and `run`
+        self.contracts = {}
+        self.delegates = {}
+        self.originations = 1
+
+        # see `instrument`
+        self.metrics = None
+        self.name = contract_self_address
+
+        # see `watch`
+        self.observers = []
+
+        # see `record`
+        self.journal = None
+
+        # see `live_views`, used by calls that don't pass view_results
+        self.views = None
+
+        # see `cache_interpret`
+        self.interpret_cache = None
+
+        # see `track`
+        self.fingerprint = None
+
+        # see `use_ledger`
+        self.ledger = None
 
     """ execute the entrypoint and save the resulting state and balance updates """
     def execute(self, call, amount=0, sender=None, source=None, view_results=None):
+        view_results = self.views if view_results is None else view_results
+        old_storage = self.storage
         new_balance = self.balance + amount
-        res = call.interpret(
-            amount=amount,
-            storage=self.storage,
-            balance=new_balance,
-            now=self.now,
-            sender=sender,
-            source=source,
-            view_results=view_results,
-            level=self.level
-        )
+        if self.metrics is not None:
+            res, stdout = self.interpret_measured(call, amount, new_balance, sender, source, view_results)
+        else:
+            res = call.interpret(
+                amount=amount,
+                storage=self.prepare(call),
+                balance=new_balance,
+                now=self.now,
+                sender=sender,
+                source=source,
+                view_results=view_results,
+                level=self.level
+            )
+        # checked as a whole before anything is applied, so an overdraft leaves the chain as it was
+        if self.ledger is not None:
+            self.ledger.transfer_many(self.ledger_moves(sender or source or me, amount, iter_ops(res.operations)))
         self.balance = new_balance
+        res.storage = share_storage(self.storage, res.storage, self.big_maps)
         self.storage = res.storage
+        # once the big_maps are shared their diff is the keys the call wrote, see CowMap.changes
+        if self.metrics is not None:
+            self.metrics.measure(self.name, res, stdout, old_storage, self.big_maps)
+        if self.interpret_cache is not None:
+            self.interpret_cache.clear()
 
         # calculate total xtz payouts from contract
-        ops = parse_ops(res)
-        for op in ops:
-            if op["type"] == "tez":
-                dest = op["destination"]
-                amount = op["amount"]
-                self.payouts[dest] = self.payouts.get(dest, 0) + amount
+        for op in iter_ops(res.operations):
+            if op.type == "tez":
+                self.apply_transfer(op)
 
                 # reduce contract balance in case it has sent something
-                if op["source"] == contract_self_address:
-                    self.balance -= op["amount"]
-                    
-            elif op["type"] == "token":
-                dest = op["destination"]
-                amount = op["amount"]
-                address = op["token_address"]
-                if address not in self.contract_balances:
-                    self.contract_balances[address] = {}
-                contract_balance = self.contract_balances[address]
-                if dest not in contract_balance:
-                    contract_balance[dest] = 0
-                contract_balance[dest] += amount
-                # TODO source funds removal
+                if op.source == contract_self_address:
+                    self.balance -= op.amount
+
+            elif op.type == "token":
+                self.apply_transfer(op)
             # imitate closing of the function for convenience
-            elif op["type"] == "close":
+            elif op.type == "close":
                 self.storage["storage"]["entered"] = False   
 
+        if self.fingerprint is not None:
+            self.fingerprint.update(old_storage, self.storage)
+        if self.journal is not None:
+            self.journal.record(self, call, amount, sender, source, old_storage)
         return res
 
+    """
+    execute calls to the chain's contract one after another keeping the storage in the interpreter's form in
+    between, it's decoded back once at the end. Items are calls or (call, options) pairs, where options override
+    the keyword arguments for that call. The results only decode their storage when it's accessed
+    """
+    def execute_many(self, calls, amount=0, sender=None, source=None, view_results=None):
+        view_results = self.views if view_results is None else view_results
+        defaults = {"amount": amount, "sender": sender, "source": source, "view_results": view_results}
+        calls = [item if isinstance(item, tuple) else (item, {}) for item in calls]
+        if not calls:
+            return []
+        context = calls[0][0].context
+        if any(call.context is not context for call, _ in calls):
+            raise ValueError("execute_many runs the calls of a single contract")
+        old_storage = self.storage
+        executed = []
+        results = []
+        storages = []
+        storage_value = load_program(context).storage.from_python_object(self.prepare(calls[0][0]))
+        try:
+            for call, options in calls:
+                options = {**defaults, **options}
+                new_balance = self.balance + options["amount"]
+                stdout = [] if self.metrics is not None else None
+                try:
+                    operations, next_value = run_program(
+                        context,
+                        call.parameters,
+                        storage_value,
+                        balance=new_balance,
+                        now=self.now,
+                        level=self.level,
+                        stdout=stdout,
+                        **options
+                    )
+                except MichelsonRuntimeError:
+                    if self.metrics is not None:
+                        self.metrics.failed(self.name, context, call.parameters)
+                    raise
+                # the storage isn't decoded here, so closing runs the actual entrypoint. It runs before anything
+                # of the call is applied, a call whose close fails is dropped as any other failing call
+                balance = new_balance
+                for op in iter_ops(operations):
+                    if op.type == "tez" and op.source == contract_self_address:
+                        balance -= op.amount
+                    elif op.type == "close":
+                        _, next_value = run_program(
+                            context,
+                            close_parameters,
+                            next_value,
+                            balance=balance,
+                            now=self.now,
+                            level=self.level,
+                            sender=contract_self_address
+                        )
+                if self.ledger is not None:
+                    self.ledger.transfer_many(self.ledger_moves(options["sender"] or options["source"] or me,
+                        options["amount"], iter_ops(operations)))
+                storage_value = next_value
+                self.balance = new_balance
+                res = LazyResult(context, call.parameters, operations, storage_value)
+                results.append(res)
+                executed.append((call, options))
+                # the storage stays undecoded in between, so big_map diffs aren't measured here
+                if self.metrics is not None:
+                    self.metrics.measure(self.name, res, stdout)
+
+                for op in iter_ops(operations):
+                    if op.type == "tez":
+                        self.apply_transfer(op)
+                        if op.source == contract_self_address:
+                            self.balance -= op.amount
+                    elif op.type == "token":
+                        self.apply_transfer(op)
+
+                # the journal fingerprints every call, so it gets the storage after each one
+                if self.journal is not None:
+                    previous = storages[-1] if storages else old_storage
+                    storages.append(share_storage(previous, decode_storage(context, storage_value), self.big_maps))
+        finally:
+            # calls that succeeded before a failure are kept, the same as with execute
+            if storages:
+                self.storage = storages[-1]
+            else:
+                storage = decode_storage(context, storage_value)
+                self.storage = share_storage(self.storage, storage, self.big_maps)
+            if self.interpret_cache is not None:
+                self.interpret_cache.clear()
+            if self.fingerprint is not None:
+                self.fingerprint.update(old_storage, self.storage)
+            if self.journal is not None and executed:
+                self.journal.record_many(self, executed, old_storage, storages)
+
+        return results
+
+    """
+    record the executed instructions (not gas, the interpreter doesn't meter it), storage size, big_map diff
+    and emitted operations of every following call into metrics, see metrics.CallMetrics.
+    `name` labels the calls of execute and execute_many, run labels them with the contract address
+    """
+    def instrument(self, metrics, name=None):
+        self.metrics = metrics
+        if name is not None:
+            self.name = name
+        return metrics
+
+    """
+    append every following execute and execute_many call to a journal.CallJournal. Every call is
+    fingerprinted, so execute_many decodes the storage after each call while recording
+    """
+    def record(self, journal):
+        self.journal = journal
+        journal.start(self)
+        return journal
+
+    """ resolve the views of following calls from the registered contracts and `define`d functions, see LiveViews """
+    def live_views(self, static=None):
+        install_live_views()
+        self.views = LiveViews(self, static)
+        return self.views
+
+    """ keep a fingerprint.StorageFingerprint following every execute and execute_many call, and rollbacks """
+    def track(self, fingerprint):
+        self.fingerprint = fingerprint
+        fingerprint.start(self)
+        return fingerprint
+
+    """
+    keep every tez and token movement in a ledger.Ledger: amounts sent with calls, emitted transfers with
+    their sources debited, and in `run` tez passed between contracts and to originations
+    """
+    def use_ledger(self, ledger):
+        self.ledger = ledger
+        ledger.start(self)
+        return ledger
+
+    """ the ledger transfers of a call: the amount sent with it, then the tez and tokens it sends out """
+    def ledger_moves(self, sender, amount, ops):
+        moves = [(TEZ, sender, self.name, amount)]
+        for op in ops:
+            if op.type != "close":
+                moves.append(Ledger.move(op))
+        return moves
+
+    """
+    call `observer(chain)` after every advance_blocks, e.g. a twap.TwapOracle. Observers that keep their own
+    history define save() and restore(state): snapshot saves them and rollback puts them back
+    """
+    def watch(self, observer):
+        self.observers.append(observer)
+        return observer
+
+    def interpret_measured(self, call, amount, balance, sender, source, view_results):
+        stdout = []
+        try:
+            res = interpret_call(
+                call.context,
+                call.parameters,
+                self.prepare(call),
+                amount=amount,
+                balance=balance,
+                now=self.now,
+                level=self.level,
+                sender=sender,
+                source=source,
+                view_results=view_results,
+                stdout=stdout
+            )
+        except MichelsonRuntimeError:
+            self.metrics.failed(self.name, call.context, call.parameters)
+            raise
+        return res, stdout
+
+    """
+    memoize the following `interpret` calls in an InterpretCache of `size` entries. Cached results are
+    shared between the calls that hit them. view_results are told apart by identity, so changing them or
+    the storage in place needs `chain.interpret_cache.clear()`
+    """
+    def cache_interpret(self, size=1024):
+        self.interpret_cache = InterpretCache(size)
+        return self.interpret_cache
+
     """ just interpret, don't store anything """
     def interpret(self, call, amount=0, sender=None, source=None, view_results=None):
+        view_results = self.views if view_results is None else view_results
+        if self.interpret_cache is not None:
+            key = (id(call.context), repr(call.parameters), amount, self.balance, sender, source, self.now, self.level, id(view_results))
+            res = self.interpret_cache.get(key, self.storage)
+            if res is None:
+                res = self.interpret_uncached(call, amount, sender, source, view_results)
+                self.interpret_cache.put(key, self.storage, res)
+            return res
+        return self.interpret_uncached(call, amount, sender, source, view_results)
+
+    def interpret_uncached(self, call, amount, sender, source, view_results):
         res = call.interpret(
             amount=amount,
-            storage=self.storage,
+            storage=self.prepare(call),
             balance=self.balance,
             now=self.now,
             sender=sender,
@@ -432,13 +1234,234 @@ class LocalChain():
 
     """ just view, don't store anything """
     def view(self, call, view_results=None):
-        res = call.onchain_view(
-            storage=self.storage,
-            balance=self.balance,
-            view_results=view_results
-        )
-        return res
+        return self.view_many([call], view_results)[0]
+
+    """
+    evaluate view calls of this chain's contract against its current storage, converted for the interpreter
+    once for the whole batch. Returns the results in the order of `calls`; with `jobs` > 1 the batch is
+    split into contiguous chunks evaluated in forked workers
+    """
+    def view_many(self, calls, view_results=None, jobs=1):
+        view_results = self.views if view_results is None else view_results
+        calls = list(calls)
+        if not calls:
+            return []
+        context = calls[0].context
+        if any(call.context is not context for call in calls):
+            raise ValueError("view_many evaluates the views of a single contract")
+        storage_value = load_program(context).storage.from_python_object(self.prepare(calls[0]))
+
+        global _view_batch
+        _view_batch = (self, calls, storage_value, view_results)
+        try:
+            if jobs > 1 and len(calls) > 1:
+                size = -(-len(calls) // jobs)
+                chunks = [(start, min(start + size, len(calls))) for start in range(0, len(calls), size)]
+                with multiprocessing.get_context("fork").Pool(min(jobs, len(chunks))) as pool:
+                    return [result for chunk in pool.map(run_views, chunks) for result in chunk]
+            return run_views((0, len(calls)))
+        finally:
+            _view_batch = None
+
+    def apply_transfer(self, op):
+        dest = op.destination
+        amount = op.amount
+        if op.type == "tez":
+            self.payouts[dest] = self.payouts.get(dest, 0) + amount
+        else:
+            address = op.token_address
+            if address not in self.contract_balances:
+                self.contract_balances[address] = {}
+            contract_balance = self.contract_balances[address]
+            if dest not in contract_balance:
+                contract_balance[dest] = 0
+            contract_balance[dest] += amount
+
+    """ deploy a contract for `run` under the given address """
+    def register(self, address, interface, storage, balance=0):
+        self.contracts[address] = Contract(interface, storage, balance)
+        return self.contracts[address]
+
+    """
+    run a call against the registered contracts and apply every operation it emits depth-first, as Tezos does.
+    Transfers to addresses that aren't registered are accounted in payouts and contract_balances.
+    Every call of the run sees `source`, or `sender` when it's not given, as Tezos.get_source().
+    Returns the interpretation results in execution order; any failure reverts the whole run
+    """
+    def run(self, address, call, amount=0, sender=None, source=None, view_results=None):
+        view_results = self.views if view_results is None else view_results
+        source = source or sender or me
+        snapshot = self.snapshot()
+        queue = [{
+            "kind": "transaction",
+            "source": sender,
+            "destination": address,
+            "amount": str(amount),
+            "parameters": call.parameters,
+        }]
+        results = []
+        try:
+            while queue:
+                op = queue.pop(0)
+                queue = self.apply_operation(op, source, view_results, results) + queue
+        except (MichelsonRuntimeError, LedgerError):
+            self.rollback(snapshot)
+            raise
+
+        self.last_res = results[0]
+        return results
+
+    def apply_operation(self, op, source, view_results, results):
+        kind = op["kind"]
+        if kind == "delegation":
+            self.delegates[op["source"]] = op.get("delegate")
+            return []
+
+        if kind == "origination":
+            interface = interface_for_code(op["script"]["code"])
+            storage = interface.storage.decode(op["script"]["storage"])
+            balance = int(op["balance"])
+            self.debit(op["source"], balance)
+            self.register(op["originated_contract"], interface, storage, balance)
+            if self.ledger is not None:
+                self.ledger.transfer(TEZ, op["source"], op["originated_contract"], balance)
+            return []
+
+        sender = op["source"]
+        dest = op["destination"]
+        amount = int(op["amount"])
+        self.debit(sender, amount)
+
+        if dest not in self.contracts:
+            if op["parameters"]["entrypoint"] == "transfer":
+                transfers = parse_transfer(op)
+            else:
+                transfers = [parse_tez_transfer(op)] if amount > 0 else []
+            for transfer in transfers:
+                # sources are debited in the ledger only, see use_ledger
+                if self.ledger is not None:
+                    self.ledger.apply(transfer)
+                self.apply_transfer(transfer)
+            return []
+
+        contract = self.contracts[dest]
+        contract.balance += amount
+        if self.ledger is not None:
+            self.ledger.transfer(TEZ, sender or source, dest, amount)
+        stdout = [] if self.metrics is not None else None
+        try:
+            res = interpret_call(
+                contract.interface.context,
+                op["parameters"],
+                materialize(contract.storage, contract.big_maps),
+                amount=amount,
+                balance=contract.balance,
+                now=self.now,
+                level=self.level,
+                sender=sender,
+                source=source,
+                view_results=view_results,
+                address=dest,
+                origination_index=self.originations,
+                stdout=stdout
+            )
+        except MichelsonRuntimeError:
+            if self.metrics is not None:
+                self.metrics.failed(dest, contract.interface.context, op["parameters"])
+            raise
+        old_storage = contract.storage
+        res.storage = share_storage(contract.storage, res.storage, contract.big_maps)
+        res.address = dest
+        contract.storage = res.storage
+        if self.metrics is not None:
+            self.metrics.measure(dest, res, stdout, old_storage, contract.big_maps)
+        if self.views is not None:
+            self.views.invalidate(dest)
+        results.append(res)
+
+        # the interpreter derives originated addresses from the counter passed above
+        for emitted in res.operations:
+            if emitted["kind"] == "origination":
+                emitted["originated_contract"] = get_originated_address(self.originations)
+                self.originations += 1
+
+        return list(res.operations)
+
+    """ take the tez a registered contract sends; like on chain the operation fails if it holds less """
+    def debit(self, address, amount):
+        contract = self.contracts.get(address)
+        if contract is None:
+            return
+        if contract.balance < amount:
+            raise MichelsonRuntimeError(f"{address} sends {amount} mutez holding {contract.balance}", "BALANCE_TOO_LOW")
+        contract.balance -= amount
 
     def advance_blocks(self, count=1):
         self.now += count * BLOCK_TIME
         self.level += count
+        for observer in self.observers:
+            observer(self)
+
+    """ plain storage for the interpreter; big_map paths are learned from the first call """
+    def prepare(self, call):
+        if self.big_maps is None:
+            self.big_maps = find_big_maps(call.context)
+        return materialize(self.storage, self.big_maps)
+
+    """ capture the current state, O(1) in the size of the big_maps """
+    def snapshot(self):
+        return Snapshot(self)
+
+    """ return to a snapshot; the snapshot stays valid and can be rolled back to again """
+    def rollback(self, snapshot):
+        restored = Snapshot(snapshot)
+        self.storage = restored.storage
+        self.big_maps = restored.big_maps
+        self.balance = restored.balance
+        self.now = restored.now
+        self.level = restored.level
+        self.payouts = restored.payouts
+        self.contract_balances = restored.contract_balances
+        self.contracts = restored.contracts
+        self.delegates = restored.delegates
+        self.originations = restored.originations
+        self.fingerprint = None
+        if restored.fingerprint is not None:
+            self.fingerprint, state = restored.fingerprint
+            self.fingerprint.restore(state)
+        self.ledger = None
+        if restored.ledger is not None:
+            self.ledger, state = restored.ledger
+            self.ledger.restore(state)
+        for observer, state in restored.observers:
+            observer.restore(state)
+        self.last_res = None
+        if self.views is not None:
+            self.views.invalidate()
+        if self.interpret_cache is not None:
+            self.interpret_cache.clear()
+
+    """
+    independent chain starting from the current state and sharing its unchanged entries.
+    Observers stay with this chain, the fork gets copies of the fingerprint and the ledger
+    """
+    def fork(self):
+        chain = LocalChain(storage=None)
+        chain.rollback(self.snapshot())
+        if chain.fingerprint is not None:
+            chain.fingerprint = chain.fingerprint.copy()
+        if chain.ledger is not None:
+            chain.ledger = chain.ledger.copy()
+        return chain
+
+# the batch LocalChain.view_many evaluates, inherited by its forked workers
+_view_batch = None
+
+def run_views(bounds):
+    chain, calls, storage_value, view_results = _view_batch
+    start, end = bounds
+    return [
+        run_view(call.context, call.name, call.param_expr, storage_value, balance=chain.balance, now=chain.now,
+            level=chain.level, view_results=view_results)
+        for call in calls[start:end]
+    ]
@@ -1,4 +1,10 @@
 import json
+from functools import lru_cache
+
+lambda_sets = {
+    "auction": ("./build/lambdas/auction_lambdas.json", "./storage/json/AuctionFunctions.json"),
+    "dex_core": ("./build/lambdas/dex_core_lambdas.json", "./storage/json/DexCoreFunctions.json"),
+}
 
 def parse_lambdas(path):
     lambdas = {}
@@ -9,5 +15,31 @@ def parse_lambdas(path):
 
     return lambdas
 
-auction_lambdas = parse_lambdas("./build/lambdas/auction_lambdas.json")
-dex_core_lambdas = parse_lambdas("./build/lambdas/dex_core_lambdas.json")
\ No newline at end of file
+""" decode a lambda set once per process; the returned dict is shared, don't mutate it """
+@lru_cache(maxsize=None)
+def load_lambdas(name):
+    path, functions_path = lambda_sets[name]
+    lambdas = parse_lambdas(path)
+    functions = json.load(open(functions_path))
+
+    if len(lambdas) != len(functions):
+        raise ValueError(
+            f"{path} holds {len(lambdas)} lambdas but {functions_path} lists {len(functions)}, "
+            f"recompile them with `yarn compile-lambdas`"
+        )
+
+    return lambdas
+
+def get_auction_lambdas():
+    return load_lambdas("auction")
+
+def get_dex_core_lambdas():
+    return load_lambdas("dex_core")
+
+# keeps `from initial_storage import dex_core_lambdas` working, decoding on first access
+def __getattr__(name):
+    if name == "auction_lambdas":
+        return get_auction_lambdas()
+    if name == "dex_core_lambdas":
+        return get_dex_core_lambdas()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,244 @@
+import os
+import pickle
+import struct
+from hashlib import blake2b
+
+from pytezos.contract.call import ContractCall
+from pytezos.michelson.forge import forge_micheline, unforge_micheline
+
+from fingerprint import big_map_changes
+from helpers import map_big_maps, materialize, get_path, _removed
+
+# an append-only binary journal of LocalChain calls, so long simulation runs can be stored and replayed.
+# Every entry is length-prefixed: a u32 length, then amount, now, level and the storage fingerprint packed
+# with struct, the contract, entrypoint, sender and source as u16-length-prefixed strings, and the
+# parameter value forged to binary micheline. Writes go through a buffer, entries are read back one at a
+# time.
+#
+#   journal = chain.record(CallJournal("run.journal"))
+#   ...
+#   journal.close()
+#   for entry in read_journal("run.journal"):
+#       ...
+#
+# With `checkpoint_every` the journal also appends the full chain state every so many calls to
+# "<path>.checkpoints", which lets replay.py re-execute a journal in independent segments.
+#
+# The fingerprint chains a hash of every call's storage changes: the non-big_map fields and the big_map
+# entries the call changed. Two runs from the same storage agree on it as long as their storages do.
+
+MAGIC = b"QSJ1"
+
+HEADER = struct.Struct("<I")
+FIXED = struct.Struct("<QqQ16s")
+STRING = struct.Struct("<H")
+NONE = 0xFFFF
+
+# the fingerprint of calls inside execute_many in journals written before batched calls were fingerprinted
+# one by one, replay checks the next fingerprinted call instead
+NO_FINGERPRINT = bytes(16)
+
+def hash_storage(storage):
+    return blake2b(repr(storage).encode(), digest_size=16).digest()
+
+def fingerprint_step(fingerprint, old, new, big_maps):
+    digest = blake2b(fingerprint, digest_size=16)
+    digest.update(repr(map_big_maps(new, big_maps, lambda path, big_map: None)).encode())
+    for path in big_maps:
+        changes = big_map_changes(get_path(old, path), get_path(new, path))
+        if changes:
+            digest.update(repr(path).encode())
+            # sorted, so changes found entry by entry hash the same as the keys a derived map wrote
+            entries = sorted((repr(key), None if value is _removed else (value,)) for key, value in changes.items())
+            digest.update(repr(entries).encode())
+    return digest.digest()
+
+def pack_string(value):
+    if value is None:
+        return STRING.pack(NONE)
+    data = value.encode()
+    return STRING.pack(len(data)) + data
+
+def unpack_string(body, offset):
+    (length,) = STRING.unpack_from(body, offset)
+    offset += STRING.size
+    if length == NONE:
+        return None, offset
+    return body[offset:offset + length].decode(), offset + length
+
+def checkpoint_path(path):
+    return path + ".checkpoints"
+
+class CallJournal():
+    def __init__(self, path, buffer_size=1 << 16, checkpoint_every=None):
+        self.path = path
+        self.file = open(path, "ab", buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.fingerprint = None
+        self.entries = 0
+
+        self.checkpoint_every = checkpoint_every
+        self.checkpoints = open(checkpoint_path(path), "ab", buffering=buffer_size) if checkpoint_every else None
+        self.checkpointed_at = 0
+
+    """ start fingerprinting from the storage the chain holds now """
+    def start(self, chain):
+        self.fingerprint = hash_storage(chain.storage)
+        if self.checkpoints is not None:
+            self.checkpoint(chain)
+
+    """
+    the chain state after the entries written so far: storage with plain big_maps, balance, now and level,
+    with the journal offset and fingerprint to continue from
+    """
+    def checkpoint(self, chain):
+        storage = chain.storage if chain.big_maps is None else materialize(chain.storage, chain.big_maps)
+        data = pickle.dumps({
+            "entry": self.entries,
+            "offset": self.file.tell(),
+            "fingerprint": self.fingerprint,
+            "storage": storage,
+            "balance": chain.balance,
+            "now": chain.now,
+            "level": chain.level,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        self.checkpoints.write(HEADER.pack(len(data)))
+        self.checkpoints.write(data)
+        self.checkpointed_at = self.entries
+
+    def maybe_checkpoint(self, chain):
+        if self.checkpoints is not None and self.entries - self.checkpointed_at >= self.checkpoint_every:
+            self.checkpoint(chain)
+
+    def write(self, contract, call, amount, sender, source, now, level, fingerprint):
+        parameters = call.parameters
+        body = b"".join([
+            FIXED.pack(amount, now, level, fingerprint),
+            pack_string(contract),
+            pack_string(parameters["entrypoint"]),
+            pack_string(sender),
+            pack_string(source),
+            forge_micheline(parameters["value"]),
+        ])
+        self.file.write(HEADER.pack(len(body)))
+        self.file.write(body)
+        self.entries += 1
+
+    """ a call LocalChain executed, taking the storage from `old` to the chain's current one """
+    def record(self, chain, call, amount, sender, source, old):
+        self.fingerprint = fingerprint_step(self.fingerprint, old, chain.storage, chain.big_maps or [])
+        self.write(chain.name, call, amount, sender, source, chain.now, chain.level, self.fingerprint)
+        self.maybe_checkpoint(chain)
+
+    """ calls of one execute_many and the storage after each of them, every call carries its fingerprint """
+    def record_many(self, chain, calls, old, storages):
+        for (call, options), storage in zip(calls, storages):
+            self.fingerprint = fingerprint_step(self.fingerprint, old, storage, chain.big_maps or [])
+            old = storage
+            self.write(chain.name, call, options["amount"], options["sender"], options["source"], chain.now,
+                chain.level, self.fingerprint)
+        self.maybe_checkpoint(chain)
+
+    def flush(self):
+        self.file.flush()
+        if self.checkpoints is not None:
+            self.checkpoints.flush()
+
+    def close(self):
+        self.file.close()
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+"""
+the entries of a journal one at a time, as dicts of contract, entrypoint, parameters (as ContractCall
+takes them), amount, sender, source, now, level and fingerprint. `offset` starts at a checkpoint's entry
+"""
+def read_journal(path, offset=None):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} isn't a call journal")
+        if offset is not None:
+            f.seek(offset)
+        while True:
+            header = f.read(HEADER.size)
+            if not header:
+                return
+            (length,) = HEADER.unpack(header)
+            body = f.read(length)
+            if len(body) < length:
+                # the run was cut off in the middle of a write
+                return
+
+            amount, now, level, fingerprint = FIXED.unpack_from(body)
+            offset = FIXED.size
+            contract, offset = unpack_string(body, offset)
+            entrypoint, offset = unpack_string(body, offset)
+            sender, offset = unpack_string(body, offset)
+            source, offset = unpack_string(body, offset)
+            yield {
+                "contract": contract,
+                "entrypoint": entrypoint,
+                "parameters": {"entrypoint": entrypoint, "value": unforge_micheline(body[offset:])},
+                "amount": amount,
+                "sender": sender,
+                "source": source,
+                "now": now,
+                "level": level,
+                "fingerprint": fingerprint,
+            }
+
+""" the checkpoints of a journal one at a time, see CallJournal.checkpoint """
+def read_checkpoints(path):
+    location = checkpoint_path(path)
+    if not os.path.exists(location):
+        return
+    with open(location, "rb") as f:
+        while True:
+            header = f.read(HEADER.size)
+            if not header:
+                return
+            (length,) = HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield pickle.loads(data)
+
+class JournalMismatch(AssertionError):
+    def __init__(self, index, entry):
+        self.index = index
+        self.entry = entry
+        super().__init__(f"entry {index} ({entry['entrypoint']} at level {entry['level']}) "
+            "left a different storage than in the journal")
+
+"""
+execute journal entries on a chain holding the storage the journal started from, checking the storage
+against every recorded fingerprint. View results aren't journaled, `view_results` is passed to every call.
+`fingerprint` and `start` continue from a checkpoint. Returns the number of entries replayed
+"""
+def replay(entries, chain, interface, view_results=None, fingerprint=None, start=0):
+    if fingerprint is None:
+        fingerprint = hash_storage(chain.storage)
+    old = chain.storage
+    count = 0
+    for index, entry in enumerate(entries, start):
+        chain.now = entry["now"]
+        chain.level = entry["level"]
+        call = ContractCall(interface.context, entry["parameters"])
+        chain.execute(call, amount=entry["amount"], sender=entry["sender"], source=entry["source"],
+            view_results=view_results)
+        count += 1
+
+        # older journals only fingerprint the last call of an execute_many batch
+        if entry["fingerprint"] != NO_FINGERPRINT:
+            fingerprint = fingerprint_step(fingerprint, old, chain.storage, chain.big_maps or [])
+            old = chain.storage
+            if fingerprint != entry["fingerprint"]:
+                raise JournalMismatch(index, entry)
+    return count
@@ -0,0 +1,208 @@
+import argparse
+import random
+import sys
+import time
+from bisect import bisect
+from heapq import heapify, heappop, heappush
+from itertools import accumulate
+
+# the bucket's baker election (vote and ban_baker in bucket_methods.ligo) replayed next to an exact
+# leaderboard of bakers. The contract only tracks current_delegated and next_candidate, so after some
+# vote sequences it delegates to a baker that isn't the most voted one; the simulator counts those steps.
+#
+#   python3 scenario/leaderboard.py --steps 1000000 --voters 20000 --bakers 300
+
+zero_key_hash = "tz1ZZZZZZZZZZZZZZZZZZZZZZZZZZZZNkiRg"
+
+class Leaderboard():
+    """ bakers by votes: a heap with lazy deletion, stale entries are dropped once they reach the top """
+    def __init__(self, votes):
+        # shared with the election, the heap is only a hint checked against it
+        self.votes = votes
+        self.heap = []
+
+    def update(self, baker):
+        votes = self.votes.get(baker, 0)
+        if votes:
+            heappush(self.heap, (-votes, baker))
+        if len(self.heap) > 2 * len(self.votes) + 1024:
+            self.heap = [(-votes, baker) for baker, votes in self.votes.items() if votes]
+            heapify(self.heap)
+
+    """ the most voted baker that isn't banned, None when nobody has votes """
+    def top(self, is_banned):
+        heap = self.heap
+        banned = []
+        result = None
+        while heap:
+            votes, baker = heap[0]
+            if self.votes.get(baker, 0) != -votes:
+                heappop(heap)
+            elif is_banned(baker):
+                banned.append(heappop(heap))
+            else:
+                result = baker
+                break
+        for entry in banned:
+            heappush(heap, entry)
+        return result
+
+class Election():
+    """ the bucket's election state, the same fields and update rules as the contract """
+    def __init__(self, current_delegated=zero_key_hash, next_candidate=zero_key_hash,
+                 previous_delegated=zero_key_hash, now=0):
+        self.current_delegated = current_delegated
+        self.next_candidate = next_candidate
+        self.previous_delegated = previous_delegated
+        self.now = now
+
+        self.users = {}
+        self.votes = {}
+        self.ban_end_time = {}
+        self.leaderboard = Leaderboard(self.votes)
+
+    def is_banned(self, baker):
+        return self.ban_end_time.get(baker, 0) > self.now
+
+    def ban_baker(self, baker, ban_period):
+        self.ban_end_time[baker] = self.now + ban_period
+
+    """ returns the new delegate when the vote changes delegation, zero_key_hash meaning none """
+    def vote(self, voter, candidate, votes, execute_voting=True):
+        votes_of = self.votes
+        user_candidate, user_votes = self.users.get(voter, (None, 0))
+
+        if user_candidate is not None:
+            left = votes_of.get(user_candidate, 0) - user_votes
+            if left < 0:
+                raise ValueError(f"baker {user_candidate} would have negative votes")
+            votes_of[user_candidate] = left
+            self.leaderboard.update(user_candidate)
+
+        candidate_votes = votes_of.get(candidate, 0) + votes
+        votes_of[candidate] = candidate_votes
+        self.leaderboard.update(candidate)
+        self.users[voter] = (candidate if votes != 0 else None, votes)
+
+        current_votes = votes_of.get(self.current_delegated, 0)
+        next_votes = votes_of.get(self.next_candidate, 0)
+        if candidate_votes > current_votes:
+            self.next_candidate = self.current_delegated
+            self.current_delegated = candidate
+        elif candidate_votes > next_votes and candidate != self.current_delegated:
+            self.next_candidate = candidate
+        elif next_votes > current_votes:
+            self.current_delegated, self.next_candidate = self.next_candidate, self.current_delegated
+
+        if not execute_voting:
+            return None
+
+        next_candidate = zero_key_hash if self.is_banned(self.next_candidate) else self.next_candidate
+        to_be_delegated = next_candidate if self.is_banned(self.current_delegated) else self.current_delegated
+        if to_be_delegated == self.previous_delegated:
+            return None
+        self.previous_delegated = to_be_delegated
+        return to_be_delegated
+
+    def delegate(self):
+        return self.previous_delegated
+
+    def top(self):
+        return self.leaderboard.top(self.is_banned)
+
+    """ the top baker when the delegate holds fewer votes than it, None when the delegate is a top one """
+    def mismatch(self):
+        top = self.top()
+        if top is None:
+            return None
+        delegate = self.previous_delegated
+        delegate_votes = 0 if self.is_banned(delegate) else self.votes.get(delegate, 0)
+        if delegate_votes < self.votes[top]:
+            return top
+        return None
+
+class Report():
+    def __init__(self):
+        self.steps = 0
+        self.mismatches = 0
+        self.delegations = 0
+        # the largest share of all votes the top baker held over the delegate
+        self.max_gap = 0.0
+        self.examples = []
+
+    def __str__(self):
+        share = self.mismatches / self.steps if self.steps else 0
+        return (f"{self.steps} steps, {self.delegations} delegation changes, delegate isn't the top baker "
+            f"after {self.mismatches} steps ({share:.2%}), largest gap {self.max_gap:.2%} of all votes")
+
+"""
+random vote churn: voters with log-normal stakes vote for bakers of Zipf-like popularity, move their
+votes, withdraw them, and bakers are banned now and then. Returns the Report of the run
+"""
+def simulate(seed=0, steps=1_000_000, voters=10_000, bakers=200, skew=1.0, unvote_rate=0.05, ban_rate=0.0002,
+             ban_period=3_600, step_time=30, examples=10):
+    rng = random.Random(seed)
+    stakes = [max(1, int(rng.lognormvariate(10, 2))) for _ in range(voters)]
+    baker_names = [f"baker{i}" for i in range(bakers)]
+    popularity = list(accumulate(1 / (rank + 1) ** skew for rank in range(bakers)))
+    total_popularity = popularity[-1]
+
+    election = Election()
+    report = Report()
+    total_votes = 0
+    random_value = rng.random
+
+    for step in range(steps):
+        election.now += step_time
+        if random_value() < ban_rate:
+            election.ban_baker(baker_names[bisect(popularity, random_value() * total_popularity)], ban_period)
+
+        voter = int(random_value() * voters)
+        _, previous = election.users.get(voter, (None, 0))
+        if random_value() < unvote_rate:
+            votes = 0
+            candidate = baker_names[int(random_value() * bakers)]
+        else:
+            # stakes drift a little between votes
+            votes = max(1, int(stakes[voter] * (0.8 + 0.4 * random_value())))
+            candidate = baker_names[bisect(popularity, random_value() * total_popularity)]
+        total_votes += votes - previous
+
+        if election.vote(voter, candidate, votes) is not None:
+            report.delegations += 1
+
+        top = election.mismatch()
+        report.steps += 1
+        if top is not None:
+            report.mismatches += 1
+            delegate = election.delegate()
+            delegate_votes = 0 if election.is_banned(delegate) else election.votes.get(delegate, 0)
+            gap = (election.votes[top] - delegate_votes) / total_votes
+            report.max_gap = max(report.max_gap, gap)
+            if len(report.examples) < examples:
+                report.examples.append((step, delegate, delegate_votes, top, election.votes[top]))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay baker votes through the bucket's election")
+    parser.add_argument("--steps", type=int, default=1_000_000)
+    parser.add_argument("--voters", type=int, default=10_000)
+    parser.add_argument("--bakers", type=int, default=200)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of baker popularity, 0 is uniform")
+    parser.add_argument("--unvote-rate", type=float, default=0.05)
+    parser.add_argument("--ban-rate", type=float, default=0.0002)
+    parser.add_argument("--ban-period", type=int, default=3_600, help="seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    report = simulate(args.seed, args.steps, args.voters, args.bakers, args.skew, args.unvote_rate, args.ban_rate,
+        args.ban_period)
+    print(report)
+    for step, delegate, delegate_votes, top, top_votes in report.examples:
+        print(f"  step {step}: delegated to {delegate} ({delegate_votes} votes), top is {top} ({top_votes} votes)")
+    print(f"in {time.time() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
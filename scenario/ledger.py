@@ -0,0 +1,191 @@
+import sys
+
+# balances of every token LocalChain moves: tez, FA1.2 tokens as (address, None) and FA2 tokens as
+# (address, token_id). Addresses and tokens are interned to indices and each token keeps its balances in
+# a list indexed by address, so a transfer is two list updates. Lists rather than fixed-width arrays,
+# since nat amounts outgrow 64 bits.
+#
+#   ledger = chain.use_ledger(Ledger(strict=True))
+#   ledger.mint(TEZ, alice, 1_000_000)
+#   ...
+#   ledger.check(chain)
+#
+# Tokens only enter through `mint`, so every token's balances sum to what was minted for it. With
+# `strict` a call's transfers are checked together before any of them is applied, a source that would go
+# below zero raises LedgerError and leaves the ledger and the chain as they were.
+#
+# Snapshots save the ledger and rollbacks restore it in place, so the object use_ledger returned stays the
+# chain's ledger; a fork gets a copy.
+#
+# check(chain) reconciles the ledger with what LocalChain accounts on its own: the tez of the chain's
+# contract and of the registered ones, and the payouts and contract_balances received by everybody else.
+# Only the addresses transfers touched since the last check are compared, besides the contracts.
+
+TEZ = "tez"
+
+class LedgerError(AssertionError):
+    pass
+
+class Ledger():
+    def __init__(self, strict=False):
+        self.strict = strict
+        self.address_ids = {}
+        self.addresses = []
+        self.token_ids = {}
+        self.tokens = []
+        # per token, indexed by address id
+        self.columns = []
+        self.supply = []
+        self.transfers = 0
+        # tez received by an address, or tokens of a token address whatever their id, as payouts and
+        # contract_balances count them
+        self.received = {}
+        # the `received` keys changed since the last check
+        self.dirty = set()
+        # payouts and contract_balances the chain had when the ledger was attached
+        self.baseline = {}
+
+    def address_id(self, address):
+        index = self.address_ids.get(address)
+        if index is None:
+            index = len(self.addresses)
+            address = sys.intern(address)
+            self.address_ids[address] = index
+            self.addresses.append(address)
+        return index
+
+    def token_id(self, token):
+        index = self.token_ids.get(token)
+        if index is None:
+            index = len(self.tokens)
+            self.token_ids[token] = index
+            self.tokens.append(token)
+            self.columns.append([])
+            self.supply.append(0)
+        return index
+
+    """ the balances of a token, long enough to index every known address """
+    def column(self, token):
+        index = self.token_ids.get(token)
+        column = self.columns[self.token_id(token) if index is None else index]
+        if len(column) < len(self.addresses):
+            column.extend([0] * (len(self.addresses) - len(column)))
+        return column
+
+    """ create `amount` of a token on an address, the only way tokens enter the ledger """
+    def mint(self, token, address, amount):
+        index = self.address_id(address)
+        self.column(token)[index] += amount
+        self.supply[self.token_ids[token]] += amount
+
+    def transfer(self, token, source, destination, amount):
+        if amount == 0:
+            return
+        ids = self.address_ids
+        source_id = ids[source] if source in ids else self.address_id(source)
+        destination_id = ids[destination] if destination in ids else self.address_id(destination)
+        column = self.column(token)
+        if self.strict and column[source_id] < amount:
+            raise LedgerError(f"{source} sends {amount} of {token} holding {column[source_id]}")
+        column[source_id] -= amount
+        column[destination_id] += amount
+        self.transfers += 1
+
+        key = (token if token == TEZ else token[0], destination)
+        self.received[key] = self.received.get(key, 0) + amount
+        self.dirty.add(key)
+
+    """ (token, source, destination, amount) transfers applied all together or, if one fails, not at all """
+    def transfer_many(self, transfers):
+        if self.strict:
+            pending = {}
+            for token, source, destination, amount in transfers:
+                if amount == 0:
+                    continue
+                held = self.balance(token, source) + pending.get((token, source), 0)
+                if held < amount:
+                    raise LedgerError(f"{source} sends {amount} of {token} holding {held}")
+                pending[(token, source)] = pending.get((token, source), 0) - amount
+                pending[(token, destination)] = pending.get((token, destination), 0) + amount
+        for transfer in transfers:
+            self.transfer(*transfer)
+
+    """ the (token, source, destination, amount) transfer of a helpers.Transfer record """
+    @staticmethod
+    def move(transfer):
+        token = TEZ if transfer.type == "tez" else (transfer.token_address, transfer.token_id)
+        return token, transfer.source, transfer.destination, transfer.amount
+
+    def apply(self, transfer):
+        self.transfer(*self.move(transfer))
+
+    def balance(self, token, address):
+        if token not in self.token_ids or address not in self.address_ids:
+            return 0
+        column = self.columns[self.token_ids[token]]
+        index = self.address_ids[address]
+        return column[index] if index < len(column) else 0
+
+    """ the non-zero balances of a token by address """
+    def balances(self, token):
+        if token not in self.token_ids:
+            return {}
+        column = self.columns[self.token_ids[token]]
+        return {self.addresses[index]: amount for index, amount in enumerate(column) if amount != 0}
+
+    """
+    called by LocalChain.use_ledger: the tez the chain's contracts already hold are minted to them and
+    payouts and contract_balances so far are left out of the reconciliation
+    """
+    def start(self, chain):
+        if chain.balance:
+            self.mint(TEZ, chain.name, chain.balance)
+        for address, contract in chain.contracts.items():
+            if contract.balance:
+                self.mint(TEZ, address, contract.balance)
+        self.baseline = {(TEZ, address): amount for address, amount in chain.payouts.items()}
+        for token_address, balances in chain.contract_balances.items():
+            for address, amount in balances.items():
+                self.baseline[(token_address, address)] = amount
+
+    """ the ledger agrees with the chain on the tez its contracts hold and on what the addresses touched since the last check received """
+    def check(self, chain):
+        held = {address: contract.balance for address, contract in chain.contracts.items()}
+        if chain.name not in held:
+            held[chain.name] = chain.balance
+        for address, balance in held.items():
+            if self.balance(TEZ, address) != balance:
+                raise LedgerError(f"{address} holds {balance} tez, the ledger has {self.balance(TEZ, address)}")
+
+        for key in self.dirty:
+            token, address = key
+            if token == TEZ and address in held:
+                continue
+            if token == TEZ:
+                counted = chain.payouts.get(address, 0)
+            else:
+                counted = chain.contract_balances.get(token, {}).get(address, 0)
+            received = self.received[key] + self.baseline.get(key, 0)
+            if counted != received:
+                raise LedgerError(f"{address} was paid {counted} of {token}, the ledger has {received}")
+        self.dirty = set()
+
+    """ the balances and counters, for LocalChain.snapshot """
+    def save(self):
+        return (dict(self.address_ids), list(self.addresses), dict(self.token_ids), list(self.tokens),
+            [list(column) for column in self.columns], list(self.supply), self.transfers, dict(self.received),
+            set(self.dirty), self.baseline)
+
+    """ go back to a saved state in place, e.g. on LocalChain.rollback; the state can be restored again """
+    def restore(self, state):
+        address_ids, addresses, token_ids, tokens, columns, supply, self.transfers, received, dirty, self.baseline = state
+        self.address_ids, self.addresses = dict(address_ids), list(addresses)
+        self.token_ids, self.tokens = dict(token_ids), list(tokens)
+        self.columns = [list(column) for column in columns]
+        self.supply = list(supply)
+        self.received, self.dirty = dict(received), set(dirty)
+
+    def copy(self):
+        ledger = Ledger(self.strict)
+        ledger.restore(self.save())
+        return ledger
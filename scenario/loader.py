@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import pickle
+from copy import deepcopy
+
+from pytezos import ContractInterface
+from pytezos.michelson.parse import michelson_to_micheline
+
+CACHE_DIR = "./scenario/.cache"
+
+# parsed interfaces are dynamically generated classes and can't be pickled, so they are memoized per
+# process. Only the micheline of .tz artifacts goes to disk: parsing Michelson text takes ~40ms for the
+# bucket against ~3ms to unpickle it, while a .json artifact already loads as fast as its pickle would.
+# ContractInterface.from_micheline (~70ms for the bucket) runs once per process either way.
+_interfaces = {}
+
+def artifact_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def parse_artifact(path):
+    text = open(path).read()
+    if path.endswith(".json"):
+        return json.loads(text)["michelson"]
+    return michelson_to_micheline(text)
+
+def cache_path(path, digest):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{digest[:16]}.micheline.pickle")
+
+def drop_stale(path, keep):
+    name = os.path.splitext(os.path.basename(path))[0]
+    for entry in os.listdir(CACHE_DIR):
+        if entry.startswith(f"{name}-") and os.path.join(CACHE_DIR, entry) != keep:
+            os.remove(os.path.join(CACHE_DIR, entry))
+
+def read_cache(path, digest):
+    location = cache_path(path, digest)
+    if not os.path.exists(location):
+        return None
+    try:
+        with open(location, "rb") as f:
+            return pickle.load(f)
+    except (pickle.UnpicklingError, EOFError):
+        return None
+
+def write_cache(path, digest, entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    location = cache_path(path, digest)
+    tmp = location + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, location)
+    drop_stale(path, location)
+
+def load_entry(path):
+    digest = artifact_hash(path)
+    key = (os.path.abspath(path), digest)
+    if key in _interfaces:
+        return _interfaces[key]
+
+    if path.endswith(".json"):
+        code = parse_artifact(path)
+    else:
+        code = read_cache(path, digest)
+        if code is None:
+            code = parse_artifact(path)
+            write_cache(path, digest, code)
+
+    ct = ContractInterface.from_micheline(code)
+    _interfaces[key] = (ct, ct.storage.dummy())
+    return _interfaces[key]
+
+def load_contract(path):
+    """ returns the parsed interface of a build artifact (.json or .tz) and a fresh dummy storage """
+    ct, storage = load_entry(path)
+    return ct, deepcopy(storage)
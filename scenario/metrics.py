@@ -0,0 +1,136 @@
+import json
+from math import ceil
+
+from pytezos.context.impl import ExecutionContext
+from pytezos.michelson.forge import forge_micheline
+from pytezos.michelson.sections import StorageSection
+from pytezos.michelson.types import BigMapType, PairType
+
+from helpers import CowMap, _removed, get_path, load_program
+
+# per call metrics for LocalChain, enabled with `chain.instrument(CallMetrics())`.
+# The interpreter doesn't meter gas, so calls are measured in executed instructions instead: the count
+# ranks entrypoints and hop counts of the same code, but isn't gas and can't be compared with milligas.
+#
+#   metrics = chain.instrument(CallMetrics(names={dex_core: "dex_core"}), name="dex_core")
+#   ...
+#   metrics.dump("metrics.json")
+
+stats = ["instructions", "storage_size", "big_map_diff", "big_map_diff_bytes", "operations"]
+
+def micheline_size(expr):
+    return len(forge_micheline(expr))
+
+""" big_map key and value types by storage path, the same paths find_big_maps returns """
+def find_big_map_types(context):
+    storage_ty = StorageSection.match(context.storage_expr).args[0]
+    types = {}
+
+    def walk(value, path):
+        if isinstance(value, BigMapType):
+            types[path] = (type(value).args[0], type(value).args[1])
+        elif isinstance(value, PairType):
+            fields = value.get_flat_values()
+            if isinstance(fields, dict):
+                for name, field in fields.items():
+                    walk(field, path + (name,))
+
+    walk(storage_ty.dummy(ExecutionContext()), ())
+    return types
+
+def count_instructions(stdout):
+    return sum(1 for line in stdout if not line.startswith(("BEGIN", "END")))
+
+""" the swaps of a route are labelled with the hop count, e.g. swap[2 hops] """
+def call_label(entrypoint, value):
+    if isinstance(value, dict) and isinstance(value.get("swaps"), list):
+        return f"{entrypoint}[{len(value['swaps'])} hops]"
+    return entrypoint
+
+""" nearest-rank percentile of sorted values """
+def percentile(values, q):
+    return values[max(0, ceil(q / 100 * len(values)) - 1)]
+
+class CallMetrics():
+    def __init__(self, names=None, percentiles=(50, 90, 99)):
+        # addresses shown under a readable name
+        self.names = dict(names or {})
+        self.percentiles = percentiles
+        self.samples = {}
+        self.failures = {}
+        self.big_map_types = {}
+
+    def key(self, contract, context, parameters):
+        value = load_program(context).parameter.from_parameters(parameters).to_python_object()
+        entrypoint = parameters["entrypoint"]
+        if isinstance(value, dict) and len(value) == 1 and entrypoint in value:
+            value = value[entrypoint]
+        return f"{self.names.get(contract, contract)}%{call_label(entrypoint, value)}"
+
+    def types_for(self, context):
+        if id(context) not in self.big_map_types:
+            self.big_map_types[id(context)] = (context, find_big_map_types(context))
+        return self.big_map_types[id(context)][1]
+
+    """ changed entries and their size in bytes, removals count their key only """
+    def big_map_diff(self, context, old, new, paths):
+        types = self.types_for(context)
+        entries = size = 0
+        for path in paths:
+            old_map, new_map = get_path(old, path), get_path(new, path)
+            if old_map is new_map or old_map is None or new_map is None:
+                continue
+            key_ty, value_ty = types[path]
+            for key, value in CowMap.changes(old_map, new_map).items():
+                entries += 1
+                size += micheline_size(key_ty.from_python_object(key).to_micheline_value())
+                if value is not _removed:
+                    size += micheline_size(value_ty.from_python_object(value).to_micheline_value())
+        return entries, size
+
+    """ record a successful call; big_map diffs are measured when the storage before it is given """
+    def measure(self, contract, res, stdout, old_storage=None, big_maps=None):
+        sample = {
+            "instructions": count_instructions(stdout),
+            "storage_size": micheline_size(res.storage_value.to_micheline_value(lazy_diff=True)),
+            "operations": len(res.operations),
+        }
+        if old_storage is not None and big_maps:
+            sample["big_map_diff"], sample["big_map_diff_bytes"] = \
+                self.big_map_diff(res.context, old_storage, res.storage, big_maps)
+
+        key = self.key(contract, res.context, res.parameters)
+        self.samples.setdefault(key, []).append(sample)
+        return sample
+
+    def failed(self, contract, context, parameters):
+        key = self.key(contract, context, parameters)
+        self.failures[key] = self.failures.get(key, 0) + 1
+
+    def summary(self):
+        result = {}
+        for key in sorted(set(self.samples) | set(self.failures)):
+            samples = self.samples.get(key, [])
+            entry = {"calls": len(samples), "failed": self.failures.get(key, 0)}
+            for stat in stats:
+                values = sorted(sample[stat] for sample in samples if stat in sample)
+                if not values:
+                    continue
+                entry[stat] = {f"p{q}": percentile(values, q) for q in self.percentiles}
+                entry[stat]["min"] = values[0]
+                entry[stat]["max"] = values[-1]
+                entry[stat]["mean"] = sum(values) / len(values)
+            result[key] = entry
+        return result
+
+    """ the summary as JSON, written to path when one is given """
+    def dump(self, path=None):
+        text = json.dumps(self.summary(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def reset(self):
+        self.samples = {}
+        self.failures = {}
@@ -0,0 +1,142 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import unittest
+
+# run the scenario suite on several cores. Contract interfaces and lambda sets are loaded once in
+# the parent, the workers are forked afterwards and share them copy-on-write.
+#
+#   python3 scenario/parallel.py -j 8
+#   python3 scenario/parallel.py -j 8 --split tests test_swap test_tez
+
+SCENARIO_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCENARIO_DIR not in sys.path:
+    sys.path.insert(0, SCENARIO_DIR)
+
+from loader import load_contract
+from initial_storage import lambda_sets, load_lambdas
+
+artifacts = [
+    "./build/dex_core.json",
+    "./build/auction.json",
+    "./contracts/compiled/bucket.tz",
+]
+
+""" load everything the test classes parse in setUpClass, artifacts that aren't built are left to the tests """
+def prewarm():
+    for path in artifacts:
+        if os.path.exists(path):
+            load_contract(path)
+    for name, (path, _) in lambda_sets.items():
+        if os.path.exists(path):
+            load_lambdas(name)
+
+def iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+# modules that failed to import, by test id. They can't be loaded again by name, so the workers
+# (forked after discover) run the _FailedTest itself to report the error
+failed_imports = {}
+
+""" names of the units to spread over the workers: `module.Class` or `module.Class.test` """
+def discover(modules, split):
+    loader = unittest.TestLoader()
+    if modules:
+        suite = loader.loadTestsFromNames(modules)
+    else:
+        suite = loader.discover(SCENARIO_DIR, pattern="test_*.py", top_level_dir=SCENARIO_DIR)
+
+    failed_imports.clear()
+    units = []
+    for test in iter_tests(suite):
+        if isinstance(test, unittest.loader._FailedTest):
+            failed_imports[test.id()] = test
+            units.append(test.id())
+            continue
+        cls = type(test)
+        name = f"{cls.__module__}.{cls.__qualname__}"
+        if split == "tests":
+            name = f"{name}.{test._testMethodName}"
+        if name not in units:
+            units.append(name)
+    return units
+
+class RecordingResult(unittest.TestResult):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def addSuccess(self, test):
+        self.records.append((str(test), "ok", ""))
+
+    def addFailure(self, test, err):
+        self.records.append((str(test), "FAIL", self._exc_info_to_string(err, test)))
+
+    def addError(self, test, err):
+        self.records.append((str(test), "ERROR", self._exc_info_to_string(err, test)))
+
+    def addSkip(self, test, reason):
+        self.records.append((str(test), "skip", reason))
+
+    def addExpectedFailure(self, test, err):
+        self.records.append((str(test), "ok", ""))
+
+    def addUnexpectedSuccess(self, test):
+        self.records.append((str(test), "FAIL", "unexpected success"))
+
+def run_unit(name):
+    started = time.time()
+    result = RecordingResult()
+    try:
+        if name in failed_imports:
+            failed_imports[name].run(result)
+        else:
+            unittest.TestLoader().loadTestsFromName(name).run(result)
+    except Exception:
+        result.records.append((name, "ERROR", traceback.format_exc()))
+    return name, result.records, time.time() - started
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the scenario tests on several cores")
+    parser.add_argument("modules", nargs="*", help="test modules, classes or tests, everything by default")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--split", choices=["classes", "tests"], default="classes",
+        help="unit of work: whole TestCase classes (setUpClass runs once) or single tests")
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    prewarm()
+    units = discover(args.modules, args.split)
+
+    records = []
+    with multiprocessing.get_context("fork").Pool(args.jobs) as pool:
+        for name, unit_records, duration in pool.imap_unordered(run_unit, units):
+            statuses = [status for _, status, _ in unit_records]
+            failed = sum(status in ("FAIL", "ERROR") for status in statuses)
+            print(f"{'FAIL' if failed else 'ok':4} {name} ({len(statuses)} tests, {duration:.1f}s)", flush=True)
+            records += unit_records
+
+    problems = [record for record in records if record[1] in ("FAIL", "ERROR")]
+    for test, status, details in problems:
+        print("=" * 70)
+        print(f"{status}: {test}")
+        print("-" * 70)
+        print(details)
+
+    counts = {}
+    for _, status, _ in records:
+        counts[status] = counts.get(status, 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"\n{summary} in {time.time() - started:.1f}s on {args.jobs} workers")
+
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
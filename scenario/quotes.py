@@ -0,0 +1,108 @@
+from math import gcd
+
+import numpy as np
+
+from dex_model import PRECISION, ERR_WRONG_ROUTE, ERR_NO_LIQUIDITY, ERR_BUCKET_404, \
+    ERR_EMPTY_ROUTE, ERR_PAIR_NOT_LISTED, fail, get_nat_or_fail, form_swap_data, form_pools, direction_of, is_tez
+
+# vectorized dex_core swap quotes over arrays of amounts, exact to the mutez.
+# The contract's 1e18 precision is reduced by the gcd with the fee rates, so pools and amounts of
+# everyday size stay in int64; once a product could overflow the whole hop switches to python ints.
+#
+# Quotes are masked arrays: amounts the contract would reject on their own, a zero amount into any hop
+# (ERR_ZERO_IN), come out masked. Failures that hold for every amount, such as a pool without liquidity
+# or a route through tez without buckets, raise the same errors as dex_model
+
+INT64_MAX = int(np.iinfo(np.int64).max)
+
+def reduce_rate(rate):
+    divisor = gcd(rate, PRECISION)
+    return rate // divisor, PRECISION // divisor
+
+def as_amounts(values):
+    array = np.asarray(values)
+    if array.dtype != object and not np.issubdtype(array.dtype, np.integer):
+        raise TypeError(f"amounts must be integers, got {array.dtype}")
+    if array.size and array.min() < 0:
+        raise ValueError("amounts must be natural numbers")
+    return array
+
+def upper(values):
+    return int(np.max(values)) if np.size(values) else 0
+
+"""
+one swap_internal step for every amount: returns the amounts out and the pools after each swap.
+Pools may be numbers or arrays matching the amounts; amounts that are zero or already masked come out masked
+"""
+def swap_arrays(amounts, from_pool, to_pool, fees):
+    if not (np.all(np.asarray(from_pool) > 0) and np.all(np.asarray(to_pool) > 0)):
+        fail(ERR_NO_LIQUIDITY)
+    invalid = np.ma.getmaskarray(amounts) | (np.ma.getdata(amounts) == 0)
+    amounts = np.ma.getdata(amounts)
+
+    fee_rate = fees["interface_fee"] + fees["swap_fee"] + fees["auction_fee"]
+    rate_without_fee = get_nat_or_fail(PRECISION - fee_rate)
+    rate, rate_precision = reduce_rate(rate_without_fee)
+    kept, kept_precision = reduce_rate(rate_without_fee + fees["swap_fee"])
+
+    max_in, max_from, max_to = upper(amounts), upper(from_pool), upper(to_pool)
+    bounds = [
+        max_in * rate * max_to,
+        max_from * rate_precision + max_in * rate,
+        max_in * kept,
+        max_from + max_in,
+    ]
+    dtype = np.int64 if max(bounds) <= INT64_MAX else object
+    amounts, from_pool, to_pool = (np.asarray(value).astype(dtype) for value in (amounts, from_pool, to_pool))
+
+    from_in_with_fee = amounts * rate
+    out = from_in_with_fee * to_pool // (from_pool * rate_precision + from_in_with_fee)
+    amount_with_swap_fee = amounts * kept // kept_precision
+
+    return np.ma.masked_array(out, mask=invalid), from_pool + amount_with_swap_fee, to_pool - out
+
+""" amounts out of a single pool, an exact integer masked array """
+def quote_array(amounts, from_pool, to_pool, fees):
+    out, _, _ = swap_arrays(as_amounts(amounts), from_pool, to_pool, fees)
+    return out
+
+"""
+amounts out of a swaps list for every amount in, each quoted against the same storage.
+Pairs visited twice see the pools left by the earlier hop, the same as in the contract
+"""
+def quote_route(storage, swaps, amounts):
+    s = storage["storage"]
+    amounts = as_amounts(amounts)
+    pools = {}
+    token_in = None
+    from_bucket = None
+    if len(swaps) == 0:
+        fail(ERR_EMPTY_ROUTE)
+
+    for params in swaps:
+        pair_id = params["pair_id"]
+        direction = direction_of(params)
+        if pair_id not in s["pairs"] or pair_id not in s["tokens"]:
+            fail(ERR_PAIR_NOT_LISTED)
+        pair = s["pairs"][pair_id]
+        (from_pool, from_token), (to_pool, to_token) = form_swap_data(pair, s["tokens"][pair_id], direction)
+        if token_in is not None and from_token != token_in:
+            fail(ERR_WRONG_ROUTE)
+        # tez into a later hop is forwarded between the pairs' buckets
+        if token_in is not None and is_tez(from_token) and (from_bucket is None or pair["bucket"] is None):
+            fail(ERR_BUCKET_404)
+        from_bucket = pair["bucket"] if is_tez(to_token) else None
+
+        if pair_id in pools:
+            token_a_pool, token_b_pool = pools[pair_id]
+            from_pool, to_pool = form_pools(token_a_pool, token_b_pool, direction)
+
+        amounts, from_pool, to_pool = swap_arrays(amounts, from_pool, to_pool, s["fees"])
+        pools[pair_id] = form_pools(from_pool, to_pool, direction)
+        token_in = to_token
+
+    return amounts
+
+""" quote every amount through one pair, e.g. to plot price impact """
+def quote_pair(storage, pair_id, amounts, direction="a_to_b"):
+    return quote_route(storage, [{"pair_id": pair_id, "direction": direction}], amounts)
@@ -0,0 +1,166 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from itertools import islice
+
+# replays a call journal (see journal.py) recorded with checkpoints on a contract build, e.g. a new
+# dex_core against a long simulation recorded on the old one. The journal is split at its checkpoints and
+# the segments run in forked workers, each restoring its checkpoint and checking the storage fingerprint
+# after every call and at the segment end. Since the fingerprints chain every call, the first call whose
+# fingerprint differs in the earliest failing segment is the first diverging call.
+#
+#   python3 scenario/replay.py run.journal --contract ./build/dex_core.json -j 8
+#   python3 scenario/replay.py run.journal --contract ./build/dex_core.json --lambdas dex_core
+
+SCENARIO_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCENARIO_DIR not in sys.path:
+    sys.path.insert(0, SCENARIO_DIR)
+
+from pytezos import MichelsonRuntimeError
+
+from helpers import LocalChain
+from loader import load_contract
+from initial_storage import load_lambdas
+from journal import JournalMismatch, read_checkpoints, read_journal, replay
+
+# where each contract keeps its lambdas, replaced with the current build's by --lambdas
+lambda_fields = {
+    "dex_core": "dex_core_lambdas",
+    "auction": "auction_lambdas",
+}
+
+class Segment():
+    def __init__(self, index, checkpoint, end, end_fingerprint):
+        self.index = index
+        self.checkpoint = checkpoint
+        # the entry the next segment starts at, None for the rest of the journal
+        self.end = end
+        self.end_fingerprint = end_fingerprint
+
+    @property
+    def start(self):
+        return self.checkpoint["entry"]
+
+class SegmentResult():
+    def __init__(self, index, start, replayed, divergence=None, reason=None):
+        self.index = index
+        self.start = start
+        self.replayed = replayed
+        # the journal index of the first call that diverged and why
+        self.divergence = divergence
+        self.reason = reason
+
+""" the journal split at its checkpoints, consecutive checkpoints closer than `min_size` calls are merged """
+def segments(path, min_size=1):
+    checkpoints = []
+    for checkpoint in read_checkpoints(path):
+        if checkpoints and checkpoint["entry"] - checkpoints[-1]["entry"] < min_size:
+            continue
+        checkpoints.append(checkpoint)
+    if not checkpoints:
+        raise ValueError(f"{path} has no checkpoints, record it with CallJournal(checkpoint_every=...)")
+
+    result = []
+    for i, checkpoint in enumerate(checkpoints):
+        following = checkpoints[i + 1] if i + 1 < len(checkpoints) else None
+        end = following["entry"] if following else None
+        result.append(Segment(i, checkpoint, end, following["fingerprint"] if following else None))
+    return result
+
+def restore(checkpoint, lambdas=None):
+    chain = LocalChain(storage=checkpoint["storage"])
+    chain.balance = checkpoint["balance"]
+    chain.now = checkpoint["now"]
+    chain.level = checkpoint["level"]
+    if lambdas is not None:
+        chain.storage = dict(chain.storage, **{lambda_fields[lambdas]: load_lambdas(lambdas)})
+    return chain
+
+"""
+re-execute one segment from its checkpoint. Fingerprints are checked after every call and the last one
+against the next checkpoint; a failed call counts as a divergence as well
+"""
+def replay_segment(path, contract_path, segment, view_results=None, lambdas=None):
+    ct, _ = load_contract(contract_path)
+    chain = restore(segment.checkpoint, lambdas)
+    entries = read_journal(path, segment.checkpoint["offset"])
+    if segment.end is not None:
+        entries = islice(entries, segment.end - segment.start)
+
+    # counts the entries as they are taken, so a failed call is known by its index
+    taken = []
+    def counted(entries):
+        for entry in entries:
+            taken.append(entry)
+            yield entry
+
+    try:
+        replayed = replay(counted(entries), chain, ct, view_results, segment.checkpoint["fingerprint"],
+            segment.start)
+    except JournalMismatch as mismatch:
+        return SegmentResult(segment.index, segment.start, mismatch.index - segment.start, mismatch.index,
+            "storage differs")
+    except MichelsonRuntimeError as error:
+        index = segment.start + len(taken) - 1
+        return SegmentResult(segment.index, segment.start, len(taken) - 1, index, f"failed with {error.args[-1]}")
+
+    if segment.end is not None:
+        if replayed != segment.end - segment.start:
+            return SegmentResult(segment.index, segment.start, replayed, segment.start + replayed,
+                "journal ends before the next checkpoint")
+        if taken and taken[-1]["fingerprint"] != segment.end_fingerprint:
+            return SegmentResult(segment.index, segment.start, replayed, segment.end - 1,
+                "fingerprint differs from the next checkpoint")
+    return SegmentResult(segment.index, segment.start, replayed)
+
+def run_job(job):
+    return replay_segment(*job)
+
+""" replay every segment, in `jobs` forked workers. Returns the results in journal order """
+def check_journal(path, contract_path, jobs=1, view_results=None, lambdas=None, min_size=1):
+    work = [(path, contract_path, segment, view_results, lambdas) for segment in segments(path, min_size)]
+    # parsed once before the workers are forked
+    load_contract(contract_path)
+    if lambdas is not None:
+        load_lambdas(lambdas)
+
+    if jobs > 1:
+        with multiprocessing.get_context("fork").Pool(jobs) as pool:
+            return pool.map(run_job, work, chunksize=1)
+    return [run_job(job) for job in work]
+
+def first_divergence(results):
+    for result in results:
+        if result.divergence is not None:
+            return result
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a checkpointed call journal on a contract build")
+    parser.add_argument("journal")
+    parser.add_argument("--contract", required=True, help="the build to replay on")
+    parser.add_argument("--lambdas", choices=sorted(lambda_fields), help="swap in the lambdas of the current build")
+    parser.add_argument("--min-segment", type=int, default=1, help="merge segments shorter than this many calls")
+    parser.add_argument("-j", "--jobs", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    started = time.time()
+    results = check_journal(args.journal, args.contract, args.jobs, lambdas=args.lambdas, min_size=args.min_segment)
+    replayed = sum(result.replayed for result in results)
+    duration = time.time() - started
+    print(f"{replayed} calls in {len(results)} segments replayed in {duration:.1f}s "
+        f"({replayed / max(duration, 1e-9):.0f} calls/s)")
+
+    diverged = first_divergence(results)
+    if diverged is None:
+        print("no divergence")
+        return 0
+    entry = next(islice(read_journal(args.journal), diverged.divergence, None), None)
+    label = f"{entry['entrypoint']} at level {entry['level']}" if entry else "past the journal end"
+    print(f"first divergence at call {diverged.divergence} ({label}) in segment {diverged.index}: {diverged.reason}")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
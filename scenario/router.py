@@ -0,0 +1,83 @@
+from pytezos import MichelsonRuntimeError
+
+from dex_model import SwapState, swap_internal, token_key
+
+# route search over the dex_core pairs. Every hop runs dex_model.swap_internal, so candidates get the
+# contract's amounts and a route the contract would fail (an amount rounding to zero before a later hop,
+# tez forwarded without buckets) is dropped. Routes don't reuse a pair so every hop sees the pools from
+# the storage
+
+""" token key -> [(pair_id, direction, token key out)] over the listed pairs that have liquidity """
+def build_graph(storage):
+    s = storage["storage"]
+    graph = {}
+    for pair_id, tokens in s["tokens"].items():
+        pair = s["pairs"].get(pair_id)
+        if tokens is None or pair is None or pair["token_a_pool"] * pair["token_b_pool"] == 0:
+            continue
+
+        token_a, token_b = token_key(tokens["token_a"]), token_key(tokens["token_b"])
+        graph.setdefault(token_a, []).append((pair_id, "a_to_b", token_b))
+        graph.setdefault(token_b, []).append((pair_id, "b_to_a", token_a))
+    return graph
+
+"""
+every route of up to max_hops from token_in to token_out as (amount_out, swaps), best first.
+Tokens are given as in storage ({"fa12": address}) or in the key form (("fa12", address)).
+Without `now` each pair is swapped at its last_block_timestamp, which doesn't change the amounts
+"""
+def find_routes(storage, token_in, token_out, amount_in, max_hops=3, graph=None, now=None):
+    s = storage["storage"]
+    graph = build_graph(storage) if graph is None else graph
+    goal = token_key(token_out)
+
+    routes = []
+    path = []
+    used = set()
+
+    def walk(token, tmp):
+        if token == goal and path and tmp["amount_in"] > 0:
+            routes.append((tmp["amount_in"], list(path)))
+        if len(path) == max_hops:
+            return
+
+        for pair_id, direction, next_token in graph.get(token, []):
+            if pair_id in used:
+                continue
+
+            params = {"pair_id": pair_id, "direction": direction}
+            hop = dict(tmp, forwards=list(tmp["forwards"]))
+            if not path:
+                tokens = s["tokens"][pair_id]
+                hop["token_in"] = tokens["token_a"] if direction == "a_to_b" else tokens["token_b"]
+            # pairs aren't reused, so each hop can start from the storage as is
+            pair_now = s["pairs"][pair_id]["last_block_timestamp"] if now is None else now
+            try:
+                swap_internal(SwapState(storage), hop, params, pair_now)
+            except MichelsonRuntimeError:
+                continue
+
+            used.add(pair_id)
+            path.append(params)
+            walk(next_token, hop)
+            path.pop()
+            used.remove(pair_id)
+
+    walk(token_key(token_in), {
+        "forwards": [],
+        "token_in": None,
+        "referrer": None,
+        "from_bucket": None,
+        "amount_in": amount_in,
+        "counter": 0,
+    })
+    routes.sort(key=lambda route: route[0], reverse=True)
+    return routes
+
+""" the swaps list giving the most token_out and its amount, (None, 0) without a route """
+def best_route(storage, token_in, token_out, amount_in, max_hops=3, graph=None, now=None):
+    routes = find_routes(storage, token_in, token_out, amount_in, max_hops, graph, now)
+    if not routes:
+        return None, 0
+    amount_out, swaps = routes[0]
+    return swaps, amount_out
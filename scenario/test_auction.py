@@ -6,9 +6,10 @@ from pprint import pprint
 from constants import *
 
 from helpers import *
+from loader import load_contract
 
 from pytezos import ContractInterface, MichelsonRuntimeError
-from initial_storage import auction_lambdas
+from initial_storage import get_auction_lambdas
 
 class AuctionTest(TestCase):
 
@@ -16,13 +17,8 @@ class AuctionTest(TestCase):
     def setUpClass(cls):
         cls.maxDiff = None
 
-        text = open("./build/auction.json").read()
-        code = json.loads(text)
-
-        cls.ct = ContractInterface.from_micheline(code["michelson"])
-
-        storage = cls.ct.storage.dummy()
-        storage["auction_lambdas"] = auction_lambdas
+        cls.ct, storage = load_contract("./build/auction.json")
+        storage["auction_lambdas"] = get_auction_lambdas()
         storage["storage"]["admin"] = admin 
         storage["storage"]["dex_core"] = dex_core
         storage["storage"]["auction_duration"] = 300
@@ -251,19 +247,19 @@ class AuctionTest(TestCase):
         chain = LocalChain(storage=no_lambdas_storage)
         
         with self.assertRaises(MichelsonRuntimeError) as error: 
-            chain.execute(self.ct.setup_func(0, auction_lambdas[0]), sender=alice)
+            chain.execute(self.ct.setup_func(0, get_auction_lambdas()[0]), sender=alice)
         self.assertEqual(Errors.ERR_NOT_ADMIN, error.exception.args[-1])
 
-        chain.execute(self.ct.setup_func(0, auction_lambdas[0]), sender=admin)
+        chain.execute(self.ct.setup_func(0, get_auction_lambdas()[0]), sender=admin)
 
         with self.assertRaises(MichelsonRuntimeError) as error:
-            chain.execute(self.ct.setup_func(0, auction_lambdas[0]), sender=admin)
+            chain.execute(self.ct.setup_func(0, get_auction_lambdas()[0]), sender=admin)
         self.assertEqual(Errors.AUCTION_FUNC_ALREADY_SET, error.exception.args[-1])
 
-        chain.execute(self.ct.setup_func(13, auction_lambdas[8]), sender=admin)
+        chain.execute(self.ct.setup_func(13, get_auction_lambdas()[8]), sender=admin)
 
         with self.assertRaises(MichelsonRuntimeError) as error:
-            chain.execute(self.ct.setup_func(16, auction_lambdas[8]), sender=admin)
+            chain.execute(self.ct.setup_func(16, get_auction_lambdas()[8]), sender=admin)
         self.assertEqual(Errors.AUCTION_EXCEEDS_MAX_LAMBDA_INDEX, error.exception.args[-1])
 
         
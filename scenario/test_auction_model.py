@@ -0,0 +1,87 @@
+from unittest import TestCase
+
+from helpers import *
+from constants import *
+
+from pytezos import MichelsonRuntimeError
+from auction_model import AuctionModel
+from auction_sim import check_against_chain, chain_with, default_params
+
+quipu = {"token" : quipu_token, "id" : 0}
+
+def amounts(transfers):
+    return [(transfer["destination"], transfer["amount"]) for transfer in transfers]
+
+class AuctionModelTest(TestCase):
+
+    def test_bid_fee(self):
+        # the same calls as AuctionTest.test_bid_fee
+        model = AuctionModel(quipu, dex_core, min_bid=1, bid_fee_f=int(0.02 * 1e18))
+        model.receive_fee(token_a_fa2, 10, sender=dex_core)
+        model.launch_auction(token_a_fa2, 10, 1, alice, 0)
+
+        transfers = model.place_bid(0, 100, bob, 0)
+        self.assertEqual(amounts(transfers), [(contract_self_address, 100)])
+        self.assertEqual(model.bid_fee_balance, 1)
+
+        model.place_bid(0, 1_000, alice, 0)
+        transfers = model.place_bid(0, 10_000, bob, 0)
+        self.assertEqual(amounts(transfers), [(alice, 980), (contract_self_address, 10_000)])
+        self.assertEqual(model.bid_fee_balance, 23)
+
+    def test_claim(self):
+        model = AuctionModel(quipu, dex_core, auction_duration=300, min_bid=10)
+        model.receive_fee(token_a_fa2, 10, sender=dex_core)
+        model.launch_auction(token_a_fa2, 10, 100, alice, 0)
+        model.place_bid(0, 107, bob, 0)
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            model.claim(0, 299)
+        self.assertEqual(error.exception.args[-1], "'310'")
+
+        transfers = model.claim(0, 300)
+        self.assertEqual(amounts(transfers), [(burn, 107), (bob, 10)])
+        self.assertEqual(transfers[1]["token"], ("fa2", (token_a_address, 0)))
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            model.place_bid(0, 150, bob, 300)
+        self.assertEqual(error.exception.args[-1], Errors.AUCTION_FINISHED)
+
+    def test_extension(self):
+        model = AuctionModel(quipu, dex_core, auction_duration=300, auction_extension=100, extension_trigger=5)
+        model.receive_fee(token_a_fa2, 10, sender=dex_core)
+        model.launch_auction(token_a_fa2, 10, 100, alice, 0)
+
+        model.place_bid(0, 101, bob, 294)
+        self.assertEqual(model.auctions[0].end_time, 300)
+        model.place_bid(0, 102, alice, 295)
+        self.assertEqual(model.auctions[0].end_time, 400)
+
+    def test_cant_launch(self):
+        model = AuctionModel(quipu, dex_core, min_bid=35)
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            model.launch_auction(token_a_fa2, 10, 100, alice, 0)
+        self.assertEqual(error.exception.args[-1], Errors.AUCTION_INSUFFICIENT_BALANCE)
+
+        model.receive_fee(token_a_fa2, 10, sender=dex_core)
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            model.launch_auction(token_a_fa2, 10, 34, alice, 0)
+        self.assertEqual(error.exception.args[-1], Errors.MIN_BID)
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            model.launch_auction(token_a_fa2, 0, 42, alice, 0)
+        self.assertEqual(error.exception.args[-1], Errors.AUCTIONED_AMOUNT_LOW)
+
+class AuctionModelChainTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.params = dict(default_params, bid_fee=0.02, dev_fee=0.03, extension_trigger=30)
+        # loads the contract, fails without the build like the other auction tests
+        chain_with(cls.params)
+
+    def test_matches_contract(self):
+        for seed in range(3):
+            self.assertGreater(check_against_chain(seed, 5, self.params), 0)
@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from auction_sim import run_batch, merge, summary, default_params
+
+class AuctionSimTest(TestCase):
+
+    def test_batch(self):
+        params = dict(default_params, bid_fee=0.02, extension_trigger=30)
+        results = run_batch(3, 500, params)
+
+        self.assertEqual(len(results["duration"]), len(results["burned"]))
+        self.assertGreater(len(results["duration"]), 400)
+        self.assertTrue((results["duration"] >= params["auction_duration"]).all())
+        self.assertTrue((results["extensions"] <= results["bids"]).all())
+        self.assertTrue((results["burned"] >= params["min_bid"]).all())
+        # every outbid bid pays its fee
+        self.assertTrue((results["bid_fees"][results["bids"] > 0] > 0).all())
+
+    def test_deterministic(self):
+        first = run_batch(7, 200)
+        second = run_batch(7, 200)
+        for name in first:
+            self.assertEqual(first[name].tolist(), second[name].tolist())
+        self.assertFalse(run_batch(7, 200)["bid_fees"].any())
+
+    def test_summary(self):
+        results = merge([run_batch(seed, 100) for seed in range(3)])
+        report = summary(results, 300)
+        self.assertIn("fee deposits launched an auction", report)
+        self.assertIn("QUIPU burned", report)
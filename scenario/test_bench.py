@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+import bench
+
+class BenchTest(TestCase):
+
+    def test_compare(self):
+        baseline = {
+            "swap_1_hops": {"median_ms": 100.0, "instructions": 1_000},
+            "bucket_vote": {"median_ms": 50.0, "instructions": 400},
+        }
+        results = {
+            "swap_1_hops": {"median_ms": 120.0, "instructions": 1_000},
+            "bucket_vote": {"median_ms": 40.0, "instructions": 401},
+            "flash_swap": {"median_ms": 500.0, "instructions": 9_000},
+        }
+
+        self.assertEqual(bench.compare(results, baseline, tolerance=0.25), [
+            "bucket_vote: 401 instructions, baseline 400",
+        ])
+        self.assertEqual(len(bench.compare(results, baseline, tolerance=0.1, instruction_tolerance=0.01)), 1)
+
+    def test_bucket_vote(self):
+        result = bench.run_benchmark("bucket_vote", repeat=1)
+        self.assertGreater(result["instructions"], 0)
+        self.assertEqual(result["operations"], 1)
+
+        # the warm state is left as it was
+        chain, _ = bench.warm_bucket()
+        self.assertNotIn(bench.bob, chain.storage["users"])
@@ -5,6 +5,7 @@ from pprint import pprint
 from constants import *
 
 from helpers import *
+from loader import load_contract
 
 from pytezos import ContractInterface, MichelsonRuntimeError
 
@@ -14,10 +15,7 @@ class BucketTest(TestCase):
     def setUpClass(cls):
         cls.maxDiff = None
 
-        text = open("./contracts/compiled/bucket.tz").read()
-        cls.ct = ContractInterface.from_michelson(text)
-
-        storage = cls.ct.storage.dummy()
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
         storage["dex_core"] = dex_core 
         storage["collecting_period_end"] = 10
 
@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+from helpers import *
+from constants import *
+from loader import load_contract
+
+from bucket_model import BucketModel
+
+voters = [generate_random_address() for _ in range(8)]
+
+class BucketModelTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def assert_matches(self, model, chain, users):
+        s = chain.storage
+        for name in ["total_supply", "reward_per_share", "reward_per_block", "next_reward",
+                     "reward_paid", "collecting_period_end", "last_update_level"]:
+            self.assertEqual(getattr(model, name), s[name], name)
+        for user in users:
+            rewards = s["users_rewards"].get(user) or {"reward_f": 0, "reward_paid_f": 0}
+            votes = s["users"][user]["votes"] if user in s["users"] else 0
+            self.assertEqual(model.user(user), {"votes": votes, **rewards})
+
+    def test_matches_contract(self):
+        chain = LocalChain(storage=self.init_storage)
+        model = BucketModel(collecting_period=vr[f"{dex_core}%get_collecting_period"], collecting_period_end=10)
+
+        def vote(users, amounts):
+            chain.execute_many([self.ct.vote(user, carol, True, amount) for user, amount in zip(users, amounts)],
+                sender=dex_core, view_results=vr)
+            model.vote(users, amounts)
+
+        def deposit(amount):
+            chain.execute(self.ct.default(), amount=amount, view_results=vr)
+            model.default(amount)
+
+        def advance(blocks):
+            chain.advance_blocks(blocks)
+            model.advance_blocks(blocks)
+
+        vote(voters, [(i + 1) * 1_000 for i in range(len(voters))])
+        deposit(20_000)
+        advance(7)
+        # a re-vote, a withdrawal of all votes and a user voting twice in one batch
+        vote(voters[:3], [5_000, 0, 3_000])
+        deposit(33_333)
+        advance(9)
+        vote([voters[3], voters[3]], [1, 7_777])
+        self.assert_matches(model, chain, voters)
+
+        advance(15)
+        payouts = model.withdraw_rewards(voters)
+        for user, payout in zip(voters, payouts):
+            res = chain.execute(self.ct.withdraw_rewards(user, user), sender=dex_core, view_results=vr)
+            paid = sum(tx["amount"] for tx in parse_transfers(res))
+            self.assertEqual(paid, payout)
+        self.assertGreater(sum(payouts), 0)
+        self.assert_matches(model, chain, voters)
+
+    def test_many_voters(self):
+        model = BucketModel(collecting_period=10, collecting_period_end=10)
+        users = [f"user{i}" for i in range(100_000)]
+
+        # a deposit is spread over the period starting once the current one is over
+        def spread(amount):
+            model.default(amount)
+            model.advance_blocks(1)
+            model.default(0)
+            model.advance_blocks(9)
+
+        model.vote(users, [i % 1_000 + 1 for i in range(len(users))])
+        model.advance_blocks(10)
+        spread(10_000_000)
+        first = model.withdraw_rewards(users)
+
+        model.vote(users[::2], [0] * len(users[::2]))
+        spread(5_000_000)
+        second = model.withdraw_rewards(users)
+
+        # rounding only ever keeps dust in the bucket
+        self.assertLessEqual(sum(first), 10_000_000)
+        self.assertGreater(sum(first), 10_000_000 - len(users))
+        self.assertLessEqual(sum(second), 5_000_000)
+        self.assertGreater(sum(second), 5_000_000 - len(users))
+        self.assertEqual(second[0], 0)
+        self.assertEqual(model.reward_paid, sum(first) + sum(second))
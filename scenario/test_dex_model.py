@@ -0,0 +1,152 @@
+from unittest import TestCase
+
+from pytezos import MichelsonRuntimeError
+
+from helpers import *
+from loader import load_contract
+from constants import *
+
+from initial_storage import get_dex_core_lambdas
+import dex_model
+
+fees_set = {
+    "interface_fee" : int(0.003 * 1e18),
+    "swap_fee" : int(0.002 * 1e18),
+    "auction_fee" : int(0.001 * 1e18),
+    "withdraw_fee_reward" : int(0.003 * 1e18)
+}
+
+tez = {"tez": None}
+token_a = {"fa2": {"token": token_a_address, "id": 0}}
+token_b = {"fa2": {"token": token_b_address, "id": 1}}
+
+def make_storage(pairs, fees):
+    storage = {
+        "pairs": {},
+        "tokens": {},
+        "fees": fees,
+        "interface_fee": {},
+        "interface_tez_fee": {},
+        "auction_fee": {},
+        "auction_tez_fee": {},
+    }
+    for pair_id, (token_a, token_b, pool_a, pool_b, bucket) in enumerate(pairs):
+        storage["tokens"][pair_id] = {"token_a": token_a, "token_b": token_b}
+        storage["pairs"][pair_id] = {
+            "token_a_pool": pool_a,
+            "token_b_pool": pool_b,
+            "token_a_price_cml": 0,
+            "token_b_price_cml": 0,
+            "total_supply": pool_a,
+            "last_block_timestamp": 0,
+            "bucket": bucket,
+        }
+    return {"storage": storage}
+
+class DexModelTest(TestCase):
+
+    def test_fee_split(self):
+        storage = make_storage([(token_a, token_b, 100_000, 100_000, None)], fees_set)
+        res = dex_model.swap(storage, [{"pair_id": 0, "direction": "a_to_b"}], 10_000, referrer=alice)
+
+        self.assertEqual(res.amount_out, 9_041)
+        pair = res.storage["storage"]["pairs"][0]
+        self.assertEqual(pair["token_a_pool"], 109_960)
+        self.assertEqual(pair["token_b_pool"], 100_000 - 9_041)
+
+        key = ("fa2", (token_a_address, 0))
+        self.assertEqual(res.storage["storage"]["interface_fee"][(key, alice)], 30 * int(1e18))
+        self.assertEqual(res.storage["storage"]["auction_fee"][key], 10 * int(1e18))
+
+        # the input storage is left as is
+        self.assertEqual(storage["storage"]["pairs"][0]["token_a_pool"], 100_000)
+        self.assertEqual(storage["storage"]["interface_fee"], {})
+
+    def test_forwards_between_buckets(self):
+        storage = make_storage([
+            (token_a, tez, 100_000, 300_000, bucket),
+            (token_b, tez, 500_000, 700_000, dex_core),
+        ], fees_set)
+        swaps = [{"pair_id": 0, "direction": "a_to_b"}, {"pair_id": 1, "direction": "b_to_a"}]
+        res = dex_model.swap(storage, swaps, 10_000, referrer=alice)
+
+        tez_out = dex_model.quote(storage, swaps[:1], 10_000)
+        self.assertEqual(res.forwards, [{"from_bucket": bucket, "to_bucket": dex_core, "amt": tez_out}])
+        self.assertEqual(res.token_out, token_b)
+        self.assertIsNone(res.from_bucket)
+        self.assertIn((1, alice), res.storage["storage"]["interface_tez_fee"])
+
+    def test_cumulative_prices(self):
+        storage = make_storage([(token_a, token_b, 100_000, 300_000, None)], fees_set)
+        res = dex_model.swap(storage, [{"pair_id": 0, "direction": "a_to_b"}], 10_000, now=20)
+
+        pair = res.storage["storage"]["pairs"][0]
+        self.assertEqual(pair["token_a_price_cml"], 3 * int(1e18) * 20)
+        self.assertEqual(pair["token_b_price_cml"], dex_model.ceil_div(int(1e18), 3) * 20)
+        self.assertEqual(pair["last_block_timestamp"], 20)
+
+    def test_failures(self):
+        storage = make_storage([(token_a, token_b, 100_000, 100_000, None)], fees_set)
+        swaps = [{"pair_id": 0, "direction": "a_to_b"}]
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            dex_model.swap(storage, swaps + swaps, 10_000)
+        self.assertEqual(error.exception.args[-1], "'119'")
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            dex_model.swap(storage, swaps, 10_000, min_amount_out=10_000)
+        self.assertEqual(error.exception.args[-1], Errors.HIGH_MIN_OUT)
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            dex_model.swap(storage, [{"pair_id": 1, "direction": "a_to_b"}], 10_000)
+        self.assertEqual(error.exception.args[-1], "'108'")
+
+class DexModelContractTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.dex, storage = load_contract("./build/dex_core.json")
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
+        storage["storage"]["admin"] = admin
+
+        cls.init_storage = storage
+
+    def test_matches_contract(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.dex.launch_exchange(tez_pair, 100_000, 300_000, me, dummy_candidate, 1), amount=300_000)
+        chain.execute(self.dex.launch_exchange(tez_pair_b, 500_000, 700_000, me, dummy_candidate, 1), amount=700_000)
+        chain.execute(self.dex.launch_exchange(pair_ab, 400_000, 200_000, me, dummy_candidate, 1))
+        chain.execute(self.dex.set_fees(fees_set), sender=admin)
+
+        routes = [
+            [{"pair_id": 0, "direction": "a_to_b"}, {"pair_id": 1, "direction": "b_to_a"}],
+            [{"pair_id": 1, "direction": "a_to_b"}, {"pair_id": 0, "direction": "b_to_a"}, {"pair_id": 2, "direction": "a_to_b"}],
+            [{"pair_id": 2, "direction": "b_to_a"}],
+        ]
+        for swaps in routes:
+            chain.advance_blocks(3)
+            predicted = dex_model.swap(chain.storage, swaps, 12_345, now=chain.now, referrer=burn)
+
+            res = chain.execute(self.dex.swap({
+                "swaps" : swaps,
+                "amount_in" : 12_345,
+                "min_amount_out" : 1,
+                "lambda" : None,
+                "receiver" : julian,
+                "referrer" : burn,
+                "deadline": 100_000
+            }))
+
+            out = next(tx for tx in parse_transfers(res) if tx["destination"] == julian)
+            self.assertEqual(out["amount"], predicted.amount_out)
+            self.assertEqual(parse_pour_overs(res), [
+                {"destination": fwd["to_bucket"], "amount": fwd["amt"], "source": fwd["from_bucket"]}
+                for fwd in predicted.forwards
+            ])
+            for name in ["pairs", "interface_fee", "interface_tez_fee", "auction_fee", "auction_tez_fee"]:
+                self.assertEqual(
+                    dict(res.storage["storage"][name]),
+                    dict(predicted.storage["storage"][name])
+                )
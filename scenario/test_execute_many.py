@@ -0,0 +1,116 @@
+from unittest import TestCase
+from constants import *
+
+from helpers import *
+from loader import load_contract
+
+import os
+import tempfile
+
+from pytezos import ContractInterface, MichelsonRuntimeError
+from journal import CallJournal, read_journal
+
+# pays alice 10 mutez and closes itself, as dex_core does; the close fails from the second call on
+closing_code = """
+parameter (or (unit %poke) (unit %close));
+storage (pair (bool %entered) (nat %calls));
+code { UNPAIR;
+       IF_LEFT
+         { DROP; UNPAIR; IF { PUSH string "reentered"; FAILWITH } {};
+           PUSH nat 1; ADD; PUSH bool True; PAIR;
+           NIL operation;
+           SELF %close; PUSH mutez 0; UNIT; TRANSFER_TOKENS; CONS;
+           PUSH address "tz1iA1iceA1iceA1iceA1iceA1ice9ydjsaW"; CONTRACT unit; IF_NONE { PUSH string "no"; FAILWITH } {};
+           PUSH mutez 10; UNIT; TRANSFER_TOKENS; CONS;
+           PAIR }
+         { DROP; UNPAIR; DROP; DUP; PUSH nat 2; COMPARE; LE; IF { PUSH string "closed"; FAILWITH } {};
+           PUSH bool False; PAIR; NIL operation; PAIR } };
+"""
+
+class ExecuteManyTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".journal")
+        os.close(fd)
+        os.unlink(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def scenario(self):
+        return [
+            (self.ct.vote(alice, carol, True, 50), {"sender": dex_core}),
+            (self.ct.vote(bob, dave, True, 60), {"sender": dex_core}),
+            (self.ct.default(), {"amount": 20_000, "sender": None}),
+            (self.ct.vote(alice, carol, False, 50), {"sender": dex_core}),
+            (self.ct.withdraw_rewards(bob, bob), {"sender": dex_core}),
+        ]
+
+    def test_same_as_execute(self):
+        chain = LocalChain(storage=self.init_storage)
+        for call, options in self.scenario():
+            res = chain.execute(call, view_results=vr, **options)
+
+        batched = LocalChain(storage=self.init_storage)
+        results = batched.execute_many(self.scenario(), view_results=vr)
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[-1].operations, res.operations)
+        self.assertEqual(results[-1].storage, res.storage)
+        self.assertEqual(batched.storage, chain.storage)
+        self.assertEqual(batched.balance, chain.balance)
+        self.assertEqual(batched.payouts, chain.payouts)
+
+    def test_intermediate_storage(self):
+        chain = LocalChain(storage=self.init_storage)
+        results = chain.execute_many(self.scenario(), view_results=vr)
+
+        self.assertEqual(results[0].storage["users"][alice]["votes"], 50)
+        self.assertNotIn(bob, results[0].storage["users"])
+        self.assertEqual(results[1].storage["users"][bob]["votes"], 60)
+
+    def test_failure_keeps_previous_calls(self):
+        chain = LocalChain(storage=self.init_storage)
+        calls = [
+            self.ct.vote(alice, carol, True, 50),
+            self.ct.pour_out(alice, 10),
+        ]
+
+        # the default sender isn't dex_core, the first call passes only with an override
+        with self.assertRaises(MichelsonRuntimeError):
+            chain.execute_many([(calls[0], {"sender": dex_core}), calls[1]])
+
+        self.assertEqual(chain.storage["users"][alice]["votes"], 50)
+
+    def test_single_contract(self):
+        other = ContractInterface.from_michelson(closing_code)
+        chain = LocalChain(storage=self.init_storage)
+        with self.assertRaises(ValueError):
+            chain.execute_many([self.ct.default(), other.poke()])
+        self.assertEqual(chain.storage, self.init_storage)
+
+    def test_failing_close_drops_the_call(self):
+        ct = ContractInterface.from_michelson(closing_code)
+        chain = LocalChain(storage={"entered": False, "calls": 0})
+        chain.balance = 100
+
+        with chain.record(CallJournal(self.path)):
+            with self.assertRaises(MichelsonRuntimeError):
+                chain.execute_many([ct.poke(), ct.poke()])
+
+        # the first call is kept and closed, the second one leaves no trace
+        self.assertEqual(chain.storage, {"entered": False, "calls": 1})
+        self.assertEqual(chain.balance, 90)
+        self.assertEqual(chain.payouts, {alice: 10})
+        self.assertEqual([entry["entrypoint"] for entry in read_journal(self.path)], ["poke"])
@@ -5,9 +5,10 @@ from pprint import pprint
 from constants import *
 
 from helpers import *
+from loader import load_contract
 
 from pytezos import ContractInterface, MichelsonRuntimeError
-from initial_storage import dex_core_lambdas
+from initial_storage import get_dex_core_lambdas
 
 class FeesTest(TestCase):
 
@@ -15,13 +16,8 @@ class FeesTest(TestCase):
     def setUpClass(cls):
         cls.maxDiff = None
 
-        text = open("./build/dex_core.json").read()
-        code = json.loads(text)
-
-        cls.dex = ContractInterface.from_micheline(code["michelson"])
-
-        storage = cls.dex.storage.dummy()
-        storage["dex_core_lambdas"] = dex_core_lambdas
+        cls.dex, storage = load_contract("./build/dex_core.json")
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
         storage["storage"]["admin"] = admin
         storage["storage"]["auction"] = auction
 
@@ -0,0 +1,90 @@
+from unittest import TestCase
+from unittest.mock import patch
+from constants import *
+
+from helpers import *
+from loader import load_contract
+
+import fingerprint
+from fingerprint import StorageFingerprint
+
+class FingerprintTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def full(self, storage):
+        return StorageFingerprint.of(self.ct).reset(materialize(storage, find_big_maps(self.ct.context))).digest()
+
+    def run_calls(self, chain, voters, amount):
+        for voter in voters:
+            chain.execute(self.ct.vote(voter, carol, True, amount), sender=dex_core, view_results=vr)
+        chain.execute(self.ct.default(), amount=10_000, view_results=vr)
+        chain.advance_blocks(12)
+        chain.execute_many([self.ct.vote(voter, dave, True, amount // 2) for voter in voters],
+            sender=dex_core, view_results=vr)
+
+    def test_matches_full_hash(self):
+        chain = LocalChain(storage=self.init_storage)
+        tracked = chain.track(StorageFingerprint.of(self.ct))
+        self.assertEqual(tracked.digest(), self.full(chain.storage))
+
+        self.run_calls(chain, [alice, bob, carol], 100)
+        chain.execute(self.ct.withdraw_rewards(alice, julian), sender=dex_core, view_results=vr)
+        self.assertEqual(tracked.digest(), self.full(chain.storage))
+
+    def test_equal_storages(self):
+        chain = LocalChain(storage=self.init_storage)
+        tracked = chain.track(StorageFingerprint.of(self.ct))
+        forked = chain.fork()
+        self.assertIsNot(forked.fingerprint, tracked)
+
+        self.run_calls(chain, [alice, bob], 100)
+        self.run_calls(forked, [alice, bob], 100)
+        self.assertEqual(forked.fingerprint.digest(), tracked.digest())
+
+        snapshot = chain.snapshot()
+        before = tracked.digest()
+        chain.execute(self.ct.vote(alice, dave, True, 1), sender=dex_core, view_results=vr)
+        self.assertNotEqual(tracked.digest(), before)
+        chain.rollback(snapshot)
+        # restored in place, the handle track returned follows the chain
+        self.assertIs(chain.fingerprint, tracked)
+        self.assertEqual(tracked.digest(), before)
+        chain.execute(self.ct.vote(bob, dave, True, 1), sender=dex_core, view_results=vr)
+        self.assertEqual(tracked.digest(), self.full(chain.storage))
+
+    def test_rehashes_changed_entries(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.track(StorageFingerprint.of(self.ct))
+        self.run_calls(chain, [alice, bob, carol, dave, julian, admin], 100)
+
+        with patch.object(fingerprint, "entry_hash", wraps=fingerprint.entry_hash) as hashed:
+            chain.execute(self.ct.vote(julian, dave, True, 500), sender=dex_core, view_results=vr)
+        # the voter's entries, old and new, out of all the voters and bakers kept
+        self.assertLess(hashed.call_count, 10)
+        self.assertEqual(chain.fingerprint.digest(), self.full(chain.storage))
+
+    def test_rehashes_changed_fields(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.track(StorageFingerprint.of(self.ct))
+        self.run_calls(chain, [alice, bob], 100)
+
+        old = chain.storage
+        hashes = dict(chain.fingerprint.fields)
+        chain.execute(self.ct.vote(alice, dave, True, 500), sender=dex_core, view_results=vr)
+
+        # a recomputed hash is a new bytes object
+        rehashed = [name for name, digest in chain.fingerprint.fields.items() if digest is not hashes[name]]
+        big_maps = {path[0] for path in chain.big_maps}
+        changed = [name for name in old if name not in big_maps and old[name] != chain.storage[name]]
+        self.assertIn("total_supply", changed)
+        self.assertEqual(rehashed, changed)
+        self.assertEqual(chain.fingerprint.digest(), self.full(chain.storage))
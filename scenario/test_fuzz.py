@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from pytezos import MichelsonRuntimeError
+
+from helpers import *
+from constants import *
+
+import dex_model
+import fuzz
+
+class FuzzModelTest(TestCase):
+
+    def test_model_invariants(self):
+        for seed in range(50):
+            fuzz.run_case(seed, steps=50)
+
+    def test_replay_is_deterministic(self):
+        self.assertEqual(fuzz.run_case(7), fuzz.run_case(7))
+
+    def test_invest_divest(self):
+        storage = fuzz.model_storage()
+        res = dex_model.invest_liquidity(storage, 2, 1_000, 10_000, 10_000, alice)
+        self.assertEqual((res.token_a, res.token_b, res.shares), (2_000, 1_000, 1_000))
+        self.assertEqual(res.storage["storage"]["pairs"][2]["total_supply"], 201_000)
+
+        res = dex_model.divest_liquidity(res.storage, 2, 1_000, alice)
+        self.assertEqual((res.token_a, res.token_b, res.shares), (2_000, 1_000, 0))
+
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            dex_model.divest_liquidity(res.storage, 2, 1, alice)
+        self.assertEqual(error.exception.args[-1], "'114'")
+
+        # draining the pair lets it be launched again
+        res = dex_model.divest_liquidity(storage, 2, 200_000, me)
+        self.assertEqual(res.storage["storage"]["pairs"][2]["token_a_pool"], 0)
+        res = dex_model.launch_exchange(res.storage, 2, 5, 7, bob)
+        self.assertEqual(res.storage["storage"]["ledger"][(bob, 2)], 5)
+
+class FuzzContractTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.target = fuzz.ChainTarget()
+
+    def test_matches_contract(self):
+        for seed in range(3):
+            fuzz.run_case(seed, steps=20, target=self.target)
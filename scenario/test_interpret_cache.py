@@ -0,0 +1,78 @@
+from unittest import TestCase
+from constants import *
+
+from helpers import *
+from loader import load_contract
+
+class InterpretCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def deploy(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.ct.vote(alice, carol, True, 100), sender=dex_core, view_results=vr)
+        chain.execute(self.ct.vote(bob, carol, True, 300), sender=dex_core, view_results=vr)
+        chain.execute(self.ct.default(), amount=20_000, view_results=vr)
+        chain.advance_blocks(15)
+        return chain
+
+    def quote(self, chain, voter):
+        res = chain.interpret(self.ct.withdraw_rewards(voter, voter), sender=dex_core, view_results=vr)
+        return parse_transfers(res)[0]["amount"]
+
+    def test_repeated_quotes(self):
+        chain = self.deploy()
+        expected = [self.quote(chain, voter) for voter in [alice, bob]]
+
+        cache = chain.cache_interpret()
+        for _ in range(3):
+            self.assertEqual([self.quote(chain, voter) for voter in [alice, bob]], expected)
+        self.assertEqual((cache.hits, cache.misses), (4, 2))
+
+        # the sender and level are part of the key
+        with self.assertRaises(MichelsonRuntimeError):
+            chain.interpret(self.ct.withdraw_rewards(alice, alice), sender=alice, view_results=vr)
+        chain.advance_blocks(1)
+        self.quote(chain, alice)
+        self.assertEqual(cache.misses, 4)
+
+    def test_invalidated_on_execute(self):
+        chain = self.deploy()
+        cache = chain.cache_interpret()
+        before = self.quote(chain, alice)
+
+        chain.execute(self.ct.withdraw_rewards(alice, alice), sender=dex_core, view_results=vr)
+        self.assertEqual(len(cache.entries), 0)
+        chain.execute_many([self.ct.vote(alice, carol, True, 50)], sender=dex_core, view_results=vr)
+        chain.execute(self.ct.default(), amount=30_000, view_results=vr)
+        chain.advance_blocks(20)
+        after = self.quote(chain, alice)
+        self.assertNotEqual(after, before)
+        self.assertEqual(cache.hits, 0)
+
+        # a rollback restores an older storage, whose quotes are computed again
+        snapshot = chain.snapshot()
+        chain.execute(self.ct.withdraw_rewards(alice, alice), sender=dex_core, view_results=vr)
+        chain.rollback(snapshot)
+        self.assertEqual(self.quote(chain, alice), after)
+        self.assertEqual(cache.hits, 0)
+
+    def test_least_recently_used(self):
+        chain = self.deploy()
+        cache = chain.cache_interpret(size=2)
+        for voter in [alice, bob, alice, carol, bob]:
+            try:
+                self.quote(chain, voter)
+            except IndexError:
+                pass
+        # bob was evicted when carol came in, alice was used more recently
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+        self.assertEqual(len(cache.entries), 2)
@@ -0,0 +1,88 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from helpers import *
+from constants import *
+from loader import load_contract
+
+from journal import CallJournal, JournalMismatch, NO_FINGERPRINT, read_journal, replay
+
+class JournalTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".journal")
+        os.close(fd)
+        os.unlink(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def run_scenario(self, chain):
+        chain.execute(self.ct.vote(alice, carol, True, 100), sender=dex_core, view_results=vr)
+        chain.execute(self.ct.default(), amount=5_000, view_results=vr)
+        chain.advance_blocks(12)
+        chain.execute_many([
+            self.ct.vote(bob, dave, True, 300),
+            (self.ct.vote(alice, dave, True, 50), {"source": alice}),
+        ], sender=dex_core, view_results=vr)
+        chain.advance_blocks(3)
+        chain.execute(self.ct.withdraw_rewards(alice, julian), sender=dex_core, view_results=vr)
+
+    def test_read_back(self):
+        chain = LocalChain(storage=self.init_storage)
+        with chain.record(CallJournal(self.path)) as journal:
+            self.run_scenario(chain)
+            self.assertEqual(journal.entries, 5)
+
+        entries = list(read_journal(self.path))
+        self.assertEqual([entry["entrypoint"] for entry in entries],
+            ["vote", "default", "vote", "vote", "withdraw_rewards"])
+        self.assertEqual(entries[1]["amount"], 5_000)
+        self.assertEqual(entries[2]["now"], 12 * BLOCK_TIME)
+        self.assertEqual(entries[3]["level"], 12)
+        self.assertEqual(entries[3]["source"], alice)
+        self.assertEqual(entries[4]["sender"], dex_core)
+        self.assertEqual(entries[0]["contract"], contract_self_address)
+        # calls of the execute_many batch are fingerprinted one by one
+        self.assertNotIn(entries[2]["fingerprint"], [NO_FINGERPRINT, entries[1]["fingerprint"], entries[3]["fingerprint"]])
+        self.assertEqual(entries[0]["parameters"], self.ct.vote(alice, carol, True, 100).parameters)
+
+    def test_replay(self):
+        chain = LocalChain(storage=self.init_storage)
+        with chain.record(CallJournal(self.path)):
+            self.run_scenario(chain)
+
+        replayed = LocalChain(storage=self.init_storage)
+        self.assertEqual(replay(read_journal(self.path), replayed, self.ct, view_results=vr), 5)
+        self.assertEqual(replayed.storage, chain.storage)
+
+        # a different baker rate changes what `default` keeps for voters
+        other_views = {**vr, f"{dex_core}%get_baker_rate": int(0.1 * 1e18)}
+        with self.assertRaises(JournalMismatch) as error:
+            replay(read_journal(self.path), LocalChain(storage=self.init_storage), self.ct, view_results=other_views)
+        self.assertEqual(error.exception.index, 1)
+
+    def test_append_and_truncated(self):
+        chain = LocalChain(storage=self.init_storage)
+        with chain.record(CallJournal(self.path)):
+            chain.execute(self.ct.vote(alice, carol, True, 100), sender=dex_core, view_results=vr)
+        with chain.record(CallJournal(self.path)):
+            chain.execute(self.ct.vote(bob, carol, True, 100), sender=dex_core, view_results=vr)
+        self.assertEqual(len(list(read_journal(self.path))), 2)
+
+        # an entry cut off by a crash is dropped
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual(len(list(read_journal(self.path))), 1)
@@ -0,0 +1,72 @@
+import random
+from unittest import TestCase
+
+from helpers import *
+from constants import *
+from loader import load_contract
+
+from leaderboard import Election, simulate, zero_key_hash
+
+class LeaderboardTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def test_matches_contract(self):
+        chain = LocalChain(storage=self.init_storage)
+        s = chain.storage
+        election = Election(s["current_delegated"], s["next_candidate"], s["previous_delegated"])
+
+        rng = random.Random(5)
+        voters = [alice, bob, carol, dave, julian]
+        bakers = [generate_random_address() for _ in range(4)]
+
+        for step in range(40):
+            if rng.random() < 0.1:
+                baker = rng.choice(bakers)
+                chain.execute(self.ct.ban_baker(baker, 120), sender=dex_core)
+                election.ban_baker(baker, 120)
+            if rng.random() < 0.2:
+                chain.advance_blocks(2)
+                election.now = chain.now
+
+            voter, baker = rng.choice(voters), rng.choice(bakers)
+            votes = rng.choice([0, rng.randint(1, 100)])
+            res = chain.execute(self.ct.vote(voter, baker, True, votes), sender=dex_core, view_results=vr)
+            delegated = election.vote(voter, baker, votes)
+
+            expected = [] if delegated is None else [None if delegated == zero_key_hash else delegated]
+            self.assertEqual(parse_delegations(res), expected, step)
+            for name in ["current_delegated", "next_candidate", "previous_delegated"]:
+                self.assertEqual(getattr(election, name), chain.storage[name], (step, name))
+            for baker in bakers:
+                contract_votes = chain.storage["bakers"][baker]["votes"] if baker in chain.storage["bakers"] else 0
+                self.assertEqual(election.votes.get(baker, 0), contract_votes)
+
+    def test_top(self):
+        election = Election()
+        election.vote(alice, carol, 50)
+        election.vote(bob, dave, 60)
+        self.assertEqual(election.top(), dave)
+        self.assertIsNone(election.mismatch())
+
+        # dave loses votes to a baker the contract hasn't seen lately
+        election.vote(julian, burn, 55)
+        election.vote(bob, dave, 10)
+        self.assertEqual(election.top(), burn)
+
+        election.ban_baker(burn, 100)
+        self.assertEqual(election.top(), carol)
+
+    def test_simulate(self):
+        report = simulate(seed=1, steps=20_000, voters=2_000, bakers=50, skew=0.6)
+        self.assertEqual(report.steps, 20_000)
+        self.assertGreater(report.delegations, 0)
+        self.assertLessEqual(len(report.examples), 10)
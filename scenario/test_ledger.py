@@ -0,0 +1,130 @@
+from unittest import TestCase
+from constants import *
+
+from helpers import *
+from loader import load_contract
+
+from ledger import Ledger, LedgerError, TEZ
+
+second_bucket = "KT1AxaBxkFLCUi3f8rdDAAxBKHfzY8LfKDRA"
+
+class LedgerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def test_tez_flows(self):
+        chain = LocalChain(storage=self.init_storage)
+        ledger = chain.use_ledger(Ledger(strict=True))
+        ledger.mint(TEZ, me, 30_000)
+
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core, view_results=vr)
+        chain.execute(self.ct.default(), amount=20_000, view_results=vr)
+        chain.advance_blocks(15)
+        chain.execute(self.ct.withdraw_rewards(julian, alice), sender=dex_core, view_results=vr)
+
+        self.assertEqual(ledger.balance(TEZ, julian), chain.payouts[julian])
+        self.assertEqual(ledger.balance(TEZ, contract_self_address), chain.balance)
+        self.assertEqual(ledger.balances(TEZ), {me: 10_000, julian: chain.payouts[julian], contract_self_address: chain.balance})
+        ledger.check(chain)
+
+        # the contract can't pay out more than it was sent, and the failed call leaves no trace
+        storage, balance = chain.storage, chain.balance
+        with self.assertRaises(LedgerError):
+            chain.execute(self.ct.pour_out(bob, balance + 1), sender=dex_core, view_results=vr)
+        with self.assertRaises(LedgerError):
+            chain.execute(self.ct.default(), amount=20_000, view_results=vr)
+        self.assertIs(chain.storage, storage)
+        self.assertEqual(chain.balance, balance)
+        self.assertNotIn(bob, chain.payouts)
+        ledger.check(chain)
+
+        # in a batch the calls before the failing one are kept
+        with self.assertRaises(LedgerError):
+            chain.execute_many([self.ct.pour_out(bob, 100), self.ct.pour_out(bob, balance)], sender=dex_core,
+                view_results=vr)
+        self.assertEqual(chain.balance, balance - 100)
+        self.assertEqual(chain.payouts[bob], 100)
+        ledger.check(chain)
+
+    def test_tokens(self):
+        ledger = Ledger()
+        fa12 = (token_a_address, None)
+        fa2 = (token_b_address, 3)
+        ledger.mint(fa12, alice, 100)
+        ledger.apply(Transfer("token", bob, 30, alice, token_a_address))
+        ledger.apply(Transfer("token", carol, 7, dave, token_b_address, 3))
+
+        self.assertEqual(ledger.balances(fa12), {alice: 70, bob: 30})
+        # without strict, unminted sources go negative and the sums still hold
+        self.assertEqual(ledger.balance(fa2, dave), -7)
+        self.assertEqual(ledger.balance((token_b_address, 0), carol), 0)
+
+        # all or nothing when strict
+        ledger.strict = True
+        with self.assertRaises(LedgerError):
+            ledger.transfer_many([(fa12, alice, bob, 70), (fa12, bob, carol, 101)])
+        self.assertEqual(ledger.balances(fa12), {alice: 70, bob: 30})
+        ledger.transfer_many([(fa12, alice, bob, 70), (fa12, bob, carol, 100)])
+        self.assertEqual(ledger.balances(fa12), {carol: 100})
+
+    def test_reconciles_with_chain(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core, view_results=vr)
+        chain.execute(self.ct.default(), amount=20_000, view_results=vr)
+        chain.execute(self.ct.pour_out(julian, 1_000), sender=dex_core, view_results=vr)
+
+        # what the chain held and paid before is taken as is
+        ledger = chain.use_ledger(Ledger(strict=True))
+        self.assertEqual(ledger.balance(TEZ, contract_self_address), 19_000)
+        chain.execute(self.ct.pour_out(julian, 500), sender=dex_core, view_results=vr)
+        ledger.check(chain)
+        self.assertEqual(ledger.dirty, set())
+
+        chain.balance += 1
+        with self.assertRaises(LedgerError):
+            ledger.check(chain)
+        chain.balance -= 1
+
+        # payouts are compared for the addresses paid since the last check
+        chain.payouts[julian] += 1
+        ledger.check(chain)
+        chain.execute(self.ct.pour_out(julian, 500), sender=dex_core, view_results=vr)
+        with self.assertRaises(LedgerError):
+            ledger.check(chain)
+
+    def test_run_and_rollback(self):
+        chain = LocalChain(storage=None)
+        chain.register(bucket, self.ct, self.init_storage)
+        chain.register(second_bucket, self.ct, self.init_storage)
+        ledger = chain.use_ledger(Ledger(strict=True))
+        ledger.mint(TEZ, dex_core, 1_000)
+
+        chain.run(bucket, self.ct.default(), amount=1_000, sender=dex_core, view_results=vr)
+        chain.run(bucket, self.ct.pour_over(second_bucket, 400), sender=dex_core)
+        snapshot = chain.snapshot()
+        chain.run(second_bucket, self.ct.pour_out(alice, 150), sender=dex_core)
+
+        self.assertEqual(ledger.balances(TEZ), {bucket: 600, second_bucket: 250, alice: 150})
+        chain.rollback(snapshot)
+        # restored in place, the handle use_ledger returned follows the chain
+        self.assertIs(chain.ledger, ledger)
+        self.assertEqual(ledger.balances(TEZ), {bucket: 600, second_bucket: 400})
+        ledger.check(chain)
+        chain.run(second_bucket, self.ct.pour_out(bob, 100), sender=dex_core)
+        self.assertEqual(ledger.balances(TEZ), {bucket: 600, second_bucket: 300, bob: 100})
+        ledger.check(chain)
+
+        # a fork moves its own copy
+        fork = chain.fork()
+        self.assertIsNot(fork.ledger, ledger)
+        fork.run(second_bucket, self.ct.pour_out(bob, 100), sender=dex_core)
+        self.assertEqual(fork.ledger.balance(TEZ, bob), 200)
+        self.assertEqual(ledger.balance(TEZ, bob), 100)
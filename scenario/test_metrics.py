@@ -0,0 +1,66 @@
+import json
+from unittest import TestCase
+
+from pytezos import MichelsonRuntimeError
+
+from helpers import *
+from constants import *
+from loader import load_contract
+from metrics import CallMetrics, percentile
+
+class MetricsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def test_execute(self):
+        chain = LocalChain(storage=self.init_storage)
+        metrics = chain.instrument(CallMetrics(), name="bucket")
+
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core, view_results=vr)
+        res = chain.execute(self.ct.vote(bob, carol, True, 50), sender=dex_core, view_results=vr)
+        with self.assertRaises(MichelsonRuntimeError):
+            chain.execute(self.ct.vote(bob, carol, True, 50), sender=alice, view_results=vr)
+
+        # the instrumented path keeps the results the same
+        self.assertEqual(res.storage["users"][bob]["votes"], 50)
+
+        summary = json.loads(metrics.dump())
+        vote = summary["bucket%vote"]
+        self.assertEqual(vote["calls"], 2)
+        self.assertEqual(vote["failed"], 1)
+        self.assertGreater(vote["instructions"]["min"], 0)
+        self.assertGreater(vote["storage_size"]["p50"], 0)
+        # the voter, their rewards record and the candidate's tally
+        self.assertEqual(vote["big_map_diff"]["max"], 3)
+        self.assertGreater(vote["big_map_diff_bytes"]["max"], 0)
+
+    def test_run_and_execute_many(self):
+        chain = LocalChain(storage=self.init_storage)
+        metrics = chain.instrument(CallMetrics(names={bucket: "bucket"}))
+
+        storage = dict(self.init_storage)
+        chain.register(bucket, self.ct, storage)
+        chain.run(bucket, self.ct.vote(alice, carol, True, 50), sender=dex_core, view_results=vr)
+
+        chain.execute_many([self.ct.vote(bob, carol, True, 10), self.ct.vote(bob, carol, True, 20)],
+            sender=dex_core, view_results=vr)
+
+        samples = metrics.samples
+        self.assertEqual(len(samples["bucket%vote"]), 1)
+        self.assertIn("big_map_diff", samples["bucket%vote"][0])
+        self.assertEqual(len(samples[f"{contract_self_address}%vote"]), 2)
+        self.assertNotIn("big_map_diff", samples[f"{contract_self_address}%vote"][0])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
@@ -0,0 +1,174 @@
+import os
+from unittest import TestCase, SkipTest
+from constants import *
+
+from helpers import *
+from loader import load_contract
+
+from pytezos import ContractInterface, MichelsonRuntimeError
+from initial_storage import get_auction_lambdas, get_dex_core_lambdas
+
+second_bucket = "KT1AxaBxkFLCUi3f8rdDAAxBKHfzY8LfKDRA"
+recorder = "KT1NZAwdaeoYgL5r7a8KyhFmaSiukbhhQN2B"
+
+# keeps the source of the last call it received, takes tez through `fill` as a bucket does
+recorder_code = """
+parameter (or (unit %fill) (unit %default));
+storage (pair (option %source address) (nat %calls));
+code { CDR; CDR; PUSH nat 1; ADD; SOURCE; SOME; PAIR; NIL operation; PAIR };
+"""
+
+class MultiContractTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def deploy(self):
+        chain = LocalChain(storage=None)
+        chain.register(bucket, self.ct, self.init_storage, balance=1_000)
+        chain.register(second_bucket, self.ct, self.init_storage)
+        return chain
+
+    def test_emitted_call_is_executed(self):
+        chain = self.deploy()
+
+        results = chain.run(bucket, self.ct.pour_over(second_bucket, 400), sender=dex_core)
+        self.assertEqual([res.address for res in results], [bucket, second_bucket])
+        self.assertEqual(chain.contracts[bucket].balance, 600)
+        self.assertEqual(chain.contracts[second_bucket].balance, 400)
+
+        chain.run(second_bucket, self.ct.pour_out(alice, 150), sender=dex_core)
+        self.assertEqual(chain.contracts[second_bucket].balance, 250)
+        self.assertEqual(chain.payouts[alice], 150)
+
+    def test_delegation_is_recorded(self):
+        chain = self.deploy()
+
+        chain.run(bucket, self.ct.vote(alice, carol, True, 50), sender=dex_core)
+        self.assertEqual(chain.delegates[bucket], carol)
+        self.assertEqual(chain.contracts[bucket].storage["users"][alice]["votes"], 50)
+        self.assertNotIn(alice, chain.contracts[second_bucket].storage["users"])
+
+    def test_failed_run_is_reverted(self):
+        chain = self.deploy()
+
+        with self.assertRaises(MichelsonRuntimeError):
+            chain.run(bucket, self.ct.pour_over(second_bucket, 400), amount=1, sender=dex_core)
+
+        self.assertEqual(chain.contracts[bucket].balance, 1_000)
+        self.assertEqual(chain.contracts[second_bucket].balance, 0)
+
+    def test_overdraft_is_reverted(self):
+        chain = self.deploy()
+        chain.run(bucket, self.ct.pour_over(second_bucket, 400), sender=dex_core)
+
+        # second_bucket holds 400 and can't send 401, the run is reverted
+        with self.assertRaises(MichelsonRuntimeError):
+            chain.run(second_bucket, self.ct.pour_over(bucket, 401), sender=dex_core)
+        self.assertEqual(chain.contracts[bucket].balance, 600)
+        self.assertEqual(chain.contracts[second_bucket].balance, 400)
+
+    def test_source_is_propagated(self):
+        chain = self.deploy()
+        chain.register(recorder, ContractInterface.from_michelson(recorder_code),
+            {"source": None, "calls": 0})
+
+        chain.run(bucket, self.ct.pour_over(recorder, 10), sender=dex_core, source=alice)
+        self.assertEqual(chain.contracts[recorder].storage, {"source": alice, "calls": 1})
+        self.assertEqual(chain.contracts[recorder].balance, 10)
+
+        # without a source, the sender of the first call started the chain of calls
+        chain.run(bucket, self.ct.pour_over(recorder, 10), sender=dex_core)
+        self.assertEqual(chain.contracts[recorder].storage, {"source": dex_core, "calls": 2})
+
+class DexCoreOperationsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        for path in ["./build/dex_core.json", "./build/auction.json"]:
+            if not os.path.exists(path):
+                raise SkipTest(f"{path} isn't built")
+
+        cls.dex, storage = load_contract("./build/dex_core.json")
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
+        storage["storage"]["admin"] = admin
+        storage["storage"]["auction"] = auction
+
+        cls.init_storage = storage
+
+        cls.auction, storage = load_contract("./build/auction.json")
+        storage["auction_lambdas"] = get_auction_lambdas()
+        storage["storage"]["admin"] = admin
+        storage["storage"]["dex_core"] = dex_core
+
+        cls.auction_storage = storage
+
+    def test_tez_reaches_originated_bucket(self):
+        chain = LocalChain(storage=None)
+        chain.register(dex_core, self.dex, self.init_storage)
+
+        add_pool = self.dex.launch_exchange(tez_pair, 100_000, 100_000, me, dummy_candidate, 1)
+        results = chain.run(dex_core, add_pool, amount=100_000, sender=admin, view_results=vr)
+
+        # dex_core originates the bucket and fills it with the tez side of the pool
+        pair_bucket = chain.contracts[dex_core].storage["storage"]["pairs"][0]["bucket"]
+        self.assertIn(pair_bucket, chain.contracts)
+        self.assertEqual(results[0].address, dex_core)
+        self.assertIn(pair_bucket, [res.address for res in results[1:]])
+        self.assertEqual(chain.contracts[dex_core].balance, 0)
+        self.assertEqual(chain.contracts[pair_bucket].balance, 100_000)
+        self.assertEqual(chain.contracts[pair_bucket].storage["dex_core"], dex_core)
+
+    def test_swap_fee_reaches_auction(self):
+        chain = LocalChain(storage=None)
+        chain.register(dex_core, self.dex, self.init_storage)
+        chain.register(auction, self.auction, self.auction_storage)
+
+        add_pool = self.dex.launch_exchange(tez_pair, 100_000_000, 100_000_000, me, dummy_candidate, 1)
+        chain.run(dex_core, add_pool, amount=100_000_000, sender=admin, view_results=vr)
+        chain.run(dex_core, self.dex.set_fees({
+            "swap_fee" : int(0.003 * 1e18),
+            "interface_fee" : int(0.003 * 1e18),
+            "auction_fee" : int(0.003 * 1e18),
+            "withdraw_fee_reward" : int(0.003 * 1e18)
+        }), sender=admin)
+        chain.run(dex_core, self.dex.swap({
+            "swaps" : [
+                {
+                    "pair_id": 0,
+                    "direction": "b_to_a",
+                },
+                {
+                    "pair_id": 0,
+                    "direction": "a_to_b",
+                },
+            ],
+            "amount_in" : 1_000_000,
+            "min_amount_out" : 1,
+            "lambda" : None,
+            "receiver" : me,
+            "referrer" : alice,
+            "deadline" : 1
+        }), amount=1_000_000, sender=me, view_results=vr)
+
+        # the fee leaves through the pair's bucket, the auction is told about it with receive_fee
+        pair_bucket = chain.contracts[dex_core].storage["storage"]["pairs"][0]["bucket"]
+        bucket_balance = chain.contracts[pair_bucket].balance
+        results = chain.run(dex_core, self.dex.withdraw_auction_fee(0, {"tez": None}), sender=alice,
+            view_results=vr)
+
+        self.assertEqual(parse_auction_ops(results[0]), [{"type": "receive_fee", "fee": 2_991, "destination": auction}])
+        self.assertEqual([res.address for res in results].count(auction), 2)
+        self.assertEqual(chain.contracts[auction].balance, 2_991)
+        self.assertEqual(chain.contracts[pair_bucket].balance, bucket_balance - 3_000)
+        self.assertEqual(chain.payouts[alice], 9)
+        self.assertEqual(len(chain.contracts[auction].storage["storage"]["public_fee_balances_f"]), 1)
@@ -0,0 +1,133 @@
+from unittest import TestCase
+from constants import *
+
+from helpers import *
+
+def transaction(destination, entrypoint, value, amount=0):
+    return {
+        "kind": "transaction",
+        "source": contract_self_address,
+        "destination": destination,
+        "amount": str(amount),
+        "parameters": {"entrypoint": entrypoint, "value": value},
+    }
+
+class Result():
+    def __init__(self, operations):
+        self.operations = operations
+
+class OperationIndexTest(TestCase):
+
+    def result(self):
+        return Result([
+            transaction(token_a_address, "transfer", {"prim": "Pair", "args": [
+                {"string": contract_self_address}, {"string": alice}, {"int": "100"}
+            ]}),
+            transaction(bob, "default", {"prim": "Unit"}, amount=50),
+            {"kind": "delegation", "source": bucket, "delegate": carol},
+            transaction(bucket, "pour_over", {"prim": "Pair", "args": [
+                {"string": dex_core}, {"int": "7"}
+            ]}),
+            transaction(contract_self_address, "close", {"prim": "Unit"}),
+        ])
+
+    def test_lookups(self):
+        res = self.result()
+
+        transfers = parse_transfers(res)
+        self.assertEqual(len(transfers), 2)
+        self.assertEqual(transfers[0].token_address, token_a_address)
+        self.assertEqual(transfers[0].amount, 100)
+        self.assertEqual(transfers[1].destination, bob)
+        self.assertEqual(transfers[1].amount, 50)
+
+        self.assertEqual([op.type for op in parse_ops(res)], ["token", "tez", "close"])
+        self.assertEqual(parse_delegations(res), [carol])
+        self.assertEqual(parse_pour_overs(res), [{"destination": dex_core, "amount": 7, "source": bucket}])
+        self.assertEqual(parse_votes(res), [])
+        self.assertEqual(len(fetch_entrypoints(res, "close")), 1)
+
+        index = index_operations(res)
+        self.assertEqual(len(index.destination(bucket)), 1)
+        self.assertEqual(len(index.kind("transaction")), 4)
+
+    def test_built_once(self):
+        res = self.result()
+        parse_transfers(res)
+        index = res.operation_index
+
+        parse_votes(res)
+        parse_delegations(res)
+        self.assertIs(index_operations(res), index)
+
+    def test_records(self):
+        fa2 = transaction(token_b_address, "transfer", [
+            {"prim": "Pair", "args": [{"string": alice}, [
+                {"prim": "Pair", "args": [{"string": bob}, {"int": "3"}, {"int": "10"}]},
+                {"prim": "Pair", "args": [{"string": carol}, {"int": "3"}, {"int": "20"}]},
+            ]]},
+            {"prim": "Pair", "args": [{"string": dave}, [
+                {"prim": "Pair", "args": [{"string": bob}, {"int": "0"}, {"int": "5"}]},
+            ]]},
+        ])
+        transfers = parse_transfer(fa2)
+        self.assertEqual([(t.source, t.destination, t.token_id, t.amount) for t in transfers],
+            [(alice, bob, 3, 10), (alice, carol, 3, 20), (dave, bob, 0, 5)])
+        self.assertEqual(transfers[0], Transfer("token", bob, 10, alice, token_b_address, 3))
+
+        # fields a tez transfer doesn't have are None and left out of the mapping
+        tez = parse_transfers(self.result())[1]
+        self.assertEqual(tez, Transfer("tez", bob, 50, contract_self_address))
+        self.assertIsNone(tez.token_id)
+        self.assertEqual(dict(tez), {"type": "tez", "destination": bob, "amount": 50, "source": contract_self_address})
+        self.assertEqual(tez["amount"], 50)
+        self.assertEqual(len(tez), 4)
+        self.assertNotIn("token_id", tez)
+        with self.assertRaises(KeyError):
+            tez["token_id"]
+
+    def test_other_records(self):
+        res = Result(self.result().operations + [
+            {"kind": "origination", "source": dex_core, "balance": "25"},
+            transaction(auction, "receive_fee", {"prim": "Pair", "args": [
+                {"prim": "Pair", "args": [{"string": token_a_address}, {"int": "0"}]}, {"int": "12"}
+            ]}),
+        ])
+        self.assertEqual(parse_originations(res), [Origination(25)])
+        self.assertEqual(parse_pour_overs(res), [PourOver(dex_core, 7, bucket)])
+        self.assertEqual(parse_auction_ops(res), [ReceiveFee(12, auction)])
+        self.assertEqual(parse_auction_ops(res)[0], {"type": "receive_fee", "fee": 12, "destination": auction})
+
+    def test_iter_ops(self):
+        res = self.result()
+        ops = iter_ops(res.operations)
+        self.assertNotIsInstance(ops, list)
+        ops = list(ops)
+        self.assertFalse(hasattr(res, "operation_index"))
+        self.assertEqual(ops, parse_ops(res))
+
+    def test_iter_variants(self):
+        res = Result(self.result().operations + [
+            transaction(bucket, "pour_out", {"prim": "Pair", "args": [{"string": alice}, {"int": "30"}]}),
+            transaction(bucket, "vote", {"prim": "Pair", "args": [
+                {"string": alice}, {"string": carol}, {"prim": "True"}, {"int": "40"}
+            ]}),
+        ])
+        transfers = iter_transfers(res.operations)
+        self.assertNotIsInstance(transfers, list)
+        self.assertEqual(list(transfers), parse_transfers(res))
+        self.assertEqual(list(iter_votes(res.operations)), [Vote(carol, 40)])
+        self.assertEqual(parse_transfers(res)[-1], Transfer("tez", alice, 30, bucket))
+
+    def test_copies(self):
+        res = self.result()
+        parse_transfers(res).clear()
+        with self.assertRaises(AttributeError):
+            parse_pour_overs(res)[0].amount = 0
+        parse_delegations(res).append(dave)
+        fetch_entrypoints(res, "close").clear()
+
+        self.assertEqual(len(parse_transfers(res)), 2)
+        self.assertEqual(parse_pour_overs(res)[0]["amount"], 7)
+        self.assertEqual(parse_delegations(res), [carol])
+        self.assertEqual(len(fetch_entrypoints(res, "close")), 1)
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from unittest import TestCase
+
+import parallel
+
+sample_tests = """
+from unittest import TestCase, skip
+
+class Sample(TestCase):
+    def test_passes(self):
+        pass
+
+    def test_also_passes(self):
+        pass
+
+    @skip("not today")
+    def test_skipped(self):
+        pass
+
+class Broken(TestCase):
+    def test_fails(self):
+        self.assertEqual(1, 2)
+"""
+
+broken_tests = """
+import parallel_no_such_module
+"""
+
+class ParallelTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        with open(os.path.join(cls.directory.name, "parallel_sample.py"), "w") as file:
+            file.write(sample_tests)
+        with open(os.path.join(cls.directory.name, "parallel_broken.py"), "w") as file:
+            file.write(broken_tests)
+        sys.path.insert(0, cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.path.remove(cls.directory.name)
+        sys.modules.pop("parallel_sample", None)
+        sys.modules.pop("parallel_broken", None)
+        cls.directory.cleanup()
+
+    def run_main(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = parallel.main(["-j", "2", *argv])
+        return status, output.getvalue()
+
+    def test_counts_and_status(self):
+        for split in ["classes", "tests"]:
+            status, output = self.run_main("--split", split, "parallel_sample")
+            self.assertEqual(status, 1)
+            self.assertIn("1 FAIL, 2 ok, 1 skip in", output)
+            self.assertIn("FAIL: test_fails (parallel_sample.Broken", output)
+
+    def test_passing_run(self):
+        status, output = self.run_main("parallel_sample.Sample")
+        self.assertEqual(status, 0)
+        self.assertIn("2 ok, 1 skip in", output)
+        self.assertNotIn("FAIL", output)
+
+    def test_import_error(self):
+        for split in ["classes", "tests"]:
+            status, output = self.run_main("--split", split, "parallel_sample.Sample", "parallel_broken")
+            self.assertEqual(status, 1)
+            self.assertIn("FAIL unittest.loader._FailedTest.parallel_broken (1 tests", output)
+            self.assertIn("1 ERROR, 2 ok, 1 skip in", output)
+            self.assertIn("No module named 'parallel_no_such_module'", output)
@@ -0,0 +1,88 @@
+from random import Random
+from unittest import TestCase
+
+import numpy as np
+from pytezos import MichelsonRuntimeError
+
+from constants import *
+
+import dex_model
+import quotes
+from test_dex_model import make_storage, fees_set, tez, token_a, token_b
+
+class QuotesTest(TestCase):
+
+    def setUp(self):
+        self.storage = make_storage([
+            (token_a, tez, 1_000_000, 3_000_000, bucket),
+            (token_b, tez, 5_000_000, 7_000_000, dex_core),
+            (token_a, token_b, 4_000_000, 2_000_000, None),
+        ], fees_set)
+
+    def check(self, swaps, amounts):
+        quoted = quotes.quote_route(self.storage, swaps, amounts)
+        expected = [dex_model.quote(self.storage, swaps, int(amount)) for amount in amounts]
+        self.assertEqual([int(out) for out in quoted], expected)
+        return quoted
+
+    def check_valid(self, swaps, amounts):
+        quoted = quotes.quote_route(self.storage, swaps, amounts)
+        for amount, out in zip(amounts, quoted):
+            if out is not np.ma.masked:
+                self.assertEqual(int(out), dex_model.quote(self.storage, swaps, amount))
+        return quoted
+
+    def test_single_pool(self):
+        amounts = np.arange(1, 2_000_000, 997)
+        quoted = self.check([{"pair_id": 0, "direction": "a_to_b"}], amounts)
+        self.assertEqual(quoted.dtype, np.int64)
+
+    def test_route_visiting_a_pair_twice(self):
+        swaps = [
+            {"pair_id": 2, "direction": "a_to_b"},
+            {"pair_id": 1, "direction": "a_to_b"},
+            {"pair_id": 1, "direction": "b_to_a"},
+            {"pair_id": 2, "direction": "b_to_a"},
+        ]
+        rng = Random(7)
+        self.check(swaps, [rng.randrange(1, 10_000_000) for _ in range(200)])
+
+    def test_falls_back_on_overflow(self):
+        self.storage["storage"]["pairs"][2]["token_a_pool"] = 10 ** 30
+        self.storage["storage"]["pairs"][2]["token_b_pool"] = 10 ** 25
+
+        quoted = self.check([{"pair_id": 2, "direction": "a_to_b"}], [1, 10 ** 12, 10 ** 28])
+        self.assertEqual(quoted.dtype, object)
+
+    def test_wrong_route(self):
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            quotes.quote_route(self.storage, [
+                {"pair_id": 0, "direction": "a_to_b"},
+                {"pair_id": 2, "direction": "a_to_b"},
+            ], [100])
+        self.assertEqual(error.exception.args[-1], "'119'")
+
+    def test_rejected_amounts_are_masked(self):
+        swaps = [{"pair_id": 2, "direction": "a_to_b"}, {"pair_id": 1, "direction": "a_to_b"}]
+        # 1 comes out of the first hop as 0, which the second hop refuses
+        quoted = self.check_valid(swaps, [0, 1, 1_000, 50_000])
+        self.assertEqual(list(np.ma.getmaskarray(quoted)), [True, True, False, False])
+
+        for amount in [0, 1]:
+            with self.assertRaises(MichelsonRuntimeError) as error:
+                dex_model.quote(self.storage, swaps, amount)
+            self.assertEqual(error.exception.args[-1], f"'{dex_model.ERR_ZERO_IN}'")
+
+    def test_failing_routes_raise(self):
+        self.storage["storage"]["pairs"][0]["token_b_pool"] = 0
+        with self.assertRaises(MichelsonRuntimeError) as error:
+            quotes.quote_pair(self.storage, 0, [100])
+        self.assertEqual(error.exception.args[-1], f"'{dex_model.ERR_NO_LIQUIDITY}'")
+
+        # tez into the second hop needs both pairs to have buckets
+        self.storage["storage"]["pairs"][1]["bucket"] = None
+        swaps = [{"pair_id": 1, "direction": "a_to_b"}, {"pair_id": 1, "direction": "b_to_a"}]
+        for quote in [quotes.quote_route, dex_model.quote]:
+            with self.assertRaises(MichelsonRuntimeError) as error:
+                quote(self.storage, swaps, [100] if quote is quotes.quote_route else 100)
+            self.assertEqual(error.exception.args[-1], f"'{dex_model.ERR_BUCKET_404}'")
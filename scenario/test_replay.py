@@ -0,0 +1,101 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from helpers import *
+from constants import *
+from loader import load_contract
+
+from journal import CallJournal, NO_FINGERPRINT, checkpoint_path, read_journal
+from replay import check_journal, first_divergence, segments
+
+BUCKET_PATH = "./contracts/compiled/bucket.tz"
+
+class ReplayTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract(BUCKET_PATH)
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+        cls.init_storage = storage
+
+        fd, cls.path = tempfile.mkstemp(suffix=".journal")
+        os.close(fd)
+        os.unlink(cls.path)
+
+        # 34 calls with defaults at 6, 11 (of 0), 16 and 21; checkpoints land after whole batches
+        chain = LocalChain(storage=storage)
+        voters = [alice, bob, carol, dave]
+        with chain.record(CallJournal(cls.path, checkpoint_every=8)):
+            for step in range(6):
+                chain.execute(cls.ct.vote(voters[step % 4], dave, True, 100 + step), sender=dex_core, view_results=vr)
+            chain.execute(cls.ct.default(), amount=10_000, view_results=vr)
+            for step in range(3):
+                chain.advance_blocks(5)
+                chain.execute_many([cls.ct.vote(voter, carol, True, 50 * step) for voter in voters],
+                    sender=dex_core, view_results=vr)
+                chain.execute(cls.ct.default(), amount=1_000 * step, view_results=vr)
+            for voter in voters:
+                chain.advance_blocks(4)
+                chain.execute(cls.ct.withdraw_rewards(voter, voter), sender=dex_core, view_results=vr)
+            for step in range(8):
+                chain.execute(cls.ct.vote(voters[step % 4], carol, True, 20 + step), sender=dex_core, view_results=vr)
+
+    @classmethod
+    def tearDownClass(cls):
+        for path in [cls.path, checkpoint_path(cls.path)]:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def test_segments(self):
+        parts = segments(self.path)
+        self.assertEqual([segment.start for segment in parts], [0, 11, 21, 29])
+        self.assertEqual(parts[-1].end, None)
+        self.assertEqual([segment.start for segment in segments(self.path, min_size=16)], [0, 21])
+
+    def test_no_divergence(self):
+        results = check_journal(self.path, BUCKET_PATH, view_results=vr)
+        self.assertEqual(sum(result.replayed for result in results), 34)
+        self.assertIsNone(first_divergence(results))
+
+    def test_parallel(self):
+        results = check_journal(self.path, BUCKET_PATH, jobs=2, view_results=vr)
+        self.assertEqual([result.index for result in results], list(range(4)))
+        self.assertIsNone(first_divergence(results))
+
+    def test_first_divergence(self):
+        # a baker rate changes the rewards every default keeps, from the first one on
+        views = {**vr, f"{dex_core}%get_baker_rate": int(0.1 * 1e18)}
+        results = check_journal(self.path, BUCKET_PATH, view_results=views)
+        diverged = first_divergence(results)
+        self.assertEqual(diverged.divergence, 6)
+        self.assertEqual(diverged.index, 0)
+        self.assertEqual(diverged.reason, "storage differs")
+        # later segments start from recorded state and diverge on their own defaults, a zero one keeps it all
+        self.assertEqual(results[1].divergence, 16)
+
+    def test_divergence_inside_batch(self):
+        fd, path = tempfile.mkstemp(suffix=".journal")
+        os.close(fd)
+        os.unlink(path)
+        self.addCleanup(lambda: [os.unlink(p) for p in [path, checkpoint_path(path)] if os.path.exists(p)])
+
+        chain = LocalChain(storage=self.init_storage)
+        with chain.record(CallJournal(path, checkpoint_every=100)):
+            chain.execute(self.ct.vote(alice, dave, True, 100), sender=dex_core, view_results=vr)
+            chain.execute_many([
+                self.ct.vote(bob, dave, True, 100),
+                (self.ct.default(), {"amount": 10_000}),
+                self.ct.vote(carol, dave, True, 100),
+            ], sender=dex_core, view_results=vr)
+        self.assertNotIn(NO_FINGERPRINT, [entry["fingerprint"] for entry in read_journal(path)])
+
+        # the default in the middle of the batch is the first call a baker rate changes
+        views = {**vr, f"{dex_core}%get_baker_rate": int(0.1 * 1e18)}
+        diverged = first_divergence(check_journal(path, BUCKET_PATH, view_results=views))
+        self.assertEqual(diverged.divergence, 2)
+        self.assertEqual(diverged.reason, "storage differs")
+        self.assertIsNone(first_divergence(check_journal(path, BUCKET_PATH, view_results=vr)))
@@ -4,9 +4,10 @@ from unittest import TestCase
 from pytezos import ContractInterface, MichelsonRuntimeError
 
 from helpers import *
+from loader import load_contract
 from constants import *
 
-from initial_storage import dex_core_lambdas
+from initial_storage import get_dex_core_lambdas
 
 class TokenToTokenRouterTest(TestCase):
 
@@ -14,13 +15,8 @@ class TokenToTokenRouterTest(TestCase):
     def setUpClass(cls):
         cls.maxDiff = None
 
-        text = open("./build/dex_core.json").read()
-        code = json.loads(text)
-
-        cls.dex = ContractInterface.from_micheline(code["michelson"])
-
-        storage = cls.dex.storage.dummy()
-        storage["dex_core_lambdas"] = dex_core_lambdas
+        cls.dex, storage = load_contract("./build/dex_core.json")
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
         storage["storage"]["admin"] = admin 
 
         cls.init_storage = storage
@@ -4,10 +4,11 @@ from unittest import TestCase
 from pytezos import ContractInterface, MichelsonRuntimeError
 
 from helpers import *
+from loader import load_contract
 from constants import *
 from pprint import pprint
 
-from initial_storage import dex_core_lambdas
+from initial_storage import get_dex_core_lambdas
 
 class TokenToTezRouterTest(TestCase):
 
@@ -15,13 +16,8 @@ class TokenToTezRouterTest(TestCase):
     def setUpClass(cls):
         cls.maxDiff = None
 
-        text = open("./build/dex_core.json").read()
-        code = json.loads(text)
-
-        cls.dex = ContractInterface.from_micheline(code["michelson"])
-
-        storage = cls.dex.storage.dummy()
-        storage["dex_core_lambdas"] = dex_core_lambdas
+        cls.dex, storage = load_contract("./build/dex_core.json")
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
         storage["storage"]["admin"] = admin 
 
         cls.init_storage = storage
@@ -0,0 +1,96 @@
+from random import Random
+from unittest import TestCase
+
+from helpers import *
+from loader import load_contract
+from constants import *
+
+from initial_storage import get_dex_core_lambdas
+import dex_model
+import router
+from test_dex_model import make_storage, fees_set, tez, token_a, token_b
+
+token_c = {"fa12": token_c_address}
+token_d = {"fa12": token_d_address}
+
+class RouterTest(TestCase):
+
+    def setUp(self):
+        self.storage = make_storage([
+            (token_a, token_b, 1_000_000, 1_000_000, None),
+            (token_a, token_c, 1_000_000, 5_000_000, None),
+            (token_c, token_b, 5_000_000, 2_000_000, None),
+            (token_b, tez, 1_000_000, 1_000_000, bucket),
+            (token_d, tez, 1_000_000, 1_000_000, dex_core),
+        ], fees_set)
+
+    def test_picks_the_better_path(self):
+        swaps, amount_out = router.best_route(self.storage, token_a, token_b, 10_000)
+
+        # through token_c the rate is better than the direct pair
+        self.assertEqual(swaps, [{"pair_id": 1, "direction": "a_to_b"}, {"pair_id": 2, "direction": "a_to_b"}])
+        self.assertEqual(amount_out, dex_model.quote(self.storage, swaps, 10_000))
+
+    def test_routes_match_the_model(self):
+        routes = router.find_routes(self.storage, token_a, token_d, 25_000, max_hops=4)
+        self.assertGreater(len(routes), 1)
+        for amount_out, swaps in routes:
+            self.assertEqual(amount_out, dex_model.quote(self.storage, swaps, 25_000))
+            self.assertEqual(swaps[-1], {"pair_id": 4, "direction": "b_to_a"})
+
+        self.assertEqual(router.find_routes(self.storage, token_a, token_d, 25_000, max_hops=2), [])
+
+    def test_no_route(self):
+        self.storage["storage"]["pairs"][4]["token_a_pool"] = 0
+        self.assertEqual(router.best_route(self.storage, token_a, token_d, 10_000), (None, 0))
+
+    def test_failing_routes_are_dropped(self):
+        # 1 rounds to zero in the first hop, which the next hop refuses
+        self.assertEqual(router.find_routes(self.storage, token_a, token_d, 1, max_hops=4), [])
+
+        # tez into pair 4 is forwarded to its bucket
+        self.storage["storage"]["pairs"][4]["bucket"] = None
+        self.assertEqual(router.find_routes(self.storage, token_a, token_d, 25_000, max_hops=4), [])
+        self.assertNotEqual(router.find_routes(self.storage, token_a, tez, 25_000, max_hops=4), [])
+
+    def test_many_pairs(self):
+        rng = Random(1)
+        tokens = [{"fa2": {"token": token_a_address, "id": i}} for i in range(12)]
+        pairs = []
+        for _ in range(40):
+            a, b = rng.sample(range(12), 2)
+            pairs.append((tokens[a], tokens[b], rng.randrange(10 ** 6, 10 ** 9), rng.randrange(10 ** 6, 10 ** 9), None))
+        storage = make_storage(pairs, fees_set)
+
+        graph = router.build_graph(storage)
+        for token_out in tokens[1:]:
+            routes = router.find_routes(storage, tokens[0], token_out, 10 ** 6, graph=graph)
+            for amount_out, swaps in routes[:3]:
+                self.assertEqual(amount_out, dex_model.quote(storage, swaps, 10 ** 6))
+
+class RouterContractTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.dex, storage = load_contract("./build/dex_core.json")
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
+        storage["storage"]["admin"] = admin
+
+        cls.init_storage = storage
+
+    def test_matches_get_swap_min_res(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.dex.launch_exchange(pair_ab, 1_000_000, 1_000_000, me, dummy_candidate, 1))
+        chain.execute(self.dex.launch_exchange(pair_ac, 5_000_000, 1_000_000, me, dummy_candidate, 1))
+        chain.execute(self.dex.launch_exchange(pair_bc, 5_000_000, 2_000_000, me, dummy_candidate, 1))
+        chain.execute(self.dex.launch_exchange(tez_pair_b, 1_000_000, 1_000_000, me, dummy_candidate, 1), amount=1_000_000)
+        chain.execute(self.dex.set_fees(fees_set), sender=admin)
+
+        routes = router.find_routes(chain.storage, token_a_fa2, {"tez": None}, 10_000)
+        self.assertGreater(len(routes), 1)
+
+        for amount_out, swaps in routes[:4]:
+            res = chain.view(self.dex.get_swap_min_res({"swaps": swaps, "amount_in": 10_000}))
+            self.assertEqual(res, amount_out)
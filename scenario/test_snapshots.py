@@ -0,0 +1,111 @@
+from unittest import TestCase
+from constants import *
+
+from helpers import *
+from helpers import _removed
+from loader import load_contract
+
+class SnapshotTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def test_rollback(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core, view_results=vr)
+        chain.execute(self.ct.default(), amount=20_000, view_results=vr)
+
+        snapshot = chain.snapshot()
+
+        chain.advance_blocks(15)
+        chain.execute(self.ct.vote(bob, dave, True, 60), sender=dex_core, view_results=vr)
+        res = chain.execute(self.ct.withdraw_rewards(alice, alice), view_results=vr, sender=dex_core)
+        self.assertEqual(parse_transfers(res)[0]["amount"], 10_000)
+        self.assertEqual(chain.storage["current_delegated"], dave)
+
+        chain.rollback(snapshot)
+        self.assertEqual(chain.level, 0)
+        self.assertEqual(chain.balance, 20_000)
+        self.assertEqual(chain.storage["current_delegated"], carol)
+        self.assertNotIn(bob, chain.storage["users"])
+
+        # the same branch replays identically and the snapshot is reusable
+        chain.advance_blocks(15)
+        res = chain.execute(self.ct.withdraw_rewards(alice, alice), view_results=vr, sender=dex_core)
+        self.assertEqual(parse_transfers(res)[0]["amount"], 10_000)
+
+        chain.rollback(snapshot)
+        self.assertEqual(chain.storage["users"][alice]["votes"], 50)
+
+    def test_fork_is_independent(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core)
+
+        fork = chain.fork()
+        res = fork.execute(self.ct.vote(bob, dave, True, 60), sender=dex_core)
+        self.assertEqual(parse_delegations(res)[0], dave)
+
+        self.assertEqual(chain.storage["current_delegated"], carol)
+        self.assertNotIn(bob, chain.storage["users"])
+        self.assertIn(bob, fork.storage["users"])
+
+        # mutating a record on the fork doesn't leak into the original
+        fork.storage["total_supply"] = 0
+        self.assertEqual(chain.storage["total_supply"], 50)
+
+    def test_unchanged_entries_are_shared(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core)
+        alice_entry = chain.storage["users"][alice]
+
+        branches = []
+        for voter in [bob, dave, julian]:
+            branch = chain.fork()
+            branch.execute(self.ct.vote(voter, dave, True, 10), sender=dex_core)
+            branches.append(branch)
+
+        for branch in branches:
+            self.assertIs(branch.storage["users"][alice], alice_entry)
+            self.assertEqual(len(branch.storage["users"]), 2)
+            self.assertEqual(len(branch.storage["users"].layers), 1)
+
+    def test_materialized_follows_changes(self):
+        chain = LocalChain(storage=self.init_storage)
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core)
+        snapshot = chain.snapshot()
+        materialized = chain.prepare(self.ct.default())["users"]
+
+        # the next call updates the same dict in place instead of rebuilding it
+        chain.execute(self.ct.vote(bob, dave, True, 10), sender=dex_core)
+        users = chain.storage["users"]
+        self.assertIs(chain.prepare(self.ct.default())["users"], materialized)
+        self.assertEqual(materialized, {alice: users[alice], bob: users[bob]})
+
+        # maps it was taken from rebuild their own
+        chain.rollback(snapshot)
+        self.assertEqual(set(chain.prepare(self.ct.default())["users"]), {alice})
+        self.assertEqual(set(materialized), {alice, bob})
+
+    def test_changes_are_the_written_keys(self):
+        base = CowMap({key: key for key in range(100)})
+        big_map = base
+        # past max_depth, where the layers get merged
+        for step in range(3 * CowMap.max_depth):
+            written = {step: -step, 100 + step: step}
+            derived = big_map.derive(written)
+            self.assertIs(CowMap.changes(big_map, derived), written)
+            big_map = derived
+
+        # maps that aren't derived from one another are compared entry by entry
+        expected = {key: -key for key in range(1, 3 * CowMap.max_depth)}
+        expected.update({100 + key: key for key in range(3 * CowMap.max_depth)})
+        self.assertEqual(CowMap.changes(base, big_map), expected)
+        self.assertEqual(CowMap.changes(big_map, base), {**{key: key for key in range(1, 3 * CowMap.max_depth)},
+            **{100 + key: _removed for key in range(3 * CowMap.max_depth)}})
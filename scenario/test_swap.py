@@ -5,9 +5,10 @@ from pprint import pprint
 from constants import *
 
 from helpers import *
+from loader import load_contract
 
 from pytezos import ContractInterface, MichelsonRuntimeError
-from initial_storage import dex_core_lambdas
+from initial_storage import get_dex_core_lambdas
 
 class StableSwapTest(TestCase):
 
@@ -15,13 +16,8 @@ class StableSwapTest(TestCase):
     def setUpClass(cls):
         cls.maxDiff = None
 
-        text = open("./build/dex_core.json").read()
-        code = json.loads(text)
-
-        cls.dex = ContractInterface.from_micheline(code["michelson"])
-
-        storage = cls.dex.storage.dummy()
-        storage["dex_core_lambdas"] = dex_core_lambdas
+        cls.dex, storage = load_contract("./build/dex_core.json")
+        storage["dex_core_lambdas"] = get_dex_core_lambdas()
         storage["storage"]["admin"] = admin 
 
         cls.init_storage = storage
@@ -607,17 +603,17 @@ class StableSwapTest(TestCase):
         chain = LocalChain(storage=no_lambdas_storage)
         
         with self.assertRaises(MichelsonRuntimeError) as error: 
-            chain.execute(self.dex.setup_func(0, dex_core_lambdas[0]), sender=alice)
+            chain.execute(self.dex.setup_func(0, get_dex_core_lambdas()[0]), sender=alice)
         self.assertEqual(Errors.ERR_NOT_ADMIN, error.exception.args[-1])
 
-        chain.execute(self.dex.setup_func(0, dex_core_lambdas[0]), sender=admin)
+        chain.execute(self.dex.setup_func(0, get_dex_core_lambdas()[0]), sender=admin)
 
         with self.assertRaises(MichelsonRuntimeError) as error:
-            chain.execute(self.dex.setup_func(0, dex_core_lambdas[0]), sender=admin)
+            chain.execute(self.dex.setup_func(0, get_dex_core_lambdas()[0]), sender=admin)
         self.assertEqual(Errors.FUNC_ALREADY_SET, error.exception.args[-1])
 
-        chain.execute(self.dex.setup_func(25, dex_core_lambdas[8]), sender=admin)
+        chain.execute(self.dex.setup_func(25, get_dex_core_lambdas()[8]), sender=admin)
 
         with self.assertRaises(MichelsonRuntimeError) as error:
-            chain.execute(self.dex.setup_func(28, dex_core_lambdas[8]), sender=admin)
+            chain.execute(self.dex.setup_func(28, get_dex_core_lambdas()[8]), sender=admin)
         self.assertEqual(Errors.EXCEEDS_MAX_LAMBDA_INDEX, error.exception.args[-1])
\ No newline at end of file
@@ -0,0 +1,108 @@
+from unittest import TestCase
+
+from helpers import *
+from constants import *
+
+import dex_model
+from test_dex_model import make_storage, token_a, token_b
+from twap import TwapOracle
+
+fees = {
+    "interface_fee" : 0,
+    "swap_fee" : 0,
+    "auction_fee" : 0,
+    "withdraw_fee_reward" : 0,
+}
+
+def swap(chain, pair_id, amount_in):
+    res = dex_model.swap(chain.storage, [{"pair_id": pair_id, "direction": "a_to_b"}], amount_in, now=chain.now)
+    chain.storage = res.storage
+
+class TwapTest(TestCase):
+
+    def setUp(self):
+        self.chain = LocalChain(storage=make_storage([
+            (token_a, token_b, 100_000, 300_000, None),
+            (token_b, token_a, 50_000, 50_000, None),
+        ], fees))
+
+    def test_constant_pools(self):
+        oracle = TwapOracle([0, 1]).watch(self.chain)
+        self.chain.advance_blocks(10)
+
+        prices_a, prices_b = oracle.window(10 * BLOCK_TIME)
+        self.assertAlmostEqual(prices_a[0], 3.0)
+        self.assertAlmostEqual(prices_b[0], 1 / 3)
+        self.assertEqual(list(prices_a), [oracle.twap(0, 0, 300)[0], oracle.twap(1, 0, 300)[0]])
+        self.assertAlmostEqual(oracle.twap(1, 45, 200)[0], 1.0)
+
+    def test_matches_contract_cumulative(self):
+        oracle = TwapOracle([0, 1]).watch(self.chain)
+        self.chain.advance_blocks(3)
+        swap(self.chain, 0, 50_000)
+        pair = self.chain.storage["storage"]["pairs"][0]
+        swapped_price = pair["token_b_pool"] / pair["token_a_pool"]
+        self.chain.advance_blocks(7)
+        swap(self.chain, 0, 10_000)
+        self.chain.advance_blocks(2)
+
+        # the swaps updated the cumulative prices of pair 0 at their times
+        pair = self.chain.storage["storage"]["pairs"][0]
+        self.assertEqual(pair["last_block_timestamp"], 10 * BLOCK_TIME)
+        cml_a, cml_b = oracle.cumulative(10 * BLOCK_TIME, 0)
+        self.assertEqual((cml_a, cml_b), (pair["token_a_price_cml"], pair["token_b_price_cml"]))
+
+        # the average over both prices weighs each by the time it held
+        price_a, _ = oracle.twap(0, 0, 10 * BLOCK_TIME)
+        self.assertAlmostEqual(price_a, (3 * 3.0 + 7 * swapped_price) / 10, places=9)
+
+    def test_sparse_samples(self):
+        oracle = TwapOracle([0])
+        oracle.sample(self.chain)
+        self.chain.advance_blocks(4)
+        swap(self.chain, 0, 50_000)
+        self.chain.advance_blocks(4)
+        oracle.sample(self.chain)
+
+        pair = self.chain.storage["storage"]["pairs"][0]
+        self.assertEqual(oracle.cumulative(4 * BLOCK_TIME, 0)[0], pair["token_a_price_cml"])
+        self.assertAlmostEqual(oracle.twap(0, 4 * BLOCK_TIME, 8 * BLOCK_TIME)[0], 200_000 / 150_000, places=9)
+
+    def test_ring_buffer(self):
+        oracle = TwapOracle([0, 1], size=16).watch(self.chain)
+        self.chain.advance_blocks(40)
+
+        with self.assertRaises(ValueError):
+            oracle.cumulative(0)
+        with self.assertRaises(ValueError):
+            oracle.cumulative(41 * BLOCK_TIME)
+        self.assertAlmostEqual(oracle.window(15 * BLOCK_TIME)[0][0], 3.0)
+        with self.assertRaises(ValueError):
+            oracle.window(16 * BLOCK_TIME)
+
+    def test_rollback(self):
+        oracle = TwapOracle([0, 1]).watch(self.chain)
+        control = self.chain.fork()
+        control_oracle = TwapOracle([0, 1]).watch(control)
+        for chain in [self.chain, control]:
+            chain.advance_blocks(5)
+        snapshot = self.chain.snapshot()
+
+        # a future with a swap that gets discarded
+        self.chain.advance_blocks(3)
+        swap(self.chain, 0, 50_000)
+        self.chain.advance_blocks(3)
+        self.chain.rollback(snapshot)
+        self.assertEqual(oracle.last, 5)
+
+        for chain in [self.chain, control]:
+            chain.advance_blocks(4)
+            swap(chain, 1, 10_000)
+            chain.advance_blocks(4)
+        self.assertEqual([list(prices) for prices in oracle.window(13 * BLOCK_TIME)],
+            [list(prices) for prices in control_oracle.window(13 * BLOCK_TIME)])
+        self.assertEqual(list(oracle.cml_a[:, :14].ravel()), list(control_oracle.cml_a[:, :14].ravel()))
+
+        # the fork doesn't feed the oracle of the chain it came from
+        self.chain.fork().advance_blocks(5)
+        self.assertEqual(oracle.last, 13)
@@ -0,0 +1,147 @@
+import subprocess
+import sys
+from unittest import TestCase
+from constants import *
+
+from helpers import *
+from loader import load_contract
+
+from pytezos import ContractInterface
+
+# keeps the tez balance some contract reports through its get_tez_balance view
+reader_code = """
+parameter address;
+storage (pair (nat %balance) (nat %reads));
+code { UNPAIR ; UNIT ; VIEW "get_tez_balance" nat ; IF_NONE { PUSH string "no view" ; FAILWITH } {} ;
+       SWAP ; CDR ; PUSH nat 1 ; ADD ; SWAP ; PAIR ; NIL operation ; PAIR }
+"""
+reader = "KT1AxaBxkFLCUi3f8rdDAAxBKHfzY8LfKDRA"
+
+class LiveViewsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.init_storage = storage
+
+    def test_installed_on_use(self):
+        check = "\n".join([
+            "from pytezos.michelson.micheline import Micheline",
+            "import helpers",
+            "assert Micheline.classes['VIEW', 2] is helpers.ViewInstruction",
+            "helpers.LocalChain(storage=None).live_views()",
+            "assert Micheline.classes['VIEW', 2] is helpers.LiveViewInstruction",
+        ])
+        subprocess.run([sys.executable, "-c", check], cwd="./scenario", check=True)
+
+    def test_static_fallback(self):
+        plain = LocalChain(storage=self.init_storage)
+        live = LocalChain(storage=self.init_storage)
+        live.live_views(vr)
+        for chain, views in [(plain, vr), (live, None)]:
+            chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core, view_results=views)
+            chain.execute(self.ct.default(), amount=20_000, view_results=views)
+            chain.advance_blocks(15)
+            chain.execute(self.ct.withdraw_rewards(alice, alice), sender=dex_core, view_results=views)
+        self.assertEqual(live.storage, plain.storage)
+        self.assertEqual(live.payouts, plain.payouts)
+
+    def test_baker_rate_change(self):
+        chain = LocalChain(storage=self.init_storage)
+        dex = {"get_collecting_period": 10, "get_baker_rate": int(1e18 * 0.01)}
+        views = chain.live_views()
+        for name in dex:
+            views.define(dex_core, name, lambda argument, name=name: dex[name])
+
+        chain.execute(self.ct.vote(alice, carol, True, 50), sender=dex_core)
+        chain.execute(self.ct.default(), amount=20_000)
+
+        chain.advance_blocks(3)
+        dex["get_baker_rate"] = int(1e18 * 0.05)
+        chain.execute(self.ct.default(), amount=10_000)
+
+        res = chain.execute(self.ct.claim_baker_fund(admin), sender=dex_core)
+        self.assertEqual(parse_transfers(res)[0]["amount"], 200 + 500)
+
+    def test_cached_per_level(self):
+        chain = LocalChain(storage=self.init_storage)
+        calls = []
+        views = chain.live_views()
+        views.define(dex_core, "get_collecting_period", lambda argument: calls.append(("period", chain.level)) or 10)
+        views.define(dex_core, "get_baker_rate", lambda argument: calls.append(("rate", chain.level)) or 0)
+
+        # every default reads the baker rate, the period is read once it ends
+        for voter in [alice, bob]:
+            chain.execute(self.ct.vote(voter, carol, True, 50), sender=dex_core)
+        for _ in range(3):
+            chain.execute(self.ct.default(), amount=20_000)
+        chain.advance_blocks(12)
+        chain.execute_many([self.ct.vote(voter, dave, True, 10) for voter in [alice, bob]], sender=dex_core)
+        chain.execute_many([self.ct.default()] * 3, amount=1_000)
+
+        self.assertEqual(calls, [("rate", 0), ("period", 12), ("rate", 12)])
+        self.assertEqual((views.hits, views.misses), (4, 3))
+
+    def test_registered_contract(self):
+        chain = LocalChain(storage=None)
+        reader_ct = ContractInterface.from_michelson(reader_code)
+        chain.register(bucket, self.ct, self.init_storage, balance=1_000)
+        chain.register(reader, reader_ct, {"balance": 0, "reads": 0})
+        views = chain.live_views()
+
+        chain.run(reader, reader_ct.default(bucket))
+        chain.run(reader, reader_ct.default(bucket))
+        self.assertEqual(chain.contracts[reader].storage, {"balance": 1_000, "reads": 2})
+        self.assertEqual((views.hits, views.misses), (1, 1))
+
+        # a call changing the bucket drops its cached views within the same level
+        chain.run(bucket, self.ct.pour_out(alice, 300), sender=dex_core)
+        chain.run(reader, reader_ct.default(bucket))
+        self.assertEqual(chain.contracts[reader].storage["balance"], 700)
+        self.assertEqual(views.misses, 2)
+
+class ViewManyTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.maxDiff = None
+
+        cls.ct, storage = load_contract("./contracts/compiled/bucket.tz")
+        storage["dex_core"] = dex_core
+        storage["collecting_period_end"] = 10
+
+        cls.chain = LocalChain(storage=storage)
+        for voter, amount in [(alice, 100), (bob, 300), (carol, 600)]:
+            cls.chain.execute(cls.ct.vote(voter, dave, True, amount), sender=dex_core, view_results=vr)
+        cls.chain.execute(cls.ct.default(), amount=20_000, view_results=vr)
+        cls.chain.advance_blocks(15)
+
+    def test_request_order(self):
+        voters = [carol, alice, bob, julian]
+        calls = [self.ct.get_user_reward(voter) for voter in voters]
+        calls += [self.ct.get_user_candidate(bob), self.ct.get_tez_balance()]
+        results = self.chain.view_many(calls, view_results=vr)
+
+        # rewards are what withdrawing them right now pays out
+        withdrawn = []
+        chain = self.chain.fork()
+        for voter in voters[:3]:
+            res = chain.execute(self.ct.withdraw_rewards(voter, voter), sender=dex_core, view_results=vr)
+            withdrawn.append(parse_transfers(res)[0]["amount"])
+        self.assertEqual(results, withdrawn + [0, dave, 20_000])
+        self.assertEqual(self.chain.view(calls[1], view_results=vr), withdrawn[1])
+
+    def test_workers(self):
+        calls = [self.ct.get_user_reward(voter) for voter in [alice, bob, carol, dave] * 5]
+        self.assertEqual(self.chain.view_many(calls, view_results=vr, jobs=3),
+            self.chain.view_many(calls, view_results=vr))
+
+    def test_single_contract(self):
+        other = ContractInterface.from_file("./contracts/compiled/bucket.tz")
+        with self.assertRaises(ValueError):
+            self.chain.view_many([self.ct.get_tez_balance(), other.get_tez_balance()])
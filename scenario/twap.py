@@ -0,0 +1,149 @@
+import numpy as np
+
+from helpers import BLOCK_TIME
+from dex_model import PRECISION, ceil_div
+
+# time-weighted average prices over the cumulative prices pairs keep (token_a_price_cml, token_b_price_cml
+# and last_block_timestamp, the get_cumulative_prices view). The oracle samples the cumulative prices of
+# its pairs on a fixed time grid into ring buffers, so a TWAP over any window in the buffer is a difference
+# of two cumulative values.
+#
+#   oracle = TwapOracle([0, 1, 2]).watch(chain)
+#   chain.advance_blocks(100)
+#   price_a, price_b = oracle.twap(0, start, end)
+#   prices_a, prices_b = oracle.twaps(start, end)    # all pairs at once
+#
+# Between samples a pair accumulates at the price of its pools, like the contract does on its next update,
+# so grid points after the pair's last update are exact. Points between the previous sample and a later
+# update are interpolated; sampling on every advance_blocks (`watch`) leaves none of those, since
+# LocalChain calls all happen at the time of the last sample.
+# Cumulative values outgrow int64 quickly, so they are kept as python ints in object arrays
+
+class TwapOracle():
+    def __init__(self, pair_ids, size=1024, period=BLOCK_TIME):
+        self.pair_ids = list(pair_ids)
+        self.rows = {pair_id: row for row, pair_id in enumerate(self.pair_ids)}
+        self.size = size
+        self.period = period
+
+        self.cml_a = np.zeros((len(self.pair_ids), size), dtype=object)
+        self.cml_b = np.zeros((len(self.pair_ids), size), dtype=object)
+        # grid indices of the oldest and the newest sampled points
+        self.first = None
+        self.last = None
+
+        # cumulative prices at the time of the previous sample
+        self.sampled_at = None
+        self.sampled_a = [0] * len(self.pair_ids)
+        self.sampled_b = [0] * len(self.pair_ids)
+
+    """ sample on every advance_blocks of the chain, starting now. Snapshots of the chain include the samples """
+    def watch(self, chain):
+        chain.watch(self)
+        self.sample(chain)
+        return self
+
+    def __call__(self, chain):
+        self.sample(chain)
+
+    """ the sampled history, for LocalChain.snapshot """
+    def save(self):
+        return (self.cml_a.copy(), self.cml_b.copy(), self.first, self.last, self.sampled_at,
+            list(self.sampled_a), list(self.sampled_b))
+
+    """ go back to a saved history, e.g. on LocalChain.rollback; the state can be restored again """
+    def restore(self, state):
+        cml_a, cml_b, self.first, self.last, self.sampled_at, sampled_a, sampled_b = state
+        self.cml_a, self.cml_b = cml_a.copy(), cml_b.copy()
+        self.sampled_a, self.sampled_b = list(sampled_a), list(sampled_b)
+
+    """ the cumulative prices of a pair extrapolated to `now`, and the price each grows by per second """
+    def extrapolate(self, pair, now):
+        a_pool, b_pool = pair["token_a_pool"], pair["token_b_pool"]
+        if a_pool > 0 and b_pool > 0:
+            price_a = ceil_div(b_pool * PRECISION, a_pool)
+            price_b = ceil_div(a_pool * PRECISION, b_pool)
+        else:
+            price_a = price_b = 0
+        elapsed = now - pair["last_block_timestamp"]
+        return pair["token_a_price_cml"] + price_a * elapsed, pair["token_b_price_cml"] + price_b * elapsed, \
+            price_a, price_b
+
+    """ fill the grid points up to `chain.now` from the pairs in its dex_core storage """
+    def sample(self, chain):
+        now = chain.now
+        pairs = chain.storage["storage"]["pairs"]
+        end = now // self.period
+        if self.last is not None and end <= self.last:
+            return
+        start = end if self.last is None else max(self.last + 1, end - self.size + 1)
+        times = [g * self.period for g in range(start, end + 1)]
+        slots = [g % self.size for g in range(start, end + 1)]
+
+        for row, pair_id in enumerate(self.pair_ids):
+            if pair_id not in pairs:
+                continue
+            pair = pairs[pair_id]
+            cml_a, cml_b, price_a, price_b = self.extrapolate(pair, now)
+            updated = pair["last_block_timestamp"]
+            for time, slot in zip(times, slots):
+                if time >= updated or self.sampled_at is None:
+                    self.cml_a[row, slot] = cml_a - price_a * (now - time)
+                    self.cml_b[row, slot] = cml_b - price_b * (now - time)
+                else:
+                    # between the previous sample and the pair's last update
+                    span = updated - self.sampled_at
+                    at_update_a = pair["token_a_price_cml"]
+                    at_update_b = pair["token_b_price_cml"]
+                    self.cml_a[row, slot] = self.sampled_a[row] + \
+                        (at_update_a - self.sampled_a[row]) * (time - self.sampled_at) // span
+                    self.cml_b[row, slot] = self.sampled_b[row] + \
+                        (at_update_b - self.sampled_b[row]) * (time - self.sampled_at) // span
+            self.sampled_a[row], self.sampled_b[row] = cml_a, cml_b
+
+        self.sampled_at = now
+        if self.first is None:
+            self.first = start
+        self.last = end
+        self.first = max(self.first, self.last - self.size + 1)
+
+    def slot(self, g, time):
+        if self.last is None or not self.first <= g <= self.last:
+            raise ValueError(f"{time} is outside the sampled history")
+        return g % self.size
+
+    """ cumulative prices at `time` of the pair in `row`, or of all pairs, interpolated between grid points """
+    def cumulative(self, time, row=slice(None)):
+        g, offset = divmod(time, self.period)
+        slot = self.slot(g, time)
+        cml_a, cml_b = self.cml_a[row, slot], self.cml_b[row, slot]
+        if offset == 0:
+            return cml_a, cml_b
+        after = self.slot(g + 1, time)
+        cml_a = cml_a + (self.cml_a[row, after] - cml_a) * offset // self.period
+        cml_b = cml_b + (self.cml_b[row, after] - cml_b) * offset // self.period
+        return cml_a, cml_b
+
+    def average(self, start, end, row):
+        if end <= start:
+            raise ValueError("the window has to be longer than 0")
+        start_a, start_b = self.cumulative(start, row)
+        end_a, end_b = self.cumulative(end, row)
+        scale = (end - start) * PRECISION
+        return (end_a - start_a) / scale, (end_b - start_b) / scale
+
+    """
+    time-weighted average prices of all pairs over [start, end] as arrays in pair_ids order:
+    token_b per token_a and token_a per token_b
+    """
+    def twaps(self, start, end):
+        prices_a, prices_b = self.average(start, end, slice(None))
+        return prices_a.astype(float), prices_b.astype(float)
+
+    def twap(self, pair_id, start, end):
+        return self.average(start, end, self.rows[pair_id])
+
+    """ TWAPs of all pairs over the last `seconds` sampled """
+    def window(self, seconds):
+        end = self.last * self.period
+        return self.twaps(end - seconds, end)